@@ -71,7 +71,9 @@ if __name__ == '__main__':
 import ace_engine
 from ace_fields import Field, ValidationError
 import ace_logging
+import ace_retention
 import ace_settings
+import ace_vmstats
 import auditing
 from chown import chown
 from coalesce import coalesce
@@ -267,8 +269,27 @@ class HttpFailure( Exception ):
 		cls = type( self )
 		return f'{cls.__module__}.{cls.__name__}(error={self.error!r}, status_code={self.status_code!r})'
 
-def rest_success( rows: Opt[list[dict[str,Any]]] = None ) -> Response:
-	return cast( Response, jsonify( success = True, rows = rows or [] ))
+def rest_success( rows: Opt[list[dict[str,Any]]] = None, **extra: Any ) -> Response:
+	return cast( Response, jsonify( success = True, rows = rows or [], **extra ))
+
+def rest_page( rows: list[dict[str,Any]], page: repo.PAGE, total: Opt[int] ) -> Response:
+	''' one page of a list, with cursors for the pages either side and the total if it was asked for '''
+	extra: dict[str,Any] = { 'next': page.next, 'prev': page.prev }
+	if total is not None:
+		extra['total'] = total
+	return rest_success( rows, **extra )
+
+def want_total() -> bool:
+	''' counting every match costs a full scan, so lists only include a total when asked with ?total=1 '''
+	return bool( request.args.get( 'total' ) == '1' )
+
+def page_link( label: str, args: dict[str,Any], cursor: Opt[str] ) -> str:
+	if cursor is None:
+		return label
+	return f'<a href="?{html_att(urlencode({ **args, "cursor": cursor }))}">{label}</a>'
+
+def html_total( total: Opt[int] ) -> str:
+	return '' if total is None else f'{total:,} found&nbsp;&nbsp;'
 
 def rest_failure( error: str, status_code: Opt[int] = None ) -> Response:
 	r = cast( Response, jsonify( success = False, error = error ))
@@ -384,6 +405,9 @@ if not cfg_path.is_file():
 		f'ITAS_REPOSITORY_PGSQL_PORT = {5432!r}',
 		f"ITAS_REPOSITORY_PGSQL_SSLMODE: Opt[Literal['disable','allow','prefer','require','verify-ca','verify-full']] = None",
 		f'ITAS_REPOSITORY_PGSQL_SSLROOTCERT = None',
+		f'ITAS_REPOSITORY_PGSQL_POOL_MIN = {1!r}',
+		f'ITAS_REPOSITORY_PGSQL_POOL_MAX = {20!r}',
+		f'ITAS_REPOSITORY_PGSQL_POOL_IDLE_SECONDS = {300!r}',
 		f'ITAS_FLAGS_PATH = {str(default_data_path)!r}',
 		f'ITAS_DID_FIELDS = {[]!r}',
 		f'ITAS_DID_VARIABLES_EXAMPLES = {[]!r}',
@@ -437,6 +461,9 @@ ITAS_REPOSITORY_PGSQL_PASSWORD: str = ''
 ITAS_REPOSITORY_PGSQL_PORT: int = 5432
 ITAS_REPOSITORY_PGSQL_SSLMODE: Opt[repo.PGSQL_SSLMODE] = None
 ITAS_REPOSITORY_PGSQL_SSLROOTCERT: Opt[str] = None
+ITAS_REPOSITORY_PGSQL_POOL_MIN: int = 1
+ITAS_REPOSITORY_PGSQL_POOL_MAX: int = 20
+ITAS_REPOSITORY_PGSQL_POOL_IDLE_SECONDS: float = 300
 ITAS_FLAGS_PATH: str = ''
 ITAS_DID_FIELDS: list[Field] = []
 ITAS_DID_VARIABLES_EXAMPLES: list[str] = []
@@ -553,6 +580,8 @@ voicemail_msgs_path = mkdir_with_permissions( PurePosixPath( ITAS_VOICEMAIL_MSGS
 def voicemail_box_msgs_path( box: int ) -> PurePosixPath:
 	return voicemail_msgs_path / str( box )
 
+voicemail_stats = ace_vmstats.BoxStats( voicemail_msgs_path )
+
 
 #endregion paths and auditing
 #region repo config
@@ -567,6 +596,9 @@ repo_config = repo.Config(
 	pgsql_port = ITAS_REPOSITORY_PGSQL_PORT,
 	pgsql_sslmode = ITAS_REPOSITORY_PGSQL_SSLMODE,
 	pgsql_sslrootcert = Path( ITAS_REPOSITORY_PGSQL_SSLROOTCERT ) if ITAS_REPOSITORY_PGSQL_SSLROOTCERT else None,
+	pgsql_pool_min = ITAS_REPOSITORY_PGSQL_POOL_MIN,
+	pgsql_pool_max = ITAS_REPOSITORY_PGSQL_POOL_MAX,
+	pgsql_pool_idle_seconds = ITAS_REPOSITORY_PGSQL_POOL_IDLE_SECONDS,
 )
 
 REPO_FACTORY: Type[repo.Repository]
@@ -585,16 +617,17 @@ if REPO_FACTORY == repo.RepoFs:
 		raise Exception( f'invalid ITAS_REPOSITORY_NOFS_TYPE={ITAS_REPOSITORY_NOFS_TYPE!r}' ) from None
 
 REPO_DIDS = REPO_FACTORY( repo_config, 'dids', '.did', [
-	repo.SqlInteger( 'did', null = False, size = 10, auto = False, primary = True ),
-	repo.SqlText( 'tollfree', null = True ),
+	# search = True on the fields http_dids() offers substring search on
+	repo.SqlInteger( 'did', null = False, size = 10, auto = False, primary = True, search = True ),
+	repo.SqlText( 'tollfree', null = True, search = True ),
 	repo.SqlText( 'category', null = True ),
-	repo.SqlInteger( 'acct', size = 4, null = True ),
-	repo.SqlText( 'name', null = True ),
+	repo.SqlInteger( 'acct', size = 4, null = True, search = True ),
+	repo.SqlText( 'name', null = True, search = True ),
 	repo.SqlText( 'acct_flag', null = True ),
-	repo.SqlVarChar( 'route', size = 20, null = False ),
+	repo.SqlVarChar( 'route', size = 20, null = False, search = True ),
 	repo.SqlText( 'did_flag', null = True ),
 	repo.SqlText( 'variables', null = True ),
-	repo.SqlText( 'notes', null = True ),
+	repo.SqlText( 'notes', null = True, search = True ),
 	*[
 		repo.SqlText( field.field, null = True )
 		for field in ITAS_DID_FIELDS
@@ -602,22 +635,22 @@ REPO_DIDS = REPO_FACTORY( repo_config, 'dids', '.did', [
 ], ITAS_OWNER_USER, ITAS_OWNER_GROUP, keyname = 'did' )
 
 REPO_ANIS = REPO_FACTORY( repo_config, 'anis', '.ani', [
-	repo.SqlInteger( 'ani', null = False, size = 10, auto = False, primary = True ),
+	repo.SqlInteger( 'ani', null = False, size = 10, auto = False, primary = True, search = True ),
 	repo.SqlVarChar( 'route', size = 20, null = True ),
 	repo.SqlText( 'overrides', null = True ),
 	repo.SqlText( 'notes', null = True ),
 ], ITAS_OWNER_USER, ITAS_OWNER_GROUP, keyname = 'ani' )
 
 REPO_ROUTES = REPO_FACTORY( repo_config, 'routes', '.route', [
-	repo.SqlInteger( 'route', null = False, size = 10, auto = False, primary = True ),
-	repo.SqlText( 'name', null = True ),
+	repo.SqlInteger( 'route', null = False, size = 10, auto = False, primary = True, search = True ),
+	repo.SqlText( 'name', null = True, search = True ),
 	repo.SqlText( 'type', null = True ),
 	repo.SqlJson( 'nodes', null = False ),
 ], ITAS_OWNER_USER, ITAS_OWNER_GROUP, keyname = 'route' )
 
 REPO_BOXES = REPO_FACTORY( repo_config, 'boxes', '.box', [
-	repo.SqlInteger( 'box', null = False, size = 10, auto = False, primary = True ),
-	repo.SqlText( 'name', null = True, unique = False ),
+	repo.SqlInteger( 'box', null = False, size = 10, auto = False, primary = True, search = True ),
+	repo.SqlText( 'name', null = True, unique = False, search = True ),
 	repo.SqlText( 'type', null = True ),
 	repo.SqlVarChar( 'pin', size = 20, null = False ),
 	repo.SqlInteger( 'max_greeting_seconds', size = 4, null = False ),
@@ -631,8 +664,8 @@ REPO_BOXES = REPO_FACTORY( repo_config, 'boxes', '.box', [
 
 REPO_JSON_CDR = REPO_FACTORY_NOFS( repo_config, 'cdr', '.cdr', [
 	repo.SqlInteger( 'id', null = False, size = 16, auto = True, primary = True ),
-	repo.SqlVarChar( 'call_uuid', size = 36, null = False ),
-	repo.SqlDateTime( 'start_stamp', null = False ),
+	repo.SqlVarChar( 'call_uuid', size = 36, null = False, index = True ),
+	repo.SqlDateTime( 'start_stamp', null = False, index = True ),
 	repo.SqlDateTime( 'answered_stamp', null = True ),
 	repo.SqlDateTime( 'end_stamp', null = False ),
 	repo.SqlJson( 'json', null = False ),
@@ -642,14 +675,31 @@ REPO_JSON_CDR = REPO_FACTORY_NOFS( repo_config, 'cdr', '.cdr', [
 REPO_CAR = REPO_FACTORY_NOFS( repo_config, 'car', '.car', [
 	# NOTE: keep this in sync with ace_car.CAR
 	repo.SqlVarChar( 'id', size = 36, null = False, primary = True ), # call's uuid
-	repo.SqlVarChar( 'did', size = DID_MAX_LENGTH, null = False ),
-	repo.SqlVarChar( 'ani', size = ANI_MAX_LENGTH, null = False ),
+	repo.SqlVarChar( 'did', size = DID_MAX_LENGTH, null = False, index = True, search = True ),
+	repo.SqlVarChar( 'ani', size = ANI_MAX_LENGTH, null = False, index = True, search = True ),
 	repo.SqlVarChar( 'cpn', size = CPN_MAX_LENGTH, null = False ),
 	repo.SqlVarChar( 'acct_num', size = ACCT_NUM_MAX_LENGTH, null = True ),
 	repo.SqlVarChar( 'acct_name', size = ACCT_NAME_MAX_LENGTH, null = True ),
 	repo.SqlFloat( 'start', null = False ),
 	repo.SqlFloat( 'end', null = True ),
 	repo.SqlJson( 'activity', null = False ),
+], ITAS_OWNER_USER, ITAS_OWNER_GROUP, auditing = False, indexes = [
+	repo.SqlIndex( '-start', '-id' ), # /cars newest first, and the retention purge oldest first
+])
+
+REPO_NOTIFY = REPO_FACTORY_NOFS( repo_config, 'notify', '.notify', [
+	# NOTE: keep this in sync with ace_notify.JOB
+	repo.SqlVarChar( 'id', size = 36, null = False, primary = True ),
+	repo.SqlInteger( 'box', null = False, size = 10 ),
+	repo.SqlVarChar( 'uuid', size = 36, null = False ), # uuid of the call that left the message
+	repo.SqlText( 'msg', null = False ),
+	repo.SqlJson( 'boxsettings', null = False ),
+	repo.SqlVarChar( 'status', size = 10, null = False ),
+	repo.SqlInteger( 'attempts', null = False, size = 4 ),
+	repo.SqlInteger( 'progress', null = False, size = 4 ),
+	repo.SqlFloat( 'created', null = False, index = True ),
+	repo.SqlFloat( 'next_try', null = False ),
+	repo.SqlText( 'last_error', null = True ),
 ], ITAS_OWNER_USER, ITAS_OWNER_GROUP, auditing = False )
 
 #endregion repo config
@@ -870,6 +920,7 @@ def http_dids() -> Response:
 	
 	q_limit = qry_int( 'limit', 20, min = 1, max = 1000 )
 	q_offset = qry_int( 'offset', 0, min = 0 )
+	q_cursor = request.args.get( 'cursor' ) or None
 	
 	filters: dict[str,str] = {}
 	for key in 'did tollfree acct name route notes'.split():
@@ -889,16 +940,22 @@ def http_dids() -> Response:
 	}
 	
 	with repo.Connector() as ctr:
+		try:
+			page = REPO_DIDS.page( ctr,
+				filters = filters,
+				limit = q_limit,
+				cursor = q_cursor,
+				offset = q_offset,
+			)
+		except repo.InvalidCursor:
+			return _http_failure( return_type, f'invalid cursor {q_cursor!r}' )
+		total = REPO_DIDS.count( ctr, filters ) if want_total() else None
 		dids: list[dict[str,Any]] = []
-		for did, did_data in REPO_DIDS.list( ctr,
-			filters = filters,
-			limit = q_limit,
-			offset = q_offset,
-		):
+		for did, did_data in page.items:
 			did_data['did'] = int( did )
 			dids.append({ **datadefs, **did_data })
 	if return_type == 'application/json':
-		return rest_success( dids )
+		return rest_page( dids, page, total )
 	row_html = (
 		'<tr>'
 		'<td><a href="/dids/{did}">{did}</a></td>'
@@ -917,8 +974,7 @@ def http_dids() -> Response:
 	route_tip = 'Performs substring search of all Routes'
 	notes_tip = 'Performs substring search of all Notes'
 	
-	prevpage = urlencode({ 'did': q_did, 'tollfree': q_tf, 'acct': q_acct, 'name': q_name, 'route': q_route, 'notes': q_notes, 'limit': q_limit, 'offset': max( 0, q_offset - q_limit )})
-	nextpage = urlencode({ 'did': q_did, 'tollfree': q_tf, 'acct': q_acct, 'name': q_name, 'route': q_route, 'notes': q_notes, 'limit': q_limit, 'offset': q_offset + q_limit })
+	args = { 'did': q_did, 'tollfree': q_tf, 'acct': q_acct, 'name': q_name, 'route': q_route, 'notes': q_notes, 'limit': q_limit }
 	return html_page(
 		'<table width="100%"><tr>',
 		'<td align="center">',
@@ -936,7 +992,7 @@ def http_dids() -> Response:
 		'<button id="clear" type="button" onclick="window.location=\'?\'">Clear</button>'
 		'</form>',
 		'</td>',
-		f'<td align="right"><a href="?{prevpage}">&lt;&lt;</a>&nbsp;&nbsp;<a href="?{nextpage}">&gt;&gt;</a></td>',
+		f'<td align="right">{html_total(total)}{page_link("&lt;&lt;",args,page.prev)}&nbsp;&nbsp;{page_link("&gt;&gt;",args,page.next)}</td>',
 		'</tr></table>',
 		
 		'<table class="fancy dids_list">',
@@ -1247,8 +1303,42 @@ def http_did( did: int ) -> Response:
 		'<script src="/did.js"></script>',
 		'</form>',
 	])
+	if did:
+		recordings = ace_retention.did_recordings( Path( settings.preannounce_path ), did )
+		if recordings:
+			names = ', '.join( path.name for path in recordings )
+			html_rows.extend([
+				f'<form method="POST" action="/dids/{did}/purge" enctype="application/x-www-form-urlencoded">',
+				f'<b>Recordings:</b> {html_text(names)}<br/>',
+				'To delete all active recordings for this DID, type "PURGE" in the following box:<br/>',
+				'<input type="text" name="confirm" size="25" autocomplete="off"/>',
+				'&nbsp;&nbsp;&nbsp;',
+				'<input type="submit" class="delete" value="Purge Recordings"/>',
+				'</form>',
+			])
 	return html_page( *html_rows )
 
+@app.route( '/dids/<int:did>/purge', methods = [ 'POST' ] )
+@login_required # type: ignore
+def http_did_purge( did: int ) -> Response:
+	log = logger.getChild( 'http_did_purge' )
+	return_type = accept_type()
+	if inputs().get( 'confirm', '' ).strip() != 'PURGE':
+		return _http_failure( return_type, 'You must type PURGE to delete this DID\'s recordings', 400 )
+	settings = ace_settings.load()
+	archive_path = settings.retention_archive_path.strip()
+	try:
+		result = ace_retention.purge_did_recordings( Path( settings.preannounce_path ), did,
+			archive_path = Path( archive_path ) if archive_path else None,
+			audit = new_audit(),
+		)
+	except Exception as e:
+		log.exception( 'Unable to purge recordings for DID %r:', did )
+		return _http_failure( return_type, f'Unable to purge recordings: {e!r}', 500 )
+	if return_type == 'application/json':
+		return rest_success([ result.to_json() ])
+	return redirect( f'/dids/{did}' )
+
 
 #endregion http - DID
 #region http - ANI
@@ -1262,18 +1352,24 @@ def http_anis() -> Response:
 	
 	q_limit = qry_int( 'limit', 20, min = 1, max = 1000 )
 	q_offset = qry_int( 'offset', 0, min = 0 )
+	q_cursor = request.args.get( 'cursor' ) or None
 	
 	search = request.args.get( 'search', '' )
 	filters: dict[str,str] = {}
 	if search:
-		filters['search'] = search
+		filters['ani'] = search
 	
 	anis: list[dict[str,int]] = []
 	with repo.Connector() as ctr:
-		for ani, _ in REPO_ANIS.list( ctr, filters = filters ):
+		try:
+			page = REPO_ANIS.page( ctr, filters = filters, limit = q_limit, cursor = q_cursor, offset = q_offset )
+		except repo.InvalidCursor:
+			return _http_failure( return_type, f'invalid cursor {q_cursor!r}' )
+		total = REPO_ANIS.count( ctr, filters ) if want_total() else None
+		for ani, _ in page.items:
 			anis.append({ 'ani': int( ani )})
 	if return_type == 'application/json':
-		return rest_success( anis )
+		return rest_page( anis, page, total )
 	row_html = (
 		'<tr>'
 		'<td><a href="/anis/{ani}">{ani}</a></td>'
@@ -1285,11 +1381,10 @@ def http_anis() -> Response:
 	
 	search_tip = 'Performs substring search of all ANIs'
 	
-	prevpage = urlencode({ 'search': search, 'limit': q_limit, 'offset': max( 0, q_offset - q_limit )})
-	nextpage = urlencode({ 'search': search, 'limit': q_limit, 'offset': q_offset + q_limit })
+	args = { 'search': search, 'limit': q_limit }
 	return html_page(
 		'<table width="100%"><tr>',
-		f'<td align="left"><a href="?{prevpage}">Prev Page</a></td>',
+		f'<td align="left">{page_link("Prev Page",args,page.prev)}</td>',
 		'<td align="center">',
 		'<a href="/anis/0">(Create new ANI)</a>',
 		'</td>',
@@ -1300,7 +1395,7 @@ def http_anis() -> Response:
 		'<button id="clear" type="button" onclick="window.location=\'?\'">Clear</button>'
 		'</form>',
 		'</td>',
-		f'<td align="right"><a href="?{nextpage}">Next Page</a></td>',
+		f'<td align="right">{html_total(total)}{page_link("Next Page",args,page.next)}</td>',
 		'</tr></table>',
 		
 		'<table class="fancy anis_list">',
@@ -1646,23 +1741,29 @@ def http_routes() -> Response:
 		
 		q_limit = qry_int( 'limit', 20, min = 1, max = 1000 )
 		q_offset = qry_int( 'offset', 0, min = 0 )
+		q_cursor = request.args.get( 'cursor' ) or None
 		
 		q_route = request.args.get( 'route', '' ).strip()
 		q_name = request.args.get( 'name', '' ).strip()
 		
 		filters: dict[str,str] = {}
 		if q_route:
-			filters['id'] = q_route
+			filters['route'] = q_route
 		if q_name:
 			filters['name'] = q_name
 		
 		# BEGIN route list
 		try:
-			routes = list( REPO_ROUTES.list( ctr,
+			page = REPO_ROUTES.page( ctr,
 				filters,
 				limit = q_limit,
+				cursor = q_cursor,
 				offset = q_offset,
-			))
+			)
+			routes = page.items
+			total = REPO_ROUTES.count( ctr, filters ) if want_total() else None
+		except repo.InvalidCursor:
+			return _http_failure( return_type, f'invalid cursor {q_cursor!r}' )
 		except Exception as e:
 			log.exception( 'Error querying routes list:' )
 			return _http_failure(
@@ -1672,10 +1773,10 @@ def http_routes() -> Response:
 			)
 	
 	if return_type == 'application/json':
-		return rest_success([{
+		return rest_page([{
 			'route': id,
 			'name': route.get( 'name' )
-		} for id, route in routes ] )
+		} for id, route in routes ], page, total )
 	
 	row_html = '\n'.join([
 		'<tr>',
@@ -1696,11 +1797,10 @@ def http_routes() -> Response:
 	route_tip = 'Performs substring search of all Route numbers'
 	name_tip = 'Performs substring search of all Route Names'
 	
-	prevpage = urlencode({ 'route': q_route, 'name': q_name, 'limit': q_limit, 'offset': max( 0, q_offset - q_limit )})
-	nextpage = urlencode({ 'route': q_route, 'name': q_name, 'limit': q_limit, 'offset': q_offset + q_limit })
+	args = { 'route': q_route, 'name': q_name, 'limit': q_limit }
 	return html_page(
 		'<table width="100%"><tr>',
-		f'<td align="left"><a href="?{prevpage}">Prev Page</a></td>',
+		f'<td align="left">{page_link("Prev Page",args,page.prev)}</td>',
 		'<td align="center">',
 		'<a id="route_new" href="#">(New Route)</a>',
 		'</td>',
@@ -1712,7 +1812,7 @@ def http_routes() -> Response:
 		'<button id="clear" type="button" onclick="window.location=\'?\'">Clear</button>'
 		'</form>',
 		'</td>',
-		f'<td align="right"><a href="?{nextpage}">Next Page</a></td>',
+		f'<td align="right">{html_total(total)}{page_link("Next Page",args,page.next)}</td>',
 		'</tr></table>',
 		
 		'<table border=1>',
@@ -1950,6 +2050,7 @@ def http_voicemails() -> Response:
 		
 		q_limit = qry_int( 'limit', 20, min = 1, max = 1000 )
 		q_offset = qry_int( 'offset', 0, min = 0 )
+		q_cursor = request.args.get( 'cursor' ) or None
 		
 		q_box = request.args.get( 'box', '' ).strip()
 		q_name = request.args.get( 'name', '' ).strip()
@@ -1959,10 +2060,14 @@ def http_voicemails() -> Response:
 		if q_name:
 			filters['name'] = q_name
 		try:
+			page = REPO_BOXES.page( ctr, filters = filters, limit = q_limit, cursor = q_cursor, offset = q_offset )
+			total = REPO_BOXES.count( ctr, filters ) if want_total() else None
 			boxes: list[dict[str,Any]] = []
-			for box2, boxdata in REPO_BOXES.list( ctr, filters = filters, limit = q_limit, offset = q_offset ):
+			for box2, boxdata in page.items:
 				boxdata['box'] = int( box2 )
 				boxes.append( boxdata )
+		except repo.InvalidCursor:
+			return _http_failure( return_type, f'invalid cursor {q_cursor!r}' )
 		except Exception as e:
 			return _http_failure(
 				return_type,
@@ -1971,14 +2076,16 @@ def http_voicemails() -> Response:
 			)
 	
 	if return_type == 'application/json':
-		return rest_success( boxes )
-	
-	# TODO FIXME: pagination anyone?
+		return rest_page( boxes, page, total )
 	
+	stats = voicemail_stats.many( box['box'] for box in boxes )
 	row_html = '\n'.join([
 		'<tr>',
 			'<td><a href="{url}">{box}</a></td>',
 			'<td><a href="{url}">{name}</a></td>',
+			'<td align="right">{new}</td>',
+			'<td align="right">{saved}</td>',
+			'<td align="right">{mb:.1f}</td>',
 			'<td><button class="clone" box="{box}">Clone {box} {name}</button></td>',
 			'<td><button class="delete" box="{box}">Delete {box} {name}</button></td>',
 		'</tr>',
@@ -1988,17 +2095,19 @@ def http_voicemails() -> Response:
 			box = box['box'],
 			name = box.get( 'name' ) or '(Unnamed)',
 			url = url_for( 'http_voicemail', box = box['box'] ),
+			new = stats[box['box']].new,
+			saved = stats[box['box']].saved,
+			mb = stats[box['box']].bytes / 1048576,
 		) for box in boxes
 	])
 	
 	box_tip = 'Performs substring search of all Box numbers'
 	name_tip = 'Performs substring search of all Box Names'
 	
-	prevpage = urlencode({ 'box': q_box, 'name': q_name, 'limit': q_limit, 'offset': max( 0, q_offset - q_limit )})
-	nextpage = urlencode({ 'box': q_box, 'name': q_name, 'limit': q_limit, 'offset': q_offset + q_limit })
+	args = { 'box': q_box, 'name': q_name, 'limit': q_limit }
 	return html_page(
 		'<table width="100%"><tr>',
-		f'<td align="left"><a href="?{prevpage}">Prev Page</a></td>',
+		f'<td align="left">{page_link("Prev Page",args,page.prev)}</td>',
 		'<td align="center">',
 		'<a id="box_new" href="#">(New Voicemail Box)</a>',
 		'</td>',
@@ -2010,13 +2119,16 @@ def http_voicemails() -> Response:
 		'<button id="clear" type="button" onclick="window.location=\'?\'">Clear</button>'
 		'</form>',
 		'</td>',
-		f'<td align="right"><a href="?{nextpage}">Next Page</a></td>',
+		f'<td align="right">{html_total(total)}{page_link("Next Page",args,page.next)}</td>',
 		'</tr></table>',
 		
 		'<table border=1>',
 		'<tr>',
 			'<th>Box</th>',
 			'<th>Name</th>',
+			'<th>New</th>',
+			'<th>Saved</th>',
+			'<th>MB</th>',
 			'<th>Clone</th>',
 			'<th>Delete</th>',
 		'</tr>',
@@ -2026,6 +2138,42 @@ def http_voicemails() -> Response:
 	)
 	# END voicemail boxes list
 
+@app.route( '/voicemails/stats', methods = [ 'GET' ] )
+@login_required # type: ignore
+def http_voicemails_stats() -> Response:
+	''' paged box list with message counts, or totals over every box with ?totals=1 '''
+	if request.args.get( 'totals' ):
+		try:
+			return rest_success([ voicemail_stats.totals() ])
+		except Exception as e:
+			return rest_failure( f'Error totaling voicemail box stats: {e!r}', 500 )
+	
+	q_limit = qry_int( 'limit', 100, min = 1, max = 1000 )
+	q_offset = qry_int( 'offset', 0, min = 0 )
+	q_cursor = request.args.get( 'cursor' ) or None
+	q_box = request.args.get( 'box', '' ).strip()
+	q_name = request.args.get( 'name', '' ).strip()
+	filters: dict[str,str] = {}
+	if q_box:
+		filters['box'] = q_box
+	if q_name:
+		filters['name'] = q_name
+	rows: list[dict[str,Any]] = []
+	try:
+		with repo.Connector() as ctr:
+			page = REPO_BOXES.page( ctr, filters = filters, limit = q_limit, cursor = q_cursor, offset = q_offset )
+			total = REPO_BOXES.count( ctr, filters ) if want_total() else None
+			for box, boxdata in page.items:
+				rows.append({ 'box': int( box ), 'name': boxdata.get( 'name' )})
+		stats = voicemail_stats.many( row['box'] for row in rows )
+	except repo.InvalidCursor:
+		return rest_failure( f'invalid cursor {q_cursor!r}' )
+	except Exception as e:
+		return rest_failure( f'Error querying voicemail box stats: {e!r}', 500 )
+	for row in rows:
+		row.update( stats[row['box']].to_json() )
+	return rest_page( rows, page, total )
+
 voicemail_id_html = '''
 <div class="tree-editor">
 	<div class="tree">
@@ -2109,6 +2257,7 @@ def http_voicemail( box: int ) -> Response:
 					except OSError as e1:
 						log.exception( 'Could not delete box %r messages:', box )
 						return rest_failure( f'Could not delete box {box!r} messages: {e1!r}' )
+				voicemail_stats.forget( box )
 				
 				greetings_path = Path( voicemail_greeting_path( box, 1 )).parent
 				log.warning( f'greetings_path={greetings_path!r}' )
@@ -2202,6 +2351,12 @@ def http_settings_id( fld_name: str ) -> Response:
 		'</form>',
 	)
 
+@app.route( '/retention', methods = [ 'GET' ])
+@login_required # type: ignore
+def http_retention() -> Response:
+	''' the last retention pass per data type, including what a dry run would have purged '''
+	return rest_success([ ace_retention.metrics() ])
+
 
 #endregion http - settings
 #region http - CAR
@@ -2215,6 +2370,7 @@ def http_cars() -> Response:
 	
 	q_limit = qry_int( 'limit', 20, min = 1, max = 1000 )
 	q_offset = qry_int( 'offset', 0, min = 0 )
+	q_cursor = request.args.get( 'cursor' ) or None
 	
 	q_did = request.args.get( 'did', '' ).strip()
 	q_ani = request.args.get( 'ani', '' ).strip()
@@ -2227,13 +2383,18 @@ def http_cars() -> Response:
 	
 	with repo.Connector() as ctr:
 		try:
-			cars = list( REPO_CAR.list( ctr,
+			page = REPO_CAR.page( ctr,
 				filters,
 				limit = q_limit,
+				cursor = q_cursor,
 				offset = q_offset,
 				orderby = 'start',
 				reverse = True,
-			))
+			)
+			cars = page.items
+			total = REPO_CAR.count( ctr, filters ) if want_total() else None
+		except repo.InvalidCursor:
+			return _http_failure( return_type, f'invalid cursor {q_cursor!r}' )
 		except Exception as e:
 			log.exception( 'Error querying car list:' )
 			return _http_failure(
@@ -2243,9 +2404,9 @@ def http_cars() -> Response:
 			)
 	
 	if return_type == 'application/json':
-		return rest_success([
+		return rest_page([
 			{ 'id': uuid, **data } for uuid, data in cars
-		])
+		], page, total )
 	
 	row_html = '\n'.join([
 		'<tr>',
@@ -2291,11 +2452,10 @@ def http_cars() -> Response:
 	did_tip = 'search for full or partial DID'
 	ani_tip = 'search for full or partial ANI'
 	
-	prevpage = urlencode({ 'did': q_did, 'ani': q_ani, 'limit': q_limit, 'offset': max( 0, q_offset - q_limit )})
-	nextpage = urlencode({ 'did': q_did, 'ani': q_ani, 'limit': q_limit, 'offset': q_offset + q_limit })
+	args = { 'did': q_did, 'ani': q_ani, 'limit': q_limit }
 	return html_page(
 		'<table width="100%"><tr>',
-		f'<td align="left"><a href="?{prevpage}">Prev Page</a></td>',
+		f'<td align="left">{page_link("Prev Page",args,page.prev)}</td>',
 		'<td align="center">'
 		'<form method="GET">'
 		f'<span tooltip="{html_att(did_tip)}"><input type="text" name="did" placeholder="DID" value="{html_att(q_did)}" maxlength="10" size="11"/></span>',
@@ -2304,7 +2464,7 @@ def http_cars() -> Response:
 		'<button id="clear" type="button" onclick="window.location=\'?\'">Clear</button>'
 		'</form>',
 		'</td>',
-		f'<td align="right"><a href="?{nextpage}">Next Page</a></td>',
+		f'<td align="right">{html_total(total)}{page_link("Next Page",args,page.next)}</td>',
 		'</tr></table>',
 		
 		'<table border=1>',
@@ -2678,11 +2838,12 @@ if __name__ == '__main__':
 	ace_engine.start( ace_engine.Config(
 		settings_path = settings_path,
 		settings_mplock = g_settings_mplock,
-		repo_anis = repo.AsyncRepository( REPO_ANIS ),
-		repo_dids = repo.AsyncRepository( REPO_DIDS ),
-		repo_routes = repo.AsyncRepository( REPO_ROUTES ),
-		repo_car = repo.AsyncRepository( REPO_CAR ),
+		repo_anis = repo.async_repository( REPO_ANIS ),
+		repo_dids = repo.async_repository( REPO_DIDS ),
+		repo_routes = repo.async_repository( REPO_ROUTES ),
+		repo_car = repo.async_repository( REPO_CAR ),
 		car_mplock = g_car_mplock,
+		repo_notify = repo.async_repository( REPO_NOTIFY ),
 		did_fields = ITAS_DID_FIELDS,
 		flags_path = flags_path,
 		vm_box_path = voicemail_meta_path,
@@ -2719,6 +2880,11 @@ if __name__ == '__main__':
 	address = '0.0.0.0' # TODO FIXME: load from flask.cfg?
 	#Spawn CDR vacuum
 	spawn( cdr_processor )
+	spawn( ace_retention.run, {
+		'car': ( REPO_CAR, 'start' ),
+		'cdr': ( REPO_JSON_CDR, 'start_stamp' ),
+		'notify': ( REPO_NOTIFY, 'created' ),
+	}, Path( ITAS_AUDIT_DIR ))
 	wsgi = WSGIContainer( app )
 	http_server = HTTPServer(
 		wsgi,
@@ -35,14 +35,18 @@ import uuid
 
 # 3rd-party imports:
 import aiofiles # pip install aiofiles
-import aiohttp # pip install aiohttp
-import pydub # pip install pydub
 
 # local imports:
 import ace_car
 from ace_fields import Field
 import ace_logging
+import ace_notify
+import ace_retention
 import ace_settings
+import ace_sms
+import ace_smtp
+import ace_transcode
+import ace_vmtier
 from ace_tod import match_tod
 import ace_util as util
 from ace_voicemail import LoadBoxError, Voicemail, MSG, BOXSETTINGS, SILENCE_1_SECOND
@@ -52,8 +56,8 @@ from dhms import dhms
 from email_composer import Email_composer
 from esl import ESL
 import repo
-import smtplib2
 from tts import TTS, TTS_VOICES, tts_voices
+import tts_prompt
 
 
 #endregion imports
@@ -264,6 +268,7 @@ class Config:
 	repo_routes: repo.AsyncRepository
 	repo_car: repo.AsyncRepository # car == call activity report
 	car_mplock: MPLock
+	repo_notify: repo.AsyncRepository # durable voicemail notification queue
 	
 	did_fields: List[Field]
 	flags_path: Path
@@ -435,7 +440,7 @@ class State( metaclass = ABCMeta ):
 			if isinstance( self, CallState ):
 				# call context
 				for i in range( 1, len( ar ), 2 ):
-					r2 = await self.esl.uuid_getvar( self.uuid, ar[i] )
+					r2 = await self.getvar( ar[i] )
 					ar[i] = r2 or ''
 			elif isinstance( self, NotifyState ):
 				# voicemail notify context
@@ -523,6 +528,16 @@ class State( metaclass = ABCMeta ):
 			msg,
 		)
 	
+	def already_delivered( self ) -> bool:
+		# only NotifyState can be retried, so only it can have delivered anything already
+		return False
+	
+	async def delivered( self, ctr: repo.Connector ) -> None:
+		pass
+	
+	async def delivery_failed( self, ctr: repo.Connector, reason: str ) -> None:
+		pass
+	
 	async def load_route( self, ctr: repo.Connector, route: int ) -> Dict[str,Any]:
 		return await self.config.repo_routes.get_by_id( ctr, route )
 	
@@ -757,7 +772,7 @@ class State( metaclass = ABCMeta ):
 			i += 1
 		return CONTINUE
 	
-	async def _sms_thinq( self, ctr: repo.Connector, smsto: str, message: str, settings: ace_settings.Settings ) -> RESULT:
+	async def _sms_thinq( self, ctr: repo.Connector, smsto: str, message: str, settings: ace_settings.Settings ) -> bool:
 		log = logger.getChild( 'State._sms_thinq' )
 		
 		url = f'https://api.thinq.com/account/{settings.sms_thinq_account}/product/origination/sms/send'
@@ -775,30 +790,31 @@ class State( metaclass = ABCMeta ):
 			'to_did': smsto,
 			'message': message,
 		}
-		async with aiohttp.ClientSession() as session:
-			async with session.post( url, headers = headers, data = formdata ) as rsp:
-				try:
-					text = await rsp.text()
-				except Exception as e1:
-					log.error( 'sms to %r failure: %r', smsto, e1 )
-					await self.car_activity( ctr, f'ERROR: sms to {smsto!r} failed: {e1!r}' )
+		try:
+			_, text = await ace_sms.post( settings, 'thinq', url, headers, formdata )
+		except Exception as e1:
+			log.error( 'sms to %r failure: %r', smsto, e1 )
+			await self.car_activity( ctr, f'ERROR: sms to {smsto!r} failed: {e1!r}' )
+			return False
+		else:
+			try:
+				jdata = json.loads( text ) # TODO FIXME: json decoding failure
+			except Exception as e2:
+				log.error( 'sms to %r failure: %r decoding json=%r', smsto, e2, text )
+				await self.car_activity( ctr, f'ERROR: sms to {smsto!r} got {e2!r} decoding response {text!r}' )
+				return False
+			else:
+				guid = jdata.get( 'guid' ) if isinstance( jdata, dict ) else None
+				if guid:
+					log.info( 'sms to %r success (guid=%r)', smsto, guid )
+					await self.car_activity( ctr, f'sms to {smsto!r} success (guid={guid!r})' )
+					return True
 				else:
-					try:
-						jdata = json.loads( text ) # TODO FIXME: json decoding failure
-					except Exception as e2:
-						log.error( 'sms to %r failure: %r decoding json=%r', smsto, e2, text )
-						await self.car_activity( ctr, f'ERROR: sms to {smsto!r} got {e2!r} decoding response {text!r}' )
-					else:
-						guid = jdata.get( 'guid' ) if isinstance( jdata, dict ) else None
-						if guid:
-							log.info( 'sms to %r success (guid=%r)', smsto, guid )
-							await self.car_activity( ctr, f'sms to {smsto!r} success (guid={guid!r})' )
-						else:
-							log.error( 'sms to %r failure: %r', smsto, jdata )
-							await self.car_activity( ctr, f'ERROR: sms to {smsto!r} failed: {jdata!r}' )
-		return CONTINUE
+					log.error( 'sms to %r failure: %r', smsto, jdata )
+					await self.car_activity( ctr, f'ERROR: sms to {smsto!r} failed: {jdata!r}' )
+		return False
 	
-	async def _sms_twilio( self, ctr: repo.Connector, smsto: str, message: str, settings: ace_settings.Settings ) -> RESULT:
+	async def _sms_twilio( self, ctr: repo.Connector, smsto: str, message: str, settings: ace_settings.Settings ) -> bool:
 		log = logger.getChild( 'State._sms_twilio' )
 		
 		url = f'https://api.twilio.com/2010-04-01/Accounts/{settings.sms_twilio_sid}/Messages.json'
@@ -816,33 +832,34 @@ class State( metaclass = ABCMeta ):
 			'To': f'+1{smsto}',
 			'Body': message,
 		}
-		async with aiohttp.ClientSession() as session:
-			async with session.post( url, headers = headers, data = formdata ) as rsp:
-				try:
-					text = await rsp.text()
-				except Exception as e1:
-					log.error( 'sms to %r failure: %r', smsto, e1 )
-					await self.car_activity( ctr, f'ERROR: sms to {smsto!r} failed: {e1!r}' )
+		try:
+			_, text = await ace_sms.post( settings, 'twilio', url, headers, formdata )
+		except Exception as e1:
+			log.error( 'sms to %r failure: %r', smsto, e1 )
+			await self.car_activity( ctr, f'ERROR: sms to {smsto!r} failed: {e1!r}' )
+			return False
+		else:
+			try:
+				jdata = json.loads( text ) # TODO FIXME: json decoding failure
+			except Exception as e2:
+				log.error( 'sms to %r failure: %r decoding json=%r', smsto, e2, text )
+				await self.car_activity( ctr, f'ERROR: sms to {smsto!r} got {e2!r} decoding response {text!r}' )
+				return False
+			else:
+				status = jdata.get( 'status' )
+				if status == 'queued':
+					log.info( 'sms to %r success: status=%r', smsto, status )
+					await self.car_activity( ctr, f'sms to {smsto!r} success: status={status!r}' )
+					return True
 				else:
-					try:
-						jdata = json.loads( text ) # TODO FIXME: json decoding failure
-					except Exception as e2:
-						log.error( 'sms to %r failure: %r decoding json=%r', smsto, e2, text )
-						await self.car_activity( ctr, f'ERROR: sms to {smsto!r} got {e2!r} decoding response {text!r}' )
+					errmsg = jdata.get( 'message' )
+					if errmsg:
+						log.error( 'sms to %r failure: %r %r', smsto, status, errmsg )
+						await self.car_activity( ctr, f'ERROR: sms to {smsto!r} failure: {status!r} {errmsg!r}' )
 					else:
-						status = jdata.get( 'status' )
-						if status == 'queued':
-							log.info( 'sms to %r success: status=%r', smsto, status )
-							await self.car_activity( ctr, f'sms to {smsto!r} success: status={status!r}' )
-						else:
-							errmsg = jdata.get( 'message' )
-							if errmsg:
-								log.error( 'sms to %r failure: %r %r', smsto, status, errmsg )
-								await self.car_activity( ctr, f'ERROR: sms to {smsto!r} failure: {status!r} {errmsg!r}' )
-							else:
-								log.error( 'sms to %r failure: %r', smsto, jdata )
-								await self.car_activity( ctr, f'ERROR: sms to {smsto!r} failure: {jdata!r}' )
-		return CONTINUE
+						log.error( 'sms to %r failure: %r', smsto, jdata )
+						await self.car_activity( ctr, f'ERROR: sms to {smsto!r} failure: {jdata!r}' )
+		return False
 	
 	async def action_sms( self, ctr: repo.Connector, action: ACTION_SMS, pagd: Opt[PAGD] ) -> RESULT:
 		log = logger.getChild( 'State.action_sms' )
@@ -867,14 +884,25 @@ class State( metaclass = ABCMeta ):
 			await self.car_activity( ctr, f'ERROR: cannot send sms b/c smsto={smsto!r}' )
 			return CONTINUE
 		
-		if settings.sms_carrier == 'thinq':
-			return await self._sms_thinq( ctr, smsto, message, settings )
-		elif settings.sms_carrier == 'twilio':
-			return await self._sms_twilio( ctr, smsto, message, settings )
-		else:
+		if settings.sms_carrier not in ( 'thinq', 'twilio' ):
 			log.error( 'cannot send sms, invalid sms_carrier=%r', settings.sms_carrier )
 			await self.car_activity( ctr, f'ERROR: cannot send sms b/c sms_carrier={settings.sms_carrier!r}' )
 			return CONTINUE
+		
+		if self.already_delivered():
+			await self.car_activity( ctr, f'sms to {smsto!r} already sent by a previous attempt' )
+			return CONTINUE
+		
+		async with ace_notify.channel( 'sms' ).slot():
+			if settings.sms_carrier == 'thinq':
+				ok = await self._sms_thinq( ctr, smsto, message, settings )
+			else:
+				ok = await self._sms_twilio( ctr, smsto, message, settings )
+		if ok:
+			await self.delivered( ctr )
+		else:
+			await self.delivery_failed( ctr, f'sms to {smsto!r} failed' )
+		return CONTINUE
 	
 	async def action_tod( self, ctr: repo.Connector, action: ACTION_TOD, pagd: Opt[PAGD] ) -> RESULT:
 		log = logger.getChild( 'State.action_tod' )
@@ -960,6 +988,28 @@ class CallState( State ):
 		super().__init__( esl, uuid )
 		self.did = did
 		self.ani = ani
+		self.pending_vars: Dict[str,str] = {} # channel variables waiting to be written by flush_vars()
+	
+	def setvar_buffered( self, key: str, val: str ) -> None:
+		self.pending_vars[key] = val
+	
+	async def getvar( self, key: str ) -> Opt[str]:
+		try:
+			return self.pending_vars[key]
+		except KeyError:
+			return await self.esl.uuid_getvar( self.uuid, key )
+	
+	async def flush_vars( self, ctr: repo.Connector ) -> None:
+		if not self.pending_vars:
+			return
+		pending, self.pending_vars = self.pending_vars, {}
+		vars_ = ', '.join( f'{k!r}={v!r}' for k, v in pending.items() )
+		await self.car_activity( ctr, f'setting channel variables {vars_}' )
+		await self.esl.uuid_setvar_multi( self.uuid, pending )
+	
+	async def exec_action( self, ctr: repo.Connector, action: ACTION, pagd: Opt[PAGD] ) -> RESULT:
+		await self.flush_vars( ctr ) # the action may need any channel variables we've queued up
+		return await super().exec_action( ctr, action, pagd )
 	
 	async def can_continue( self, ctr: repo.Connector ) -> bool:
 		log = logger.getChild( 'CallState.can_continue' )
@@ -1000,7 +1050,7 @@ class CallState( State ):
 				if not expired( exp ):
 					log.debug( 'ani=%r did=%r -> route=%r', self.ani, self.did, route_ )
 					await self.car_activity( ctr, f'ANI {self.ani!r} override line # {lineno!r} -> route {route_!r}' )
-					await self.esl.uuid_setvar( self.uuid, 'route', route_ )
+					self.setvar_buffered( 'route', route_ )
 					try:
 						return int( route_ ) # TODO FIXME: ability to send to a voicemail box, too?
 					except ValueError:
@@ -1012,7 +1062,7 @@ class CallState( State ):
 		if isinstance( route, int ):
 			log.debug( 'ani=%r did=* -> route=%r', self.ani, route )
 			await self.car_activity( ctr, f'ANI {self.ani!r} no override match, using default route={route!r}' )
-			await self.esl.uuid_setvar( self.uuid, 'route', str( route ))
+			self.setvar_buffered( 'route', str( route ))
 			return route
 		elif route is not None:
 			await self.car_activity( ctr, f'ERROR ani {self.ani} has invalid route={route!r}' )
@@ -1033,8 +1083,8 @@ class CallState( State ):
 		acct_num = data.get( 'acct' )
 		acct_name = data.get( 'name' )
 		if acct_num is not None or acct_name:
-			await self.esl.uuid_setvar( self.uuid, 'ace-acct-num', str( acct_num or '' ))
-			await self.esl.uuid_setvar( self.uuid, 'ace-acct-name', str( acct_name or '' ))
+			self.setvar_buffered( 'ace-acct-num', str( acct_num or '' ))
+			self.setvar_buffered( 'ace-acct-name', str( acct_name or '' ))
 			await self.config.repo_car.update( ctr, self.uuid,
 				{
 					'acct_num': acct_num,
@@ -1056,8 +1106,7 @@ class CallState( State ):
 			value = str( data.get( fld.field ) or '' ).strip()
 			if value is not None:
 				log.debug( 'setting field %r to %r', fld.field, value )
-				await self.car_activity( ctr, f'DID config setting channel variable {fld.field!r}={value!r}' )
-				await self.esl.uuid_setvar( self.uuid, fld.field, value )
+				self.setvar_buffered( fld.field, value )
 			#else:
 			#	log.debug( 'skipping field %r b/c value %r', fld.field, value )
 		
@@ -1066,8 +1115,7 @@ class CallState( State ):
 			field, _, value = map( str.strip, variable.partition( '=' ))
 			if field and value:
 				log.debug( 'setting variable %r to %r', field, value )
-				await self.car_activity( ctr, f'DID config setting channel variable {field!r}={value!r}' )
-				await self.esl.uuid_setvar( self.uuid, field, value )
+				self.setvar_buffered( field, value )
 		
 		await self.car_activity( ctr, f'DID config returning route={route!r}' )
 		return route, data
@@ -1100,8 +1148,8 @@ class CallState( State ):
 		path: Opt[Path] = None
 		
 		async def _setvar( key: str, val: str ) -> None:
-			await self.car_activity( ctr, f'set_preannounce: setting channel variable {key!r}={val!r}' )
-			await self.esl.uuid_setvar( self.uuid, key, val )
+			log.debug( 'setting channel variable %r to %r', key, val )
+			self.setvar_buffered( key, val )
 		
 		global_flag = await self.load_flag( 'global_flag' )
 		
@@ -1167,7 +1215,7 @@ class CallState( State ):
 				await self.car_activity( ctr, 'set_preannounce: not a holiday' )
 		
 		async def _uuid_gethhmm( key: str, default: str ) -> str:
-			value = await self.esl.uuid_getvar( self.uuid, key )
+			value = await self.getvar( key )
 			if value is None:
 				return default
 			m = re.match( r'^(\d\d?):(\d\d)', value )
@@ -1188,7 +1236,7 @@ class CallState( State ):
 		if not path:
 			bushrs_start = await _uuid_gethhmm( 'bushrs_start', '08:00' ) # TODO FIXME: support 'HH:MM'
 			bushrs_end = await _uuid_gethhmm( 'bushrs_end', '17:00' )
-			bushrs_dow = await self.esl.uuid_getvar( self.uuid, 'bushrs_dow' ) or '23456' # M-F
+			bushrs_dow = await self.getvar( 'bushrs_dow' ) or '23456' # M-F
 			now = datetime.now()
 			now_dow = str(( now.weekday() + 1 ) % 7 + 1 ) # now.weekday() MON=0 ... SUN=6, we need SUN=1 ... SAT=7
 			log.debug( 'bushrs_dow=%r, now_dow=%r', bushrs_dow, now_dow )
@@ -1202,7 +1250,7 @@ class CallState( State ):
 			else:
 				log.debug( 'dow mismatch' )
 			
-			tod_preannounce: str = ( await self.esl.uuid_getvar( self.uuid, f'{tod.lower()}_preannounce' ) or '' ).strip()
+			tod_preannounce: str = ( await self.getvar( f'{tod.lower()}_preannounce' ) or '' ).strip()
 			path2 = await self.try_wav( ctr, tod_preannounce or f'{self.did}_{tod}' )
 			if path2:
 				path = path2
@@ -1754,8 +1802,17 @@ class CallState( State ):
 		await self.car_activity( ctr, f'TTS initiated with voice={voice!r}, text={text!r}' )
 		tts = settings.tts( action.get( 'voice' ))
 		tts.say( text )
-		stream = await tts.generate()
-		r = await self._playback( ctr, str( stream ), pagd )
+		r: RESULT = CONTINUE
+		if pagd is None:
+			# plain text can start on its first sentence while the rest are still being synthesized, ssml is a single clip
+			async for clip in tts.generate_chunks():
+				r = await self._playback( ctr, str( clip ), pagd )
+				if r != CONTINUE or self.state == HUNT:
+					break
+		else:
+			clips = [ str( clip ) async for clip in tts.generate_chunks() ]
+			stream = clips[0] if len( clips ) == 1 else 'file_string://' + '!'.join( clips )
+			r = await self._playback( ctr, stream, pagd )
 		log.info( 'done playing %r using voice %r: result=%r',
 			text, tts.voice, r,
 		)
@@ -2172,20 +2229,12 @@ class CallState( State ):
 		log = logger.getChild( 'CallState.notify' )
 		with repo.Connector() as ctr:
 			try:
-				settings = await ace_settings.aload()
-				await self.car_activity( ctr, f'notify starting for box {box!r} named {boxsettings.get("name")!r}' )
-				esl = ESL()
-				await esl.connect_to( settings.esl_host, settings.esl_port, settings.esl_pass )
-				state = NotifyState( esl, self.uuid, box, msg, boxsettings, settings.vm_checkin )
-				delivery = boxsettings.get( 'delivery' ) or {}
-				nodes = delivery.get( 'nodes' ) or []
-				await state.exec_top_actions( ctr, nodes )
-				await self.car_activity( ctr, 'notify process complete' )
+				id = await ace_notify.submit( ctr, box, self.uuid, str( msg.path ), boxsettings )
 			except Exception as e:
-				log.exception( 'Unexpected error during voicemail notify:' )
-				await self.car_activity( ctr, f'notification terminated with an error: {e!r}' )
-			finally:
-				await esl.close()
+				log.exception( 'Unexpected error queueing voicemail notify:' )
+				await self.car_activity( ctr, f'ERROR: could not queue notification: {e!r}' )
+			else:
+				await self.car_activity( ctr, f'notification {id!r} queued for box {box!r} named {boxsettings.get("name")!r}' )
 
 
 #endregion CallState
@@ -2200,12 +2249,30 @@ class NotifyState( State ):
 		msg: MSG,
 		boxsettings: BOXSETTINGS,
 		checkin: str,
+		job: ace_notify.JOB,
+		final_attempt: bool,
 	) -> None:
 		super().__init__( esl, uuid )
 		self.box = box
 		self.msg = msg
 		self.boxsettings = boxsettings
 		self.checkin = checkin
+		self.job = job
+		self.final_attempt = final_attempt
+		self.deliveries = 0
+	
+	def already_delivered( self ) -> bool:
+		self.deliveries += 1
+		return self.deliveries <= self.job.progress
+	
+	async def delivered( self, ctr: repo.Connector ) -> None:
+		self.job.progress = self.deliveries
+		await ace_notify.save_progress( ctr, self.job )
+	
+	async def delivery_failed( self, ctr: repo.Connector, reason: str ) -> None:
+		if not self.final_attempt:
+			await self.car_activity( ctr, f'notification will be retried b/c {reason}' )
+			raise ace_notify.Retry( reason )
 	
 	async def can_continue( self, ctr: repo.Connector ) -> bool:
 		if self.msg.status != 'new':
@@ -2263,55 +2330,39 @@ class NotifyState( State ):
 		ec.subject = await self.expand( ec.subject )
 		ec.text = await self.expand( ec.text )
 		
-		mp3_file: Opt[Path] = None
-		try:
-			if file and fmt == 'mp3':
-				mp3_file = file.with_suffix( '.mp3' )
-				pydub.AudioSegment.from_wav( str( file )).export( str( mp3_file ), format = 'mp3' )
-				file = mp3_file
+		if self.already_delivered():
+			await self.car_activity( ctr, f'email to={ec.to!r} already sent by a previous attempt' )
+			return CONTINUE
+		
+		if file:
+			filename = file.name
+			if fmt == 'mp3':
+				filename = file.with_suffix( '.mp3' ).name
+				file = await ace_transcode.transcode( file, 'mp3' )
 				content_type = 'audio/mpeg'
-			
-			if file:
-				with file.open( 'rb' ) as f:
-					ec.attach( f, file.name, content_type )
-			
-			if settings.smtp_secure == 'yes':
-				smtp: Union[smtplib2.SMTP,smtplib2.SMTP_SSL] = smtplib2.SMTP_SSL(
-					settings.smtp_host,
-					settings.smtp_port or 465,
-					timeout = settings.smtp_timeout_seconds,
-				)
-			else:
-				smtp = smtplib2.SMTP(
-					settings.smtp_host,
-					settings.smtp_port or 587,
-					timeout = settings.smtp_timeout_seconds,
-				)
-			
-			if settings.smtp_username or settings.smtp_password:
-				assert settings.smtp_username and settings.smtp_password
-				smtp.login( settings.smtp_username, settings.smtp_password )
-			
-			await self.car_activity( ctr, f'sending email to={ec.to!r}, cc={ec.cc!r}, bcc={bcc!r}' )
-			try:
-				resp: str
-				senderrs: Dict[str,Tuple[int,str]]
-				resp, senderrs = smtp.sendmail2( ec.from_, list( chain( ec.to, ec.cc, bcc )), ec.as_bytes() )
-			except Exception as e:
-				log.exception( 'email failure:' )
-				await self.car_activity( ctr, f'ERROR: email failure: {e!r}' )
-			else:
-				await self.car_activity( ctr, f'email success: {resp!r}' )
+			ec.attach_file( file, filename, content_type )
 		
-		finally:
-			if mp3_file is not None:
-				try:
-					mp3_file.unlink()
-				except Exception:
-					log.exception( 'Error trying to delete %r:', str( mp3_file ))
+		with ace_transcode.using( file ): # the attachment isn't read until it's sent
+			async with ace_notify.channel( 'email' ).slot():
+				await self._send_email( ctr, ec, bcc, settings )
 		
 		return CONTINUE
 	
+	async def _send_email( self, ctr: repo.Connector, ec: Email_composer, bcc: List[str], settings: ace_settings.Settings ) -> None:
+		log = logger.getChild( 'NotifyState._send_email' )
+		await self.car_activity( ctr, f'sending email to={ec.to!r}, cc={ec.cc!r}, bcc={bcc!r}' )
+		try:
+			resp: str
+			senderrs: Dict[str,Tuple[int,str]]
+			resp, senderrs = await ace_smtp.sendmail( settings, ec.from_, list( chain( ec.to, ec.cc, bcc )), ec.iter_bytes )
+		except Exception as e:
+			log.exception( 'email failure:' )
+			await self.car_activity( ctr, f'ERROR: email failure: {e!r}' )
+			await self.delivery_failed( ctr, f'email failure: {e!r}' )
+		else:
+			await self.car_activity( ctr, f'email success: {resp!r}' )
+			await self.delivered( ctr )
+	
 	async def _voice_deliver( self, ctr: repo.Connector, action: ACTION_VOICE_DELIVER, number: str ) -> Tuple[bool,Opt[str]]:
 		log = logger.getChild( 'NotifyState._voice_deliver' )
 		
@@ -2448,14 +2499,20 @@ class NotifyState( State ):
 		else:
 			number2 = f'{settings.originate_prefix}{number}'
 		
+		if self.already_delivered():
+			await self.car_activity( ctr, f'action_voice_deliver: number={number!r} already called by a previous attempt' )
+			return CONTINUE
+		
 		await self.car_activity( ctr, f'action_voice_deliver: executing voice delivery to number={number!r} ({number2!r})' )
-		try:
-			ok, reason = await self._voice_deliver( ctr, action, number2 )
-		except Exception as e:
-			log.exception( 'Unexpected error trying to execute voice delivery:' )
-			ok = False
-			reason = repr( e )
+		async with ace_notify.channel( 'voice' ).slot():
+			try:
+				ok, reason = await self._voice_deliver( ctr, action, number2 )
+			except Exception as e:
+				log.exception( 'Unexpected error trying to execute voice delivery:' )
+				ok = False
+				reason = repr( e )
 		log.info( 'ok=%r, reason=%r', ok, reason )
+		await self.delivered( ctr ) # an unanswered call is not retried, the delivery tree decides what happens next
 		if ok:
 			await self.car_activity( ctr, 'action_voice_deliver: voice delivery complete' )
 		else:
@@ -2475,6 +2532,30 @@ def normalize_phone_number( phone: str ) -> str:
 		phone = phone[1:]
 	return phone
 
+async def _notify( ctr: repo.Connector, job: ace_notify.JOB, final_attempt: bool ) -> None:
+	log = logger.getChild( '_notify' )
+	path = Path( job.msg )
+	settings = await ace_settings.aload()
+	esl = ESL()
+	try:
+		await esl.connect_to( settings.esl_host, settings.esl_port, settings.esl_pass )
+		state = NotifyState(
+			esl, job.uuid, job.box,
+			Voicemail( esl, job.uuid, settings ).parse_recording_path( PurePosixPath( path.parent ), path.name ),
+			job.boxsettings, settings.vm_checkin, job, final_attempt,
+		)
+		if not path.is_file():
+			log.info( 'notification %r not needed, %r no longer exists', job.id, job.msg )
+			await state.car_activity( ctr, f'notification skipped b/c message no longer exists: {job.msg!r}' )
+			return
+		await state.car_activity( ctr, f'notify starting for box {job.box!r} named {job.boxsettings.get("name")!r} (attempt {job.attempts+1!r})' )
+		delivery = job.boxsettings.get( 'delivery' ) or {}
+		nodes = delivery.get( 'nodes' ) or []
+		await state.exec_top_actions( ctr, nodes )
+		await state.car_activity( ctr, 'notify process complete' )
+	finally:
+		await esl.close()
+
 async def _handler( reader: asyncio.StreamReader, writer: asyncio.StreamWriter ) -> None:
 	log = logger.getChild( '_handler' )
 	esl = ESL()
@@ -2484,10 +2565,13 @@ async def _handler( reader: asyncio.StreamReader, writer: asyncio.StreamWriter )
 			headers: Dict[str,str] = await esl.connect_from( reader, writer )
 			
 			await asyncio.sleep( 0.5 ) # wait for media to establish
+			setup_start = time.monotonic() # after the fixed wait above, so the log shows what batching can change
+			setup_sent = esl.commands_sent
 			
 			#for k, v in headers.items():
 			#	print( f'{k!r}: {v!r}' )
 			uuid = headers['Unique-ID']
+			esl.cache_vars( uuid, headers )
 			did = headers.get( 'ace-destination' ) or headers['Caller-Destination-Number']
 			ani = headers['Caller-ANI']
 			cpn = '' # TODO FIXME what field has this?
@@ -2535,10 +2619,10 @@ async def _handler( reader: asyncio.StreamReader, writer: asyncio.StreamWriter )
 				ani_route = await state.try_ani( ctr )
 				route, didinfo = await state.try_did( ctr, ani_route )
 				if route:
-					await state.car_activity( ctr, f'_handler: setting channel variable "route"={route!r}' )
-					await esl.uuid_setvar( uuid, 'route', str( route ))
+					state.setvar_buffered( 'route', str( route ))
 				if didinfo is not None:
 					await state.set_preannounce( ctr, didinfo )
+				await state.flush_vars( ctr )
 				
 				if not route:
 					log.error( 'no route to execute: route=%r', route )
@@ -2575,6 +2659,10 @@ async def _handler( reader: asyncio.StreamReader, writer: asyncio.StreamWriter )
 						await util.hangup( esl, uuid, 'UNALLOCATED_NUMBER', 'ace_engine._handler#3' )
 						return
 			
+			log.info( 'call setup took %.1fms and %r ESL commands',
+				( time.monotonic() - setup_start ) * 1000, esl.commands_sent - setup_sent,
+			)
+			
 			nodes = cast( ACTIONS, routedata.get( 'nodes' ) or [] )
 			r = await state.exec_top_actions( ctr, nodes )
 			log.info( 'route %r exited with %r', route, r )
@@ -2633,6 +2721,11 @@ async def _server(
 		owner_group = config.owner_group,
 		on_event = _on_event,
 	)
+	await ace_notify.init( config.repo_notify, _notify )
+	asyncio.create_task( util.stall_monitor() )
+	asyncio.create_task( tts_prompt.keep_warm() )
+	asyncio.create_task( ace_vmtier.run() )
+	asyncio.create_task( ace_retention.run_voicemail() )
 	server = await asyncio.start_server( _handler, '127.0.0.1', 8022 )
 	async with server:
 		await server.serve_forever()
@@ -0,0 +1,252 @@
+# stdlib imports:
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+import json
+import logging
+import time
+from typing import (
+	Any, AsyncIterator, Awaitable, Callable, Dict, Optional as Opt,
+)
+from typing_extensions import Literal # Python 3.7
+import uuid
+
+# local imports:
+import ace_settings
+import auditing
+import repo
+
+logger = logging.getLogger( __name__ )
+
+STATUS = Literal['queued','running','done','failed']
+
+METRICS_INTERVAL_SECONDS = 60
+
+class Retry( Exception ):
+	''' raised by a delivery that failed in a way that might succeed if we try again later '''
+	pass
+
+@dataclass
+class JOB:
+	# NOTE: keep this in sync with REPO_NOTIFY in ace.py
+	id: str
+	box: int
+	uuid: str # uuid of the call that left the message
+	msg: str # path of the message at the time it was queued
+	boxsettings: Any
+	status: STATUS
+	attempts: int # number of failed attempts so far
+	progress: int # number of deliveries already completed, these are skipped on retry
+	created: float
+	next_try: float
+	last_error: Opt[str]
+
+RUNNER = Callable[[repo.Connector,JOB,bool],Awaitable[None]]
+
+class Channel:
+	def __init__( self, name: str, workers: int ) -> None:
+		self.name = name
+		self.workers = workers
+		self._sem = asyncio.Semaphore( workers )
+		self.waiting = 0
+		self.active = 0
+		self.completed = 0
+		self.failed = 0
+		self.wait_seconds = 0.0
+		self.busy_seconds = 0.0
+	
+	@asynccontextmanager
+	async def slot( self ) -> AsyncIterator[None]:
+		queued = time.monotonic()
+		self.waiting += 1
+		try:
+			await self._sem.acquire()
+		finally:
+			self.waiting -= 1
+		started = time.monotonic()
+		self.wait_seconds += started - queued
+		self.active += 1
+		try:
+			yield
+		except BaseException:
+			self.failed += 1
+			raise
+		else:
+			self.completed += 1
+		finally:
+			self.active -= 1
+			self.busy_seconds += time.monotonic() - started
+			self._sem.release()
+	
+	def metrics( self ) -> Dict[str,Any]:
+		qty = self.completed + self.failed
+		return {
+			'workers': self.workers,
+			'depth': self.waiting,
+			'active': self.active,
+			'completed': self.completed,
+			'failed': self.failed,
+			'avg_wait_seconds': self.wait_seconds / qty if qty else 0.0,
+			'avg_busy_seconds': self.busy_seconds / qty if qty else 0.0,
+		}
+
+g_repo: repo.AsyncRepository
+g_run: RUNNER
+g_queue: 'asyncio.Queue[str]'
+g_delivery: Channel
+g_channels: Dict[str,Channel] = {}
+
+async def init(
+	repo_notify: repo.AsyncRepository,
+	run: RUNNER,
+) -> None:
+	''' start the delivery workers and requeue anything left over from the last time we ran '''
+	global g_repo, g_run, g_queue, g_delivery
+	log = logger.getChild( 'init' )
+	g_repo = repo_notify
+	g_run = run
+	g_queue = asyncio.Queue()
+	
+	settings = await ace_settings.aload()
+	g_delivery = Channel( 'delivery', max( 1, settings.notify_workers ))
+	g_channels['email'] = Channel( 'email', max( 1, settings.notify_email_workers ))
+	g_channels['sms'] = Channel( 'sms', max( 1, settings.notify_sms_workers ))
+	g_channels['voice'] = Channel( 'voice', max( 1, settings.notify_voice_workers ))
+	
+	for _ in range( g_delivery.workers ):
+		asyncio.create_task( _worker() )
+	asyncio.create_task( _monitor() )
+	
+	with repo.Connector() as ctr:
+		for status in ( 'running', 'queued' ):
+			for id, data in await g_repo.list( ctr, { 'status': status }, orderby = 'created' ):
+				log.info( 'requeueing %s notification %r for box %r', status, id, data.get( 'box' ))
+				_schedule( str( id ), float( data.get( 'next_try' ) or 0 ))
+
+def channel( name: str ) -> Channel:
+	return g_channels[name]
+
+def metrics() -> Dict[str,Dict[str,Any]]:
+	result = { 'delivery': g_delivery.metrics() }
+	result['delivery']['depth'] = g_queue.qsize()
+	for name, chan in g_channels.items():
+		result[name] = chan.metrics()
+	return result
+
+async def submit( ctr: repo.Connector, box: int, uuid_: str, msg: str, boxsettings: Any ) -> str:
+	now = time.time()
+	job = JOB(
+		id = str( uuid.uuid4() ),
+		box = box,
+		uuid = uuid_,
+		msg = msg,
+		boxsettings = boxsettings,
+		status = 'queued',
+		attempts = 0,
+		progress = 0,
+		created = now,
+		next_try = now,
+		last_error = None,
+	)
+	await g_repo.create( ctr, job.id, _to_row( job ), audit = auditing.NoAudit() )
+	g_queue.put_nowait( job.id )
+	return job.id
+
+async def save_progress( ctr: repo.Connector, job: JOB ) -> None:
+	await g_repo.update( ctr, job.id, { 'progress': job.progress }, audit = auditing.NoAudit() )
+
+def _to_row( job: JOB ) -> Dict[str,Any]:
+	row = asdict( job )
+	row['boxsettings'] = json.dumps( job.boxsettings )
+	return row
+
+def _from_row( id: str, row: Dict[str,Any] ) -> JOB:
+	return JOB(
+		id = id,
+		box = int( row['box'] ),
+		uuid = row['uuid'],
+		msg = row['msg'],
+		boxsettings = json.loads( row.get( 'boxsettings' ) or '{}' ),
+		status = row['status'],
+		attempts = int( row.get( 'attempts' ) or 0 ),
+		progress = int( row.get( 'progress' ) or 0 ),
+		created = float( row['created'] ),
+		next_try = float( row.get( 'next_try' ) or 0 ),
+		last_error = row.get( 'last_error' ),
+	)
+
+def _schedule( id: str, when: float ) -> None:
+	delay = when - time.time()
+	if delay > 0:
+		asyncio.get_running_loop().call_later( delay, g_queue.put_nowait, id )
+	else:
+		g_queue.put_nowait( id )
+
+async def _worker() -> None:
+	log = logger.getChild( '_worker' )
+	while True:
+		id = await g_queue.get()
+		try:
+			with repo.Connector() as ctr:
+				await _process( ctr, id )
+		except Exception:
+			log.exception( 'Unexpected error processing notification %r:', id )
+
+async def _process( ctr: repo.Connector, id: str ) -> None:
+	log = logger.getChild( '_process' )
+	try:
+		job = _from_row( id, dict( await g_repo.get_by_id( ctr, id )))
+	except repo.ResourceNotFound:
+		log.warning( 'notification %r disappeared from the queue', id )
+		return
+	if job.status not in ( 'queued', 'running' ):
+		return
+	
+	settings = await ace_settings.aload()
+	max_attempts = max( 1, settings.notify_max_attempts )
+	final = job.attempts + 1 >= max_attempts
+	
+	latency = time.time() - job.next_try
+	await g_repo.update( ctr, id, { 'status': 'running' }, audit = auditing.NoAudit() )
+	try:
+		async with g_delivery.slot():
+			await g_run( ctr, job, final )
+	except Exception as e:
+		job.attempts += 1
+		if final:
+			log.error( 'notification %r for box %r failed for good after %r attempts: %r',
+				id, job.box, job.attempts, e,
+			)
+			await g_repo.update( ctr, id, {
+				'status': 'failed',
+				'attempts': job.attempts,
+				'last_error': repr( e ),
+			}, audit = auditing.NoAudit() )
+		else:
+			backoff = settings.notify_retry_seconds * 2 ** ( job.attempts - 1 )
+			next_try = time.time() + backoff
+			log.warning( 'notification %r for box %r attempt %r failed, retrying in %r seconds: %r',
+				id, job.box, job.attempts, backoff, e,
+			)
+			await g_repo.update( ctr, id, {
+				'status': 'queued',
+				'attempts': job.attempts,
+				'next_try': next_try,
+				'last_error': repr( e ),
+			}, audit = auditing.NoAudit() )
+			_schedule( id, next_try )
+	else:
+		log.info( 'notification %r for box %r done, queue latency %.1fs, %r still queued',
+			id, job.box, latency, g_queue.qsize(),
+		)
+		await g_repo.update( ctr, id, { 'status': 'done' }, audit = auditing.NoAudit() )
+
+async def _monitor() -> None:
+	log = logger.getChild( '_monitor' )
+	last = ''
+	while True:
+		await asyncio.sleep( METRICS_INTERVAL_SECONDS )
+		current = json.dumps( metrics() )
+		if current != last: # don't spam the log when nothing is happening
+			log.info( 'notification queue metrics: %s', current )
+			last = current
@@ -0,0 +1,352 @@
+# stdlib imports:
+import asyncio
+from dataclasses import dataclass, field
+import datetime
+import gzip
+import io
+import json
+import logging
+import os
+from pathlib import Path, PurePosixPath
+import tarfile
+import time
+from typing import Any, Callable, Dict, List, Optional as Opt, Sequence as Seq, Tuple
+
+# local imports:
+import ace_settings
+import ace_transcode
+import ace_voicemail
+import auditing
+import repo
+
+logger = logging.getLogger( __name__ )
+
+INTERVAL_SECONDS = 60 * 60
+BATCH_PAUSE_SECONDS = 0.25 # give the engine's writers a turn at the table/disk between batches
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f' # how SqlDateTime columns are stored
+
+@dataclass
+class RESULT:
+	kind: str
+	dry_run: bool
+	expired: int = 0
+	purged: int = 0
+	archives: List[str] = field( default_factory = list )
+	seconds: float = 0.0
+	
+	def to_json( self ) -> Dict[str,Any]:
+		return {
+			'kind': self.kind,
+			'dry_run': self.dry_run,
+			'expired': self.expired,
+			'purged': self.purged,
+			'archives': list( self.archives ),
+			'seconds': self.seconds,
+		}
+
+g_last: Dict[str,RESULT] = {}
+g_results_path = Path( '/usr/share/itas/ace/retention' ) # <kind>.json per data type, the engine purges voicemail and the web ui the rest
+
+def cutoff( days: int ) -> datetime.datetime:
+	return datetime.datetime.now() - datetime.timedelta( days = days )
+
+def _archive_name( archive_path: Path, kind: str, suffix: str ) -> Path:
+	archive_path.mkdir( mode = 0o770, parents = True, exist_ok = True )
+	stamp = datetime.datetime.now().strftime( '%Y%m%d-%H%M%S-%f' )
+	return archive_path / f'{kind}-{stamp}{suffix}'
+
+def _write_durably( path: Path, write: Callable[[io.BufferedWriter],None] ) -> None:
+	''' nothing gets purged until its archive is completely on disk, so write to a tmp file, fsync, then rename into place '''
+	tmp = path.with_name( f'{path.name}.tmp' )
+	try:
+		with tmp.open( 'wb' ) as raw:
+			write( raw )
+			raw.flush()
+			os.fsync( raw.fileno() )
+		os.replace( tmp, path )
+	finally:
+		if tmp.exists():
+			tmp.unlink()
+
+def _record( result: RESULT ) -> None:
+	''' keep result for metrics(), on disk too so the other process can report it '''
+	log = logger.getChild( '_record' )
+	g_last[result.kind] = result
+	data = json.dumps( result.to_json() ).encode( 'utf-8' )
+	def _write( raw: io.BufferedWriter ) -> None:
+		raw.write( data )
+	try:
+		g_results_path.mkdir( mode = 0o770, parents = True, exist_ok = True )
+		_write_durably( g_results_path / f'{result.kind}.json', _write )
+	except OSError:
+		log.exception( 'Unable to save %s retention result to %r:', result.kind, str( g_results_path ))
+
+def archive_rows( archive_path: Path, kind: str, keyname: str, rows: Seq[Tuple[repo.REPOID,Dict[str,Any]]] ) -> Path:
+	''' write rows to a gzip'ed json-lines file, one row per line '''
+	path = _archive_name( archive_path, kind, '.jsonl.gz' )
+	def _write( raw: io.BufferedWriter ) -> None:
+		with gzip.GzipFile( fileobj = raw, mode = 'wb' ) as gz:
+			for id, row in rows:
+				line = json.dumps({ keyname: id, **row }, default = str )
+				gz.write( f'{line}\n'.encode( 'utf-8' ))
+	_write_durably( path, _write )
+	return path
+
+def archive_files( archive_path: Path, kind: str, base: Path, files: Seq[Path] ) -> Path:
+	''' tar.gz files, named relative to base '''
+	path = _archive_name( archive_path, kind, '.tar.gz' )
+	def _write( raw: io.BufferedWriter ) -> None:
+		with tarfile.open( fileobj = raw, mode = 'w:gz' ) as tar:
+			for file in files:
+				try:
+					tar.add( str( file ), arcname = str( file.relative_to( base )))
+				except FileNotFoundError:
+					pass
+	_write_durably( path, _write )
+	return path
+
+def purge_repo(
+	ctr: repo.Connector,
+	kind: str,
+	repository: repo.Repository,
+	field: str,
+	days: int,
+	*,
+	batch_size: int,
+	archive_path: Opt[Path],
+	dry_run: bool,
+	audit: auditing.Audit,
+	exclude: Opt[Dict[str,Seq[Any]]] = None,
+) -> RESULT:
+	''' delete rows whose field is more than days old, batch_size rows per transaction so no lock is held for long '''
+	log = logger.getChild( 'purge_repo' )
+	start = time.monotonic()
+	result = RESULT( kind, dry_run )
+	when = cutoff( days )
+	before: Any = when.strftime( DATETIME_FORMAT ) if isinstance( repository.fields[field], repo.SqlDateTime ) else when.timestamp()
+	if dry_run:
+		result.expired = repository.count_expired( ctr, field, before, exclude = exclude )
+		log.info( 'dry run: would purge %r %s older than %s', result.expired, kind, when )
+	else:
+		while True:
+			rows = repository.expired( ctr, field, before, limit = batch_size, exclude = exclude )
+			if not rows:
+				break
+			result.expired += len( rows )
+			if archive_path is not None:
+				result.archives.append( str( archive_rows( archive_path, kind, repository.keyname, rows )))
+			qty = repository.purge( ctr, [ id for id, _ in rows ], audit = audit )
+			result.purged += qty
+			if len( rows ) < batch_size or not qty:
+				break
+			time.sleep( BATCH_PAUSE_SECONDS )
+		if result.purged:
+			log.info( 'purged %r %s older than %s', result.purged, kind, when )
+	result.seconds = time.monotonic() - start
+	_record( result )
+	return result
+
+def purge_files(
+	kind: str,
+	base: Path,
+	files: Seq[Path],
+	*,
+	batch_size: int,
+	archive_path: Opt[Path],
+	dry_run: bool,
+	audit: auditing.Audit,
+	unlink: Callable[[Path],None] = Path.unlink,
+) -> RESULT:
+	''' delete files (oldest first) batch_size at a time, archiving each batch first if archive_path is set '''
+	log = logger.getChild( 'purge_files' )
+	start = time.monotonic()
+	result = RESULT( kind, dry_run, expired = len( files ))
+	if dry_run:
+		log.info( 'dry run: would purge %r %s from %r', len( files ), kind, str( base ))
+	else:
+		for i in range( 0, len( files ), batch_size ):
+			if i:
+				time.sleep( BATCH_PAUSE_SECONDS )
+			batch = files[i:i+batch_size]
+			if archive_path is not None:
+				result.archives.append( str( archive_files( archive_path, kind, base, batch )))
+			for file in batch:
+				try:
+					unlink( file )
+				except FileNotFoundError:
+					continue
+				result.purged += 1
+		if result.purged:
+			log.info( 'purged %r %s from %r', result.purged, kind, str( base ))
+			audit.audit( f'Purged {result.purged!r} {kind} from {str(base)!r}' )
+	result.seconds = time.monotonic() - start
+	_record( result )
+	return result
+
+def expired_audit_logs( audit_path: Path, days: int ) -> List[Path]:
+	''' audit logs are one file per day, so a file's mtime is the last time anything was audited in it '''
+	limit = cutoff( days ).timestamp()
+	found: List[Tuple[float,Path]] = []
+	try:
+		entries = list( os.scandir( audit_path ))
+	except FileNotFoundError:
+		return []
+	for entry in entries:
+		try:
+			if not entry.is_file():
+				continue
+			mtime = entry.stat().st_mtime
+		except FileNotFoundError:
+			continue
+		if mtime < limit:
+			found.append(( mtime, Path( entry.path )))
+	found.sort()
+	return [ path for _, path in found ]
+
+def expired_messages( msgs_path: PurePosixPath, days: int ) -> List[Path]:
+	''' new and saved messages (not greetings) recorded more than days ago, oldest first '''
+	limit = cutoff( days )
+	found: List[Tuple[datetime.datetime,Path]] = []
+	try:
+		boxes = [ name for name in os.listdir( msgs_path ) if name.isdigit() ]
+	except FileNotFoundError:
+		return []
+	for box in boxes:
+		box_path = msgs_path / box
+		try:
+			names = os.listdir( box_path )
+		except FileNotFoundError:
+			continue
+		for name in names:
+			if not name.endswith(( '-new.wav', '-saved.wav' )):
+				continue
+			try:
+				msg = ace_voicemail.parse_recording_path( box_path, name )
+				stamp = datetime.datetime( msg.year, msg.month, msg.day, msg.hour, msg.minute, msg.second )
+			except ( IndexError, ValueError ):
+				continue
+			if stamp < limit:
+				found.append(( stamp, Path( str( box_path / name ))))
+	found.sort()
+	return [ path for _, path in found ]
+
+def did_recordings( preannounce_path: Path, did: int ) -> List[Path]:
+	''' every preannounce the engine could pick for this did: {did}.wav and {did}_{flag or tod}.wav '''
+	try:
+		names = os.listdir( preannounce_path )
+	except FileNotFoundError:
+		return []
+	return sorted(
+		preannounce_path / name for name in names
+		if name == f'{did}.wav' or ( name.startswith( f'{did}_' ) and name.endswith( '.wav' ))
+	)
+
+def purge_did_recordings( preannounce_path: Path, did: int, *, archive_path: Opt[Path], audit: auditing.Audit ) -> RESULT:
+	return purge_files( f'did-{did}-recordings', preannounce_path, did_recordings( preannounce_path, did ),
+		batch_size = 1000,
+		archive_path = archive_path,
+		dry_run = False,
+		audit = audit,
+	)
+
+def _archive_path( settings: ace_settings.Settings ) -> Opt[Path]:
+	return Path( settings.retention_archive_path ) if settings.retention_archive_path.strip() else None
+
+def purge_all(
+	settings: ace_settings.Settings,
+	repos: Dict[str,Tuple[repo.Repository,str]],
+	audit_path: Path,
+	audit: auditing.Audit,
+) -> List[RESULT]:
+	''' one retention pass over the tables in repos ( kind -> ( repository, age field )) and the audit logs '''
+	log = logger.getChild( 'purge_all' )
+	archive_path = _archive_path( settings )
+	results: List[RESULT] = []
+	for kind, ( repository, fld ) in repos.items():
+		days: int = getattr( settings, f'retention_{kind}_days' )
+		if days <= 0:
+			continue
+		# a notification that hasn't gone out yet isn't history, whatever its age
+		exclude: Opt[Dict[str,Seq[Any]]] = { 'status': ( 'queued', 'running' )} if kind == 'notify' else None
+		try:
+			with repo.Connector() as ctr:
+				results.append( purge_repo( ctr, kind, repository, fld, days,
+					batch_size = settings.retention_batch_size,
+					archive_path = archive_path,
+					dry_run = settings.retention_dry_run,
+					audit = audit,
+					exclude = exclude,
+				))
+		except Exception:
+			log.exception( 'Unable to purge %s:', kind )
+	if settings.retention_audit_days > 0:
+		try:
+			results.append( purge_files( 'audit', audit_path, expired_audit_logs( audit_path, settings.retention_audit_days ),
+				batch_size = settings.retention_batch_size,
+				archive_path = archive_path,
+				dry_run = settings.retention_dry_run,
+				audit = audit,
+			))
+		except Exception:
+			log.exception( 'Unable to purge audit logs:' )
+	return results
+
+def run( repos: Dict[str,Tuple[repo.Repository,str]], audit_path: Path ) -> None:
+	''' web ui thread: purge the tables and audit logs every hour '''
+	log = logger.getChild( 'run' )
+	audit = auditing.Audit( user = 'retention', remote_addr = '127.0.0.1' )
+	while True:
+		try:
+			purge_all( ace_settings.load(), repos, audit_path, audit )
+		except Exception:
+			log.exception( 'Unexpected error applying retention policy:' )
+		time.sleep( INTERVAL_SECONDS )
+
+async def purge_voicemail( settings: ace_settings.Settings ) -> RESULT:
+	''' engine side, because the engine's box indexes have to forget the messages we delete '''
+	loop = asyncio.get_running_loop()
+	msgs_path = ace_voicemail.g_msgs_path
+	files = await loop.run_in_executor( None, expired_messages, msgs_path, settings.retention_vm_days )
+	result: RESULT = await loop.run_in_executor( None, lambda: purge_files( 'vm', Path( str( msgs_path )), files,
+		batch_size = settings.retention_batch_size,
+		archive_path = _archive_path( settings ),
+		dry_run = settings.retention_dry_run,
+		audit = auditing.NoAudit(),
+		unlink = lambda file: ace_voicemail.remove_message( PurePosixPath( str( file ))),
+	))
+	if result.purged:
+		for box in { file.parent.name for file in files }:
+			ace_voicemail.forget_index( int( box ))
+		for file in files:
+			await ace_transcode.forget( PurePosixPath( str( file )))
+	return result
+
+async def run_voicemail() -> None:
+	''' engine task: purge old voicemail messages every hour while retention_vm_days is set '''
+	log = logger.getChild( 'run_voicemail' )
+	while True:
+		try:
+			settings = await ace_settings.aload()
+			if settings.retention_vm_days > 0:
+				await purge_voicemail( settings )
+		except Exception:
+			log.exception( 'Unexpected error purging old voicemail:' )
+		await asyncio.sleep( INTERVAL_SECONDS )
+
+def metrics() -> Dict[str,Any]:
+	''' the most recent result for each kind of data, whichever process purged it '''
+	log = logger.getChild( 'metrics' )
+	results: Dict[str,Any] = { kind: result.to_json() for kind, result in g_last.items() }
+	try:
+		paths = list( g_results_path.glob( '*.json' ))
+	except OSError:
+		paths = []
+	for path in paths:
+		try:
+			with path.open( 'r' ) as f:
+				results[path.stem] = json.loads( f.read() )
+		except FileNotFoundError:
+			continue
+		except ( OSError, ValueError ):
+			log.exception( 'Unable to load retention result %r:', str( path ))
+	return results
@@ -16,7 +16,9 @@ from typing_extensions import Literal # Python 3.7
 
 # local imports:
 from timed_lru_cache import timed_lru_cache
-from tts import TTS, TTS_VOICES, tts_voices
+from tts import Backend, TTS, TTS_VOICES, tts_voices
+from tts_espeak import Espeak
+from tts_polly import Polly
 
 logger = logging.getLogger( __name__ )
 
@@ -165,6 +167,14 @@ class Settings:
 		description = 'VM use TTS',
 		editor = BoolEditor(),
 	))
+	vm_tier_after_days: int = field( default = 0, metadata = SettingMeta(
+		description = 'VM Compress Saved Messages Older Than (days, 0 = never)',
+		editor = IntEditor( min = 0, max = 36500 ),
+	))
+	vm_tier_mb_per_second: int = field( default = 4, metadata = SettingMeta(
+		description = 'VM Compression Disk Budget (MB/s)',
+		editor = IntEditor( min = 1, max = 1000 ),
+	))
 	voice_deliver_ani: str = field( default = '', metadata = SettingMeta(
 		description = 'Voice Delivery Caller-ID',
 		editor = StrEditor(),
@@ -257,6 +267,50 @@ class Settings:
 		description = 'SMS Default Message',
 		editor = StrEditor(),
 	))
+	sms_timeout_seconds: int = field( default = 30, metadata = SettingMeta(
+		description = 'SMS Timeout (seconds)',
+		editor = IntEditor( min = 1, max = 600 ),
+	))
+	sms_max_connections: int = field( default = 4, metadata = SettingMeta(
+		description = 'SMS Max Concurrent Requests',
+		editor = IntEditor( min = 1, max = 100 ),
+	))
+	sms_max_per_second: int = field( default = 0, metadata = SettingMeta(
+		description = 'SMS Max Messages per Second (0 = no limit)',
+		editor = IntEditor( min = 0, max = 1000 ),
+	))
+	notify_workers: int = field( default = 4, metadata = SettingMeta(
+		description = 'VM Notification Workers',
+		editor = IntEditor( min = 1, max = 100 ),
+	))
+	notify_email_workers: int = field( default = 2, metadata = SettingMeta(
+		description = 'VM Notification Email Workers',
+		editor = IntEditor( min = 1, max = 100 ),
+	))
+	notify_sms_workers: int = field( default = 2, metadata = SettingMeta(
+		description = 'VM Notification SMS Workers',
+		editor = IntEditor( min = 1, max = 100 ),
+	))
+	notify_voice_workers: int = field( default = 2, metadata = SettingMeta(
+		description = 'VM Notification Voice Delivery Workers',
+		editor = IntEditor( min = 1, max = 100 ),
+	))
+	notify_max_attempts: int = field( default = 5, metadata = SettingMeta(
+		description = 'VM Notification Max Attempts',
+		editor = IntEditor( min = 1, max = 100 ),
+	))
+	notify_retry_seconds: int = field( default = 30, metadata = SettingMeta(
+		description = 'VM Notification Retry Delay (seconds, doubles each attempt)',
+		editor = IntEditor( min = 1, max = 86400 ),
+	))
+	tts_engine: Literal['polly','espeak'] = field( default = 'polly', metadata = SettingMeta(
+		description = 'TTS Engine (espeak runs locally without network access)',
+		editor = ChoiceEditor([ 'polly', 'espeak' ]),
+	))
+	tts_espeak_voice: str = field( default = 'en-us', metadata = SettingMeta(
+		description = 'TTS espeak Voice',
+		editor = StrEditor(),
+	))
 	tts_aws_access_key: str = field( default = '', metadata = SettingMeta(
 		description = 'TTS AWS Access Key',
 		editor = StrEditor(),
@@ -277,19 +331,72 @@ class Settings:
 		description = 'TTS AWS Default Voice',
 		editor = ChoiceEditor( list( tts_voices )),
 	))
+	tts_cache_max_mb: int = field( default = 1000, metadata = SettingMeta(
+		description = 'TTS Cache Max Size (MB, 0 = no limit)',
+		editor = IntEditor( min = 0, max = 1000000 ),
+	))
+	tts_cache_max_age_days: int = field( default = 180, metadata = SettingMeta(
+		description = 'TTS Cache Max Age Since Last Use (days, 0 = no limit)',
+		editor = IntEditor( min = 0, max = 36500 ),
+	))
+	transcode_cache_path: str = field( default = '/var/cache/itas/ace/transcode', metadata = SettingMeta(
+		description = 'Voicemail Attachment Transcode Cache Path',
+		editor = StrEditor(),
+	))
+	retention_car_days: int = field( default = 0, metadata = SettingMeta(
+		description = 'Purge Call Activity Records Older Than (days, 0 = never)',
+		editor = IntEditor( min = 0, max = 36500 ),
+	))
+	retention_cdr_days: int = field( default = 0, metadata = SettingMeta(
+		description = 'Purge CDRs Older Than (days, 0 = never)',
+		editor = IntEditor( min = 0, max = 36500 ),
+	))
+	retention_notify_days: int = field( default = 0, metadata = SettingMeta(
+		description = 'Purge Notifications Older Than (days, 0 = never)',
+		editor = IntEditor( min = 0, max = 36500 ),
+	))
+	retention_audit_days: int = field( default = 0, metadata = SettingMeta(
+		description = 'Purge Audit Logs Older Than (days, 0 = never)',
+		editor = IntEditor( min = 0, max = 36500 ),
+	))
+	retention_vm_days: int = field( default = 0, metadata = SettingMeta(
+		description = 'Purge VM Messages Older Than (days, 0 = never)',
+		editor = IntEditor( min = 0, max = 36500 ),
+	))
+	retention_batch_size: int = field( default = 500, metadata = SettingMeta(
+		description = 'Retention Purge Batch Size',
+		editor = IntEditor( min = 1, max = 10000 ),
+	))
+	retention_archive_path: str = field( default = '', metadata = SettingMeta(
+		description = 'Retention Archive Path (blank = purge without archiving)',
+		editor = StrEditor(),
+	))
+	retention_dry_run: bool = field( default = False, metadata = SettingMeta(
+		description = 'Retention Dry Run (only log what would be purged)',
+		editor = BoolEditor(),
+	))
 	motd: str = field( default = "Don't Panic!", metadata = SettingMeta(
 		description = 'MOTD',
 		editor = StrEditor(),
 	))
 	
 	def tts( self, voice: Opt[str] = None ) -> TTS:
+		backend: Backend
+		if self.tts_engine == 'espeak':
+			backend = Espeak( self.tts_espeak_voice )
+		else:
+			backend = Polly(
+				self.tts_aws_access_key,
+				self.tts_aws_secret_key,
+				self.tts_aws_region_name,
+				self.tts_aws_default_voice,
+			)
 		return TTS(
-			self.tts_aws_access_key,
-			self.tts_aws_secret_key,
-			self.tts_aws_region_name,
+			backend,
 			Path( self.tts_aws_cache_location ),
-			self.tts_aws_default_voice,
 			voice,
+			cache_max_bytes = self.tts_cache_max_mb * 1048576,
+			cache_max_age_seconds = self.tts_cache_max_age_days * 86400,
 		)
 
 def init( settings_path: Path, lock: MPLock ) -> None:
@@ -0,0 +1,153 @@
+# stdlib imports:
+import asyncio
+from dataclasses import dataclass
+import logging
+import time
+from typing import Dict, List, Mapping as Map, Optional as Opt, Tuple
+
+# 3rd-party imports:
+import aiohttp # pip install aiohttp
+
+# local imports:
+import ace_settings
+
+logger = logging.getLogger( __name__ )
+
+KEEPALIVE_SECONDS = 60
+DNS_CACHE_SECONDS = 300
+
+@dataclass
+class REQUEST:
+	url: str
+	headers: Dict[str,str]
+	formdata: Dict[str,str]
+	future: 'asyncio.Future[Tuple[int,str]]'
+
+class Carrier:
+	''' keep-alive connection pool and send queue for one sms carrier '''
+	def __init__( self, name: str, settings: ace_settings.Settings ) -> None:
+		self.name = name
+		self.key = self._key( settings )
+		self.connections = max( 1, settings.sms_max_connections )
+		self.max_per_second = max( 0, settings.sms_max_per_second )
+		self.session = aiohttp.ClientSession(
+			connector = aiohttp.TCPConnector(
+				limit = self.connections,
+				keepalive_timeout = KEEPALIVE_SECONDS,
+				ttl_dns_cache = DNS_CACHE_SECONDS,
+			),
+			timeout = aiohttp.ClientTimeout( total = settings.sms_timeout_seconds ),
+		)
+		self.queue: 'asyncio.Queue[REQUEST]' = asyncio.Queue()
+		self.next_send = 0.0
+		self.in_flight: Dict[int,REQUEST] = {} # id( rq ) -> rq, the requests the workers are posting right now
+		self.workers = [
+			asyncio.create_task( self._worker() ) for _ in range( self.connections )
+		]
+	
+	@staticmethod
+	def _key( settings: ace_settings.Settings ) -> Tuple[int,int,int]:
+		return ( settings.sms_max_connections, settings.sms_max_per_second, settings.sms_timeout_seconds )
+	
+	async def close( self ) -> None:
+		# fail in-flight requests before cancelling their workers, a CancelledError on
+		# a caller's future would sail right past its "except Exception"
+		reconfigured = f'{self.name} sms client was reconfigured'
+		for rq in list( self.in_flight.values() ):
+			if not rq.future.done():
+				rq.future.set_exception( aiohttp.ClientError( reconfigured ))
+		for worker in self.workers:
+			worker.cancel()
+		await asyncio.gather( *self.workers, return_exceptions = True )
+		while not self.queue.empty():
+			rq = self.queue.get_nowait()
+			if not rq.future.done():
+				rq.future.set_exception( aiohttp.ClientError( reconfigured ))
+		await self.session.close()
+	
+	async def _pace( self ) -> None:
+		if not self.max_per_second:
+			return
+		now = time.monotonic()
+		when = max( now, self.next_send )
+		self.next_send = when + 1.0 / self.max_per_second
+		if when > now:
+			await asyncio.sleep( when - now )
+	
+	async def _worker( self ) -> None:
+		log = logger.getChild( 'Carrier._worker' )
+		while True:
+			rq = await self.queue.get()
+			if rq.future.done(): # caller gave up waiting
+				continue
+			self.in_flight[id( rq )] = rq
+			try:
+				await self._pace()
+				start = time.monotonic()
+				async with self.session.post( rq.url, headers = rq.headers, data = rq.formdata ) as rsp:
+					text = await rsp.text()
+				log.debug( '%s sms post took %.0fms, %r still queued',
+					self.name, ( time.monotonic() - start ) * 1000, self.queue.qsize(),
+				)
+			except BaseException as e:
+				if not rq.future.done():
+					rq.future.set_exception( e )
+				if not isinstance( e, Exception ):
+					raise
+			else:
+				if not rq.future.done():
+					rq.future.set_result(( rsp.status, text ))
+			finally:
+				del self.in_flight[id( rq )]
+
+g_carriers: Dict[str,Carrier] = {}
+
+async def _carrier( name: str, settings: ace_settings.Settings ) -> Carrier:
+	old = g_carriers.get( name )
+	if old is not None and old.key == Carrier._key( settings ):
+		return old
+	# register the replacement before awaiting anything, so a post racing this one finds it instead of building another
+	carrier = g_carriers[name] = Carrier( name, settings )
+	if old is not None:
+		await old.close()
+	return carrier
+
+async def post(
+	settings: ace_settings.Settings,
+	carrier: str,
+	url: str,
+	headers: Map[str,str],
+	formdata: Map[str,str],
+) -> Tuple[int,str]:
+	''' queue a form post to an sms carrier on its pooled session and return ( status, text ) of the response '''
+	c = await _carrier( carrier, settings )
+	future: 'asyncio.Future[Tuple[int,str]]' = asyncio.get_running_loop().create_future()
+	c.queue.put_nowait( REQUEST( url, dict( headers ), dict( formdata ), future ))
+	return await future
+
+async def close() -> None:
+	for carrier in list( g_carriers.values() ):
+		await carrier.close()
+	g_carriers.clear()
+
+if __name__ == '__main__':
+	# fan out against sms_emulators.py: python3 ace_sms.py [count]
+	import sys
+	
+	async def amain( count: int ) -> None:
+		settings = ace_settings.Settings()
+		rqs: List[Tuple[str,Map[str,str],Map[str,str]]] = [
+			( 'http://127.0.0.1:8080/twilio/send', {}, { 'From': '+15555550100', 'To': f'+1555555{i:04}', 'Body': 'test' })
+			for i in range( count )
+		]
+		start = time.monotonic()
+		results = await asyncio.gather( *(
+			post( settings, 'twilio', url, headers, formdata ) for url, headers, formdata in rqs
+		), return_exceptions = True )
+		elapsed = time.monotonic() - start
+		errors = sum( 1 for r in results if isinstance( r, BaseException ))
+		print( f'{count} posts in {elapsed:.2f}s ({count/elapsed:.1f}/s), {errors} errors' )
+		await close()
+	
+	logging.basicConfig( level = logging.INFO )
+	asyncio.run( amain( int( sys.argv[1] ) if len( sys.argv ) > 1 else 20 ))
@@ -0,0 +1,136 @@
+# stdlib imports:
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+from typing import (
+	Callable, Dict, Iterable, List, Optional as Opt, Sequence as Seq, Tuple,
+	Union,
+)
+
+# local imports:
+import ace_settings
+import smtplib2
+
+logger = logging.getLogger( __name__ )
+
+MAX_IDLE_SECONDS = 60 # most servers drop idle sessions after a few minutes, don't push our luck
+
+SMTP = Union[smtplib2.SMTP,smtplib2.SMTP_SSL]
+KEY = Tuple[str,int,str,str,str]
+MSG = Union[bytes,Callable[[],Iterable[bytes]]] # a callable is called once per attempt to stream the message
+
+g_lock = threading.Lock()
+g_idle: List[Tuple[KEY,SMTP,float]] = []
+g_executor: Opt[ThreadPoolExecutor] = None
+
+def _key( settings: ace_settings.Settings ) -> KEY:
+	return (
+		settings.smtp_host,
+		settings.smtp_port,
+		settings.smtp_secure,
+		settings.smtp_username,
+		settings.smtp_password,
+	)
+
+def _connect( settings: ace_settings.Settings ) -> SMTP:
+	if settings.smtp_secure == 'yes':
+		smtp: SMTP = smtplib2.SMTP_SSL(
+			settings.smtp_host,
+			settings.smtp_port or 465,
+			timeout = settings.smtp_timeout_seconds,
+		)
+	else:
+		smtp = smtplib2.SMTP(
+			settings.smtp_host,
+			settings.smtp_port or 587,
+			timeout = settings.smtp_timeout_seconds,
+		)
+	try:
+		if settings.smtp_username or settings.smtp_password:
+			assert settings.smtp_username and settings.smtp_password
+			smtp.login( settings.smtp_username, settings.smtp_password )
+	except BaseException:
+		smtp.close()
+		raise
+	return smtp
+
+def _discard( smtp: SMTP ) -> None:
+	log = logger.getChild( '_discard' )
+	try:
+		smtp.quit()
+	except Exception as e:
+		log.debug( 'ignoring error closing smtp connection: %r', e )
+		smtp.close()
+
+def _checkout( key: KEY ) -> Opt[SMTP]:
+	now = time.monotonic()
+	stale: List[SMTP] = []
+	found: Opt[SMTP] = None
+	with g_lock:
+		for i, ( key2, smtp, when ) in reversed( list( enumerate( g_idle ))):
+			if now - when > MAX_IDLE_SECONDS:
+				stale.append( smtp )
+				del g_idle[i]
+			elif found is None and key2 == key:
+				found = smtp
+				del g_idle[i]
+	for smtp in stale:
+		_discard( smtp )
+	return found
+
+def _checkin( key: KEY, smtp: SMTP, size: int ) -> None:
+	with g_lock:
+		if len( g_idle ) < size:
+			g_idle.append(( key, smtp, time.monotonic() ))
+			return
+	_discard( smtp )
+
+def _sendmail(
+	settings: ace_settings.Settings,
+	from_addr: str,
+	to_addrs: Seq[str],
+	msg: MSG,
+) -> Tuple[str,Dict[str,Tuple[int,str]]]:
+	log = logger.getChild( '_sendmail' )
+	key = _key( settings )
+	smtp = _checkout( key )
+	reused = smtp is not None
+	if smtp is None:
+		smtp = _connect( settings )
+	try:
+		try:
+			result = smtp.sendmail2( from_addr, to_addrs, msg() if callable( msg ) else msg )
+		except ( smtplib2.SMTPServerDisconnected, OSError ) as e:
+			if not reused:
+				raise
+			# the server gave up on our idle connection, try once more on a fresh one
+			log.info( 'pooled smtp connection went bad (%r), reconnecting', e )
+			smtp.close()
+			smtp = _connect( settings )
+			result = smtp.sendmail2( from_addr, to_addrs, msg() if callable( msg ) else msg )
+	except ( smtplib2.SMTPResponseException, smtplib2.SMTPRecipientsRefused ):
+		_checkin( key, smtp, settings.notify_email_workers ) # sendmail2 already RSET the session so it's still good
+		raise
+	except BaseException:
+		smtp.close()
+		raise
+	_checkin( key, smtp, settings.notify_email_workers )
+	return result
+
+async def sendmail(
+	settings: ace_settings.Settings,
+	from_addr: str,
+	to_addrs: Seq[str],
+	msg: MSG,
+) -> Tuple[str,Dict[str,Tuple[int,str]]]:
+	''' send an email on one of our smtp threads using a pooled connection, the event loop never waits on the smtp server '''
+	global g_executor
+	if g_executor is None:
+		g_executor = ThreadPoolExecutor(
+			max_workers = max( 1, settings.notify_email_workers ),
+			thread_name_prefix = 'smtp',
+		)
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor( g_executor, _sendmail, settings, from_addr, to_addrs, msg )
@@ -0,0 +1,184 @@
+# stdlib imports:
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import hashlib
+import logging
+import os
+from pathlib import Path, PurePosixPath
+import time
+from typing import Any, Awaitable, Dict, Iterator, Optional as Opt, Union
+
+# 3rd-party imports:
+import pydub # pip install pydub
+
+# local imports:
+import ace_settings
+
+logger = logging.getLogger( __name__ )
+
+WORKERS = 2 # encoding is cpu bound, don't let a burst of voicemails starve freeswitch
+MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+PRUNE_INTERVAL_SECONDS = 60 * 60
+
+g_cache_path: Opt[Path] = None # overrides the transcode_cache_path setting, the benchmark below uses this
+g_executor: Opt[ProcessPoolExecutor] = None
+g_pending: Dict[Path,'asyncio.Future[Path]'] = {}
+g_in_use: Dict[Path,int] = {} # cached copies somebody is still reading, see using()
+g_next_prune: float = 0.0
+
+async def _cache_path() -> Path:
+	if g_cache_path is not None:
+		return g_cache_path
+	settings = await ace_settings.aload()
+	return Path( settings.transcode_cache_path )
+
+def _path_key( path: Union[Path,PurePosixPath] ) -> str:
+	return hashlib.sha1( str( path ).encode( 'utf-8' )).hexdigest()
+
+def _encode( src: str, dst: str, fmt: str ) -> float:
+	# NOTE: this runs in a child process
+	start = time.monotonic()
+	tmp = f'{dst}.tmp'
+	pydub.AudioSegment.from_wav( src ).export( tmp, format = fmt )
+	os.replace( tmp, dst )
+	return time.monotonic() - start
+
+def _touch( cached: Path ) -> bool:
+	''' mark a cache hit by bumping its mtime, atime can't be trusted on noatime or relatime mounts '''
+	try:
+		os.utime( cached )
+		return True
+	except FileNotFoundError:
+		return False
+
+def _prune( cache_path: Path, max_age: float ) -> int:
+	qty = 0
+	cutoff = time.time() - max_age
+	for item in cache_path.iterdir():
+		if item in g_pending or item in g_in_use:
+			continue
+		try:
+			if item.stat().st_mtime < cutoff:
+				item.unlink()
+				qty += 1
+		except FileNotFoundError:
+			pass
+	return qty
+
+def _forget( cache_path: Path, key: str ) -> None:
+	for item in cache_path.glob( f'{key}-*' ):
+		try:
+			item.unlink()
+		except FileNotFoundError:
+			pass
+
+async def transcode( path: Union[Path,PurePosixPath], fmt: str ) -> Path:
+	''' return a copy of wav file path in the requested format, encoding it only if we haven't already '''
+	global g_executor, g_next_prune
+	log = logger.getChild( 'transcode' )
+	loop = asyncio.get_running_loop()
+	
+	cache_path = await _cache_path()
+	st = await loop.run_in_executor( None, os.stat, str( path ))
+	cached = cache_path / f'{_path_key(path)}-{st.st_mtime_ns}.{fmt}'
+	
+	pending = g_pending.get( cached )
+	if pending is not None:
+		return await asyncio.shield( pending )
+	if await loop.run_in_executor( None, _touch, cached ):
+		log.debug( 'cache hit for %r as %s', str( path ), fmt )
+		return cached
+	
+	future: asyncio.Future[Path] = loop.create_future()
+	g_pending[cached] = future
+	try:
+		await loop.run_in_executor( None, lambda: cache_path.mkdir( mode = 0o770, parents = True, exist_ok = True ))
+		if g_executor is None:
+			g_executor = ProcessPoolExecutor( max_workers = WORKERS )
+		queued = time.monotonic()
+		seconds = await loop.run_in_executor( g_executor, _encode, str( path ), str( cached ), fmt )
+		log.info( 'encoded %r as %s in %.2fs (%.2fs including queue)',
+			str( path ), fmt, seconds, time.monotonic() - queued,
+		)
+		future.set_result( cached )
+	except BaseException as e:
+		future.set_exception( e )
+		future.exception() # mark it retrieved so nobody warns about it if there were no other waiters
+		raise
+	finally:
+		del g_pending[cached]
+	
+	if time.time() >= g_next_prune:
+		g_next_prune = time.time() + PRUNE_INTERVAL_SECONDS
+		qty = await loop.run_in_executor( None, _prune, cache_path, MAX_AGE_SECONDS )
+		if qty:
+			log.info( 'pruned %r stale transcode(s)', qty )
+	return cached
+
+@contextmanager
+def using( cached: Opt[Path] ) -> Iterator[None]:
+	''' keep the pruner away from a transcode() result until the caller is done reading it '''
+	if cached is None:
+		yield
+		return
+	g_in_use[cached] = g_in_use.get( cached, 0 ) + 1
+	try:
+		yield
+	finally:
+		g_in_use[cached] -= 1
+		if not g_in_use[cached]:
+			del g_in_use[cached]
+
+async def forget( path: Union[Path,PurePosixPath] ) -> None:
+	''' discard any cached transcodes of path, call this when a message is deleted or renamed '''
+	loop = asyncio.get_running_loop()
+	await loop.run_in_executor( None, _forget, await _cache_path(), _path_key( path ))
+
+if __name__ == '__main__':
+	# benchmark: python3 ace_transcode.py <wav file> [concurrency]
+	import shutil
+	import sys
+	import tempfile
+	
+	async def amain( wav: Path, concurrency: int ) -> None:
+		global g_cache_path
+		lags: list[float] = []
+		done = False
+		
+		async def _ticker() -> None:
+			while not done:
+				before = time.monotonic()
+				await asyncio.sleep( 0.01 )
+				lags.append( time.monotonic() - before - 0.01 )
+		
+		async def _measure( label: str, coro: Awaitable[Any] ) -> None:
+			nonlocal done
+			lags.clear()
+			done = False
+			ticker = asyncio.create_task( _ticker() )
+			start = time.monotonic()
+			await coro
+			elapsed = time.monotonic() - start
+			done = True
+			await ticker
+			print( f'{label}: {elapsed:.2f}s total, event loop lag max {max(lags or [0])*1000:.0f}ms avg {sum(lags)/max(1,len(lags))*1000:.1f}ms' )
+		
+		with tempfile.TemporaryDirectory() as tmp:
+			g_cache_path = Path( tmp ) / 'cache'
+			copies = []
+			for i in range( concurrency ):
+				copy = Path( tmp ) / f'{i}.wav'
+				shutil.copy( wav, copy )
+				copies.append( copy )
+			
+			async def _inline() -> None:
+				for copy in copies:
+					pydub.AudioSegment.from_wav( str( copy )).export( str( copy.with_suffix( '.mp3' )), format = 'mp3' )
+			
+			await _measure( f'inline x{concurrency}', asyncio.ensure_future( _inline() ))
+			await _measure( f'pooled x{concurrency}', asyncio.gather( *( transcode( copy, 'mp3' ) for copy in copies )))
+			await _measure( f'cached x{concurrency}', asyncio.gather( *( transcode( copy, 'mp3' ) for copy in copies )))
+	
+	logging.basicConfig( level = logging.INFO )
+	asyncio.run( amain( Path( sys.argv[1] ), int( sys.argv[2] ) if len( sys.argv ) > 2 else 3 ))
@@ -2,6 +2,7 @@
 import asyncio
 import logging
 import os
+import time
 from pathlib import Path
 from typing import AsyncIterator, Callable, Optional as Opt
 from typing_extensions import Literal
@@ -97,3 +98,29 @@ async def pre_answer( esl: ESL, uuid: str, source: str ) -> bool:
 				on_event( event )
 	
 	return True # TODO FIXME: return False if call no longer exists...
+
+async def stall_monitor( *,
+	interval: float = 0.1,
+	threshold: float = 0.25,
+	report_seconds: float = 60,
+) -> None:
+	''' watch for anything blocking the event loop, logs each stall and a periodic summary '''
+	log = logger.getChild( 'stall_monitor' )
+	stalls = 0
+	worst = 0.0
+	next_report = time.monotonic() + report_seconds
+	while True:
+		before = time.monotonic()
+		await asyncio.sleep( interval )
+		now = time.monotonic()
+		lag = now - before - interval
+		if lag >= threshold:
+			stalls += 1
+			worst = max( worst, lag )
+			log.warning( 'event loop stalled for %.3f second(s)', lag )
+		if now >= next_report:
+			if stalls:
+				log.info( '%r stall(s) in the last %r seconds, worst was %.3f second(s)', stalls, report_seconds, worst )
+			stalls = 0
+			worst = 0.0
+			next_report = now + report_seconds
@@ -0,0 +1,149 @@
+# stdlib imports:
+from dataclasses import dataclass, field
+import datetime
+import logging
+import os
+from pathlib import PurePosixPath
+from threading import RLock
+import time
+from typing import Any, Dict, Iterable, Optional as Opt, Tuple
+
+# local imports:
+from ace_voicemail import MSG, parse_recording_path
+
+logger = logging.getLogger( __name__ )
+
+SETTLE_SECONDS = 2.0 # don't trust a folder's mtime until it's this old, a change in the same clock tick wouldn't move it
+
+@dataclass
+class BOXSTATS:
+	new: int = 0
+	saved: int = 0
+	urgent_new: int = 0
+	urgent_saved: int = 0
+	bytes: int = 0
+	oldest: Opt[datetime.datetime] = None
+	
+	def to_json( self ) -> Dict[str,Any]:
+		return {
+			'new': self.new,
+			'saved': self.saved,
+			'urgent_new': self.urgent_new,
+			'urgent_saved': self.urgent_saved,
+			'bytes': self.bytes,
+			'oldest': self.oldest.isoformat() if self.oldest else None,
+		}
+
+@dataclass
+class _BOX:
+	mtime_ns: Opt[int] = None # folder mtime when files was last refreshed, None forces a rescan
+	files: Dict[str,Tuple[MSG,int,int]] = field( default_factory = dict ) # name -> ( msg, size, inode )
+	stats: BOXSTATS = field( default_factory = BOXSTATS )
+
+def _stats( files: Dict[str,Tuple[MSG,int,int]] ) -> BOXSTATS:
+	stats = BOXSTATS()
+	for msg, size, _ in files.values():
+		urgent = msg.priority == 'urgent'
+		if msg.status == 'new':
+			stats.new += 1
+			stats.urgent_new += urgent
+		else:
+			stats.saved += 1
+			stats.urgent_saved += urgent
+		stats.bytes += size
+		try:
+			stamp = datetime.datetime( msg.year, msg.month, msg.day, msg.hour, msg.minute, msg.second )
+		except ValueError:
+			continue
+		if stats.oldest is None or stamp < stats.oldest:
+			stats.oldest = stamp
+	return stats
+
+class BoxStats:
+	''' message counts and sizes per box, only folders that changed since the last look are rescanned and only new or replaced files are stat'ed '''
+	def __init__( self, msgs_path: PurePosixPath ) -> None:
+		self.msgs_path = msgs_path
+		self.lock = RLock()
+		self.boxes: Dict[int,_BOX] = {}
+	
+	def _refresh( self, box: int ) -> BOXSTATS:
+		log = logger.getChild( 'BoxStats._refresh' )
+		path = self.msgs_path / str( box )
+		with self.lock:
+			cached = self.boxes.get( box )
+		try:
+			st = os.stat( path )
+		except FileNotFoundError:
+			with self.lock:
+				self.boxes.pop( box, None )
+			return BOXSTATS()
+		if cached is not None and cached.mtime_ns == st.st_mtime_ns:
+			return cached.stats
+		
+		old = cached.files if cached is not None else {}
+		files: Dict[str,Tuple[MSG,int,int]] = {}
+		try:
+			entries = list( os.scandir( path ))
+		except FileNotFoundError:
+			entries = []
+		for entry in entries:
+			name = entry.name
+			if not name.endswith(( '-new.wav', '-saved.wav' )):
+				continue # recordings in progress are -tmp.wav
+			prev = old.get( name )
+			if prev is not None and prev[2] == entry.inode():
+				# files are only ever renamed or replaced into place complete, so same name and inode means same size
+				files[name] = prev
+				continue
+			try:
+				msg = parse_recording_path( path, name )
+				size = entry.stat().st_size
+			except FileNotFoundError:
+				continue
+			except ( IndexError, ValueError ) as e:
+				log.debug( 'box %r ignoring %r: %r', box, name, e )
+				continue
+			files[name] = ( msg, size, entry.inode() )
+		
+		settled = time.time() - st.st_mtime > SETTLE_SECONDS
+		refreshed = _BOX( st.st_mtime_ns if settled else None, files, _stats( files ))
+		with self.lock:
+			self.boxes[box] = refreshed
+		return refreshed.stats
+	
+	def get( self, box: int ) -> BOXSTATS:
+		return self._refresh( box )
+	
+	def many( self, boxes: Iterable[int] ) -> Dict[int,BOXSTATS]:
+		return { box: self._refresh( box ) for box in boxes }
+	
+	def forget( self, box: int ) -> None:
+		with self.lock:
+			self.boxes.pop( box, None )
+	
+	def totals( self ) -> Dict[str,Any]:
+		''' stats summed over every box folder on disk '''
+		boxes = [ int( name ) for name in os.listdir( self.msgs_path ) if name.isdigit() ]
+		total = BOXSTATS()
+		for stats in self.many( boxes ).values():
+			total.new += stats.new
+			total.saved += stats.saved
+			total.urgent_new += stats.urgent_new
+			total.urgent_saved += stats.urgent_saved
+			total.bytes += stats.bytes
+			if stats.oldest is not None and ( total.oldest is None or stats.oldest < total.oldest ):
+				total.oldest = stats.oldest
+		return dict( total.to_json(), boxes = len( boxes ))
+
+if __name__ == '__main__':
+	import argparse
+	
+	parser = argparse.ArgumentParser( description = 'time a cold and a warm pass over every voicemail box' )
+	parser.add_argument( 'msgs_path', nargs = '?', default = '/usr/share/itas/ace/msgs/' )
+	args = parser.parse_args()
+	
+	bs = BoxStats( PurePosixPath( args.msgs_path ))
+	for label in ( 'cold', 'warm' ):
+		start = time.monotonic()
+		totals = bs.totals()
+		print( f'{label}: {time.monotonic() - start:.3f}s {totals!r}' )
@@ -0,0 +1,208 @@
+# stdlib imports:
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import logging
+import os
+from pathlib import PurePosixPath
+import shutil
+import struct
+import subprocess
+import time
+from typing import Any, Dict, List, Optional as Opt, Set, Tuple
+
+# 3rd-party imports:
+import pydub # pip install pydub
+
+# local imports:
+import ace_settings
+import ace_transcode
+import ace_voicemail
+
+logger = logging.getLogger( __name__ )
+
+CODEC = 'gsm_ms' # GSM 6.10 in a .wav, freeswitch's mod_sndfile plays it natively and it's ~1/10th the size of 16-bit pcm
+WAVE_FORMAT_PCM = 1
+INTERVAL_SECONDS = 60 * 60
+
+g_executor: Opt[ProcessPoolExecutor] = None
+g_no_gain: Set[str] = set() # files that didn't get any smaller, don't keep retrying them
+g_stats: Dict[str,Any] = {
+	'passes': 0,
+	'files': 0,
+	'bytes_before': 0,
+	'bytes_after': 0,
+	'seconds': 0.0,
+}
+
+def _lower_priority() -> None:
+	# NOTE: this runs in the child process, ffmpeg inherits it so encoding only gets the cpu and disk nobody else wants
+	os.nice( 19 )
+	ionice = shutil.which( 'ionice' )
+	if ionice:
+		subprocess.run([ ionice, '-c', '3', '-p', str( os.getpid() )], check = False )
+
+def _wav_format( path: str ) -> Opt[int]:
+	''' the format tag of a wav file's fmt chunk, None if it isn't a wav '''
+	with open( path, 'rb' ) as f:
+		header = f.read( 12 )
+		if len( header ) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+			return None
+		while True:
+			chunk = f.read( 8 )
+			if len( chunk ) < 8:
+				return None
+			chunk_id, chunk_size = struct.unpack( '<4sI', chunk )
+			if chunk_id == b'fmt ':
+				tag: int = struct.unpack( '<H', f.read( 2 ))[0]
+				return tag
+			f.seek( chunk_size + ( chunk_size & 1 ), os.SEEK_CUR )
+
+def _compress( path: str, mtime_ns: int ) -> Tuple[int,int,int]:
+	''' encode path into path.tier.tmp with the same permissions and timestamps, returns ( bytes before, bytes after, inode ),
+	the tmp file is only left behind for _swap when it came out smaller '''
+	# NOTE: this runs in the child process
+	st = os.stat( path )
+	if st.st_mtime_ns != mtime_ns:
+		return 0, 0, 0 # changed since we looked at it
+	tmp = f'{path}.tier.tmp'
+	try:
+		audio = pydub.AudioSegment.from_wav( path ).set_channels( 1 ).set_frame_rate( 8000 )
+		audio.export( tmp, format = 'wav', codec = CODEC )
+		after = os.stat( tmp ).st_size
+		if after >= st.st_size:
+			os.unlink( tmp )
+			return st.st_size, st.st_size, st.st_ino
+		os.chmod( tmp, st.st_mode & 0o777 )
+		try:
+			os.chown( tmp, st.st_uid, st.st_gid )
+		except PermissionError:
+			pass
+		os.utime( tmp, ns = ( st.st_atime_ns, st.st_mtime_ns ))
+		return st.st_size, after, st.st_ino
+	except BaseException:
+		if os.path.exists( tmp ):
+			os.unlink( tmp )
+		raise
+
+def _swap( path: str, ino: int, mtime_ns: int ) -> bool:
+	''' put the encoded copy in place, unless the message was saved, moved or deleted while it was encoding '''
+	tmp = f'{path}.tier.tmp'
+	try:
+		# the engine moves and deletes messages under the same lock, so nothing can slip in between the check and the replace
+		with ace_voicemail.box_lock( int( PurePosixPath( path ).parent.name )):
+			try:
+				st = os.stat( path )
+			except FileNotFoundError:
+				return False
+			if st.st_ino != ino or st.st_mtime_ns != mtime_ns:
+				return False
+			os.replace( tmp, path )
+			return True
+	finally:
+		if os.path.exists( tmp ):
+			os.unlink( tmp )
+
+def _candidates( msgs_path: PurePosixPath, cutoff: datetime.datetime ) -> List[Tuple[str,int]]:
+	''' saved messages recorded before cutoff that are still pcm, oldest first '''
+	found: List[Tuple[datetime.datetime,str,int]] = []
+	try:
+		boxes = [ name for name in os.listdir( msgs_path ) if name.isdigit() ]
+	except FileNotFoundError:
+		return []
+	for box in boxes:
+		box_path = msgs_path / box
+		try:
+			names = os.listdir( box_path )
+		except FileNotFoundError:
+			continue
+		for name in names:
+			if not name.endswith( '-saved.wav' ):
+				continue
+			path = str( box_path / name )
+			if path in g_no_gain:
+				continue
+			try:
+				msg = ace_voicemail.parse_recording_path( box_path, name )
+				stamp = datetime.datetime( msg.year, msg.month, msg.day, msg.hour, msg.minute, msg.second )
+			except ( IndexError, ValueError ):
+				continue
+			if stamp >= cutoff:
+				continue
+			try:
+				if _wav_format( path ) != WAVE_FORMAT_PCM:
+					continue
+				mtime_ns = os.stat( path ).st_mtime_ns
+			except OSError:
+				continue
+			found.append(( stamp, path, mtime_ns ))
+	found.sort()
+	return [( path, mtime_ns ) for _, path, mtime_ns in found ]
+
+async def tier( after_days: int, mb_per_second: int ) -> Dict[str,Any]:
+	''' compress every saved message older than after_days, pacing reads and writes to mb_per_second '''
+	global g_executor
+	log = logger.getChild( 'tier' )
+	loop = asyncio.get_running_loop()
+	cutoff = datetime.datetime.now() - datetime.timedelta( days = after_days )
+	candidates = await loop.run_in_executor( None, _candidates, ace_voicemail.g_msgs_path, cutoff )
+	if not candidates:
+		return { 'files': 0, 'bytes_before': 0, 'bytes_after': 0, 'seconds': 0.0 }
+	if g_executor is None:
+		g_executor = ProcessPoolExecutor( max_workers = 1, initializer = _lower_priority )
+	rate = max( 1, mb_per_second ) * 1048576
+	files = 0
+	bytes_before = 0
+	bytes_after = 0
+	start = time.monotonic()
+	for path, mtime_ns in candidates:
+		started = time.monotonic()
+		try:
+			before, after, ino = await loop.run_in_executor( g_executor, _compress, path, mtime_ns )
+			if before and after < before and not await loop.run_in_executor( None, _swap, path, ino, mtime_ns ):
+				continue
+		except FileNotFoundError:
+			continue
+		except Exception as e:
+			log.warning( 'unable to compress %r: %r', path, e )
+			g_no_gain.add( path )
+			continue
+		if before and after >= before:
+			g_no_gain.add( path )
+		elif before:
+			files += 1
+			bytes_before += before
+			bytes_after += after
+			await ace_transcode.forget( PurePosixPath( path )) # the mtime is preserved, so cached copies would otherwise look current
+		# pace ourselves so recording and playback never wait on the disk for us
+		await asyncio.sleep( max( 0.0, ( before + after ) / rate - ( time.monotonic() - started )))
+	seconds = time.monotonic() - start
+	result = {
+		'files': files,
+		'bytes_before': bytes_before,
+		'bytes_after': bytes_after,
+		'seconds': seconds,
+	}
+	g_stats['passes'] += 1
+	for k, v in result.items():
+		g_stats[k] += v
+	log.info( 'compressed %r of %r saved messages, reclaimed %.1fMB in %.0fs (%.2fMB/s read)',
+		files, len( candidates ), ( bytes_before - bytes_after ) / 1048576, seconds,
+		bytes_before / 1048576 / seconds if seconds else 0.0,
+	)
+	return result
+
+def metrics() -> Dict[str,Any]:
+	return dict( g_stats, bytes_reclaimed = g_stats['bytes_before'] - g_stats['bytes_after'] )
+
+async def run() -> None:
+	''' tier voicemail storage every hour while vm_tier_after_days is set '''
+	log = logger.getChild( 'run' )
+	while True:
+		try:
+			settings = await ace_settings.aload()
+			if settings.vm_tier_after_days > 0:
+				await tier( settings.vm_tier_after_days, settings.vm_tier_mb_per_second )
+		except Exception:
+			log.exception( 'Unexpected error tiering voicemail storage:' )
+		await asyncio.sleep( INTERVAL_SECONDS )
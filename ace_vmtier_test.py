@@ -0,0 +1,46 @@
+# stdlib imports:
+import os
+from pathlib import Path
+
+# local imports:
+import ace_vmtier
+
+def _encoded( tmp_path: Path, name: str ) -> Path:
+	''' a message plus the smaller copy _compress would have left beside it '''
+	box = tmp_path / '1234'
+	box.mkdir( exist_ok = True )
+	path = box / name
+	path.write_bytes( b'RIFF' + b'\0' * 1000 )
+	Path( f'{path}.tier.tmp' ).write_bytes( b'RIFF' + b'\0' * 100 )
+	return path
+
+def test_swap( tmp_path: Path ) -> None:
+	path = _encoded( tmp_path, 'msg-saved.wav' )
+	st = os.stat( path )
+	assert ace_vmtier._swap( str( path ), st.st_ino, st.st_mtime_ns )
+	assert path.stat().st_size == 104
+	assert not Path( f'{path}.tier.tmp' ).exists()
+
+def test_swap_deleted_mid_encode( tmp_path: Path ) -> None:
+	path = _encoded( tmp_path, 'msg-saved.wav' )
+	st = os.stat( path )
+	path.unlink()
+	assert not ace_vmtier._swap( str( path ), st.st_ino, st.st_mtime_ns )
+	assert not path.exists()
+	assert not Path( f'{path}.tier.tmp' ).exists()
+
+def test_swap_moved_mid_encode( tmp_path: Path ) -> None:
+	path = _encoded( tmp_path, 'msg-saved.wav' )
+	st = os.stat( path )
+	moved = path.with_name( 'msg-new.wav' )
+	path.rename( moved )
+	assert not ace_vmtier._swap( str( path ), st.st_ino, st.st_mtime_ns )
+	assert not path.exists()
+	assert moved.stat().st_size == 1004
+
+if __name__ == '__main__':
+	import tempfile
+	for test in ( test_swap, test_swap_deleted_mid_encode, test_swap_moved_mid_encode ):
+		with tempfile.TemporaryDirectory() as tmp:
+			test( Path( tmp ))
+		print( f'{test.__name__} ok' )
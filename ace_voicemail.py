@@ -4,17 +4,21 @@
 # stdlib imports:
 from abc import ABCMeta, abstractmethod
 import asyncio
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 import datetime
 import itertools
 import json
 import logging
 import math
 from mypy_extensions import TypedDict
+import os
 from pathlib import Path, PurePosixPath
 import random
+import threading
+import time
 from typing import (
-	Any, Callable, cast, Coroutine, Dict, List, Optional as Opt, Tuple, Union,
+	Any, Callable, cast, Coroutine, Dict, List, Optional as Opt, Set, Tuple,
+	Union,
 )
 from typing_extensions import AsyncIterator, Literal
 from uuid import uuid4
@@ -25,10 +29,13 @@ import natural.number # pip install natural
 
 # local imports:
 import ace_settings
+import ace_transcode
 import ace_util as util
 from dhms import dhms
 from esl import ESL
 from tts import TTS, TTS_VOICES, tts_voices
+from tts_prompt import Prompt, Var
+import tts_prompt
 
 logger = logging.getLogger( __name__ )
 
@@ -263,6 +270,102 @@ URGENT = 'voicemail/vm-urgent.wav'
 REMEMBER_THAT_YOUR_VOICEMAIL_PASSWORD_IS_ALSO_YOUR_WEB_INTERFACE_PASSWORD = 'voicemail/vm-voicemail_password_is_web_password.wav'
 YOU_HAVE = 'voicemail/vm-you_have.wav'
 
+# tts versions of the prompts above, declared up front so tts_prompt can pre-generate them
+BOX = Var( 'box' )
+ANI = Var( 'ani' )
+COUNT = Var( 'count' )
+URGENT_COUNT = Var( 'urgent_count' )
+NORMAL_COUNT = Var( 'normal_count' )
+GREETING_NUM = Var( 'greeting', [ str( n ) for n in range( 1, 10 )])
+MIN_PIN_LENGTH = Var( 'min_pin_length' )
+
+TTS_GOODBYE = Prompt().say( 'Goodbye.' )
+TTS_NO_VOICEMAIL = Prompt().say( 'The person you are trying to reach is not available and does not have a voicemail setup' )
+TTS_RECORD_YOUR_MESSAGE = Prompt().say( 'Record your message at the tone. Press any key, or stop talking, to end the recording.' )
+TTS_THE_PERSON_AT = Prompt().say( 'The person at ' ).digits( BOX ).say( ' is not available. Record your message at the tone. Press any key, or stop talking, to end the recording.' )
+TTS_GUEST_MENU = ( Prompt()
+	.say( 'To send this message now, press ' ).digits( GUEST_SAVE )
+	.say( ', to listen to the recording, press ' ).digits( GUEST_LISTEN )
+	.say( ', to re-record, press' ).digits( GUEST_RERECORD )
+	.say( ', to delete this message, press ' ).digits( GUEST_DELETE )
+)
+TTS_GUEST_MENU_URGENT = ( Prompt()
+	.say( 'To send this message now, press ' ).digits( GUEST_SAVE )
+	.say( ', to listen to the recording, press ' ).digits( GUEST_LISTEN )
+	.say( ', to re-record, press' ).digits( GUEST_RERECORD )
+	.say( ', to delete this message, press ' ).digits( GUEST_DELETE )
+	.say( ', to mark this message urgent, press ' ).digits( GUEST_URGENT )
+)
+TTS_RERECORD_YOUR_MESSAGE = Prompt().say( 'Record your message at the tone, press any key or stop talking to end the recording.' )
+TTS_GUEST_DELETED = Prompt().say( f"Deleted. To re-record, press {GUEST_RERECORD}. To end this call, simply hang up." )
+TTS_WILL_BE_DELIVERED = Prompt().say( 'Your message will be delivered.' )
+TTS_MARKED_URGENT = Prompt().say( 'Marked urgent.' )
+TTS_INVALID_SELECTION = Prompt().say( 'Invalid selection, please try again' )
+TTS_ENTER_YOUR_MAILBOX = Prompt().say( 'Please enter your mailbox number followed by pound' )
+TTS_ENTER_YOUR_PASSWORD = Prompt().say( 'Please enter your password followed by pound' )
+TTS_LOGIN_INCORRECT = Prompt().say( 'Login incorrect' )
+TTS_TOO_MANY_FAILED_ATTEMPTS = Prompt().say( 'Too many failed attempts' )
+TTS_MAIN_MENU = ( Prompt()
+	.say( 'Welcome to your voicemail.' )
+	.say( 'To listen to new messages, press ' ).digits( MAIN_NEW_MSGS )
+	.say( '. To listen to saved messages, press ' ).digits( MAIN_SAVED_MSGS )
+	.say( '. To record a greeting, press ' ).digits( MAIN_GREETING )
+	.say( '.' )
+)
+if CONF_VOICEMAIL_NAME:
+	TTS_MAIN_MENU.say( 'To record your name, press ' ).digits( MAIN_NAME ).say( '.' )
+TTS_MAIN_MENU.say( 'To change your password, press ' ).digits( MAIN_PASSWORD ).say( '.' )
+TTS_FOR_THE_MAIN_MENU = Prompt().say( 'For the main menu, press ' ).digits( LISTEN_MAIN_MENU ).say( '.' )
+TTS_NEW_MESSAGE_TRUSTED = Prompt().say( 'You have a new message in your voicemail box number ' ).digits( BOX ).say( '. To listen now, press any digit.' )
+TTS_NEW_MESSAGE = Prompt().say( 'You have a new message in your voicemail box number ' ).digits( BOX ).say( '. To listen now, enter your pin number followed by pound.' )
+TTS_NO_MORE_MESSAGES = Prompt().say( 'No more messages' )
+TTS_YOU_HAVE = {
+	nonurgent_x: Prompt()
+		.say( 'You have ' ).number( URGENT_COUNT ).say( f' urgent {nonurgent_x} messages and ' )
+		.number( NORMAL_COUNT ).say( f' {nonurgent_x} messages.' )
+	for nonurgent_x in ( 'new', 'saved' )
+}
+TTS_MESSAGE_FROM = Prompt().say( 'Message from ' ).digits( ANI )
+TTS_MESSAGE_NUMBER = Prompt().say( 'Message number' ).number( COUNT )
+TTS_URGENT = Prompt().say( 'urgent' )
+TTS_TODAY = Prompt().say( 'today,' )
+TTS_LISTEN_SAVE = Prompt().say( 'To repeat this message, press ' ).digits( LISTEN_REPEAT ).say( '. To save this message, press ' ).digits( LISTEN_SAVE ).say( '.' )
+TTS_LISTEN_UNDELETE = Prompt().say( 'To undelete this message, press ' ).digits( LISTEN_UNDELETE ).say( '.' )
+TTS_LISTEN_DELETE = Prompt().say( 'To delete this message, press ' ).digits( LISTEN_DELETE ).say( '.' )
+TTS_LISTEN_MARK_URGENT = Prompt().say( 'To mark this message urgent, press ' ).digits( LISTEN_MARK_URGENT ).say( '.' )
+TTS_LISTEN_ENVELOPE = Prompt().say( 'To hear the message envelope, press ' ).digits( LISTEN_ENVELOPE ).say( '.' )
+TTS_LISTEN_PREV_NEXT = Prompt().say( 'To play the next message, press ' ).digits( LISTEN_NEXT_MSG ).say( '. To play the previous message, press ' ).digits( LISTEN_PREV_MSG ).say( '.' )
+TTS_IF_YOU_ARE_FINISHED = Prompt().say( 'If you are finished, simply hangup' )
+TTS_SAVED = Prompt().say( 'Saved.' )
+TTS_MARKED_FOR_DELETION = Prompt().say( 'Marked for deletion.' )
+TTS_CANCELLED_DELETE = Prompt().say( 'Cancelled delete.' )
+TTS_MARKED_NEW = Prompt().say( 'Marked new.' )
+TTS_CHOOSE_A_GREETING = Prompt().say( 'Choose a greeting between 1 and 9. To return to the previous menu, press star.' )
+TTS_TEMPORARY_GREETING_MISSING = Prompt().say( 'Error, box' ).digits( BOX ).say( 'temporary greeting' ).say( 'is missing.' )
+TTS_GREETING_MISSING = Prompt().say( 'Error, box' ).digits( BOX ).say( 'greeting' ).digits( GREETING_NUM ).say( 'is missing.' )
+TTS_RECORD_YOUR_GREETING = Prompt().say( 'Record your greeting at the tone, press any key or stop talking to end the recording.' )
+TTS_RECORD_MENU = ( Prompt()
+	.say( 'Press ' ).digits( RECORD_SAVE )
+	.say( ' to save the greeting, press ' ).digits( RECORD_REVIEW )
+	.say( ' to review, press ' ).digits( RECORD_REDO )
+	.say( ' to re-record. To return to the previous menu, press ' ).digits( RECORD_RETURN )
+)
+TTS_AN_ERROR_HAS_OCCURRED = Prompt().say( 'An error has occurred, please contact the administrator' )
+TTS_GREETING_MENU = ( Prompt()
+	.say( 'To listen to greeting ' ).digits( GREETING_NUM )
+	.say( ', press ' ).digits( GREETING_LISTEN )
+	.say( '. To re-record the greeting, press ' ).digits( GREETING_RECORD )
+	.say( '. To make the greeting active, press ' ).digits( GREETING_CHOOSE )
+	.say( '. To delete the greeting, press ' ).digits( GREETING_DELETE )
+	.say( '. To return to the previos menu, press ' ).digits( GREETING_RETURN )
+	.say( '.' )
+)
+TTS_GREETING_ACTIVATED = Prompt().say( 'Greeting ' ).number( GREETING_NUM ).say( ' activated.' )
+TTS_DELETED = Prompt().say( 'Deleted.' )
+TTS_ENTER_NEW_PASSWORD = Prompt().say( 'Please enter your new password and press pound,' ).say( 'or to cancel press star.' )
+TTS_PASSWORD_TOO_SHORT = Prompt().say( 'The password you entered is below the minimum length of ' ).digits( MIN_PIN_LENGTH ).say( ', please try again' )
+TTS_PASSWORD_CHANGED = Prompt().say( 'Your password has been changed.' )
+
 def digits_audio( digits: str ) -> List[str]:
 	audio: List[str] = [
 		DIGITS[digit] for digit in digits
@@ -341,6 +444,29 @@ TONE_FUN = f'tone_stream://{QA};{QA};{QA};{QE};{QF4}:{QF4}:{HE}'
 TONE_BORING = f'tone_stream://{HF4}'
 TONE = TONE_BORING
 
+FILE_STRING = 'file_string://'
+
+def playlist( sounds: List[str] ) -> List[str]:
+	''' merge a menu into as few streams as possible (usually one) so it plays with a single execute and no gaps between prompts '''
+	merged: List[str] = []
+	run: List[str] = []
+	def _flush() -> None:
+		if len( run ) == 1:
+			merged.append( run[0] )
+		elif run:
+			merged.append( FILE_STRING + '!'.join( run ))
+		run.clear()
+	for sound in sounds:
+		if sound.startswith( FILE_STRING ):
+			run.extend( sound[len( FILE_STRING ):].split( '!' ))
+		elif '!' in sound: # can't be a member of a file_string
+			_flush()
+			merged.append( sound )
+		else:
+			run.append( sound )
+	_flush()
+	return merged
+
 @dataclass
 class MSG:
 	folder: PurePosixPath
@@ -379,6 +505,230 @@ class MSG:
 		]
 		return ( self.folder / '-'.join( parts )).with_suffix( '.wav' )
 
+def parse_recording_path( msgs_path: PurePosixPath, file: str ) -> MSG:
+	parts = file.split( '-' )
+	msg = MSG(
+		file = file,
+		folder = msgs_path,
+		path = msgs_path / file,
+		box = int( parts[0] ),
+		year = int( parts[1] ),
+		month = int( parts[2] ),
+		day = int( parts[3] ),
+		hour = int( parts[4] ),
+		minute = int( parts[5] ),
+		second = int( parts[6] ),
+		did = parts[7],
+		ani = parts[8],
+		uuid = parts[9],
+		priority = cast( Literal['normal','urgent'], parts[10] ),
+		status = cast( Literal['new','saved'], parts[11].split( '.', 1 )[0] ),
+	)
+	return msg
+
+def _msg_key( msg: MSG ) -> Tuple[Any,...]:
+	return ( msg.year, msg.month, msg.day, msg.hour, msg.minute, msg.second, msg.file )
+
+class BoxIndex:
+	''' one box's messages bucketed by status and priority, each bucket oldest first '''
+	def __init__( self ) -> None:
+		self.buckets: Dict[Tuple[str,str],Dict[str,MSG]] = {}
+		self.newest: Dict[Tuple[str,str],Tuple[Any,...]] = {}
+		self.greetings: Set[int] = set()
+	
+	def add( self, msg: MSG ) -> None:
+		k = ( msg.status, msg.priority )
+		bucket = self.buckets.setdefault( k, {} )
+		bucket[msg.file] = msg
+		key = _msg_key( msg )
+		newest = self.newest.get( k )
+		if newest is not None and key < newest:
+			# only happens when an older message is saved back to new, so re-sorting is rare
+			self.buckets[k] = dict( sorted( bucket.items(), key = lambda item: _msg_key( item[1] )))
+		else:
+			self.newest[k] = key
+	
+	def remove( self, msg: MSG, status: str, priority: str ) -> None:
+		self.buckets.get(( status, priority ), {} ).pop( msg.file, None )
+	
+	def count( self, status: str, priority: str ) -> int:
+		return len( self.buckets.get(( status, priority ), {} ))
+	
+	def counts( self ) -> Dict[str,Dict[str,int]]:
+		return {
+			status: { priority: self.count( status, priority ) for priority in ( 'urgent', 'normal' )}
+			for status in ( 'new', 'saved' )
+		}
+	
+	def messages( self, status: str, priority: str ) -> List[MSG]:
+		''' copies, so a caller changing status or priority doesn't change the index until it's finalized '''
+		return [ replace( msg ) for msg in self.buckets.get(( status, priority ), {} ).values() ]
+
+g_index: Dict[int,BoxIndex] = {}
+g_indexing: Dict[int,'asyncio.Future[BoxIndex]'] = {}
+g_box_locks: Dict[int,threading.Lock] = {}
+
+def box_lock( box: int ) -> threading.Lock:
+	''' held around moving, deleting or replacing a box's message files, only ever from a worker thread '''
+	return g_box_locks.setdefault( box, threading.Lock() )
+
+def remove_message( path: PurePosixPath ) -> None:
+	with box_lock( int( path.parent.name )):
+		os.remove( path )
+
+def rename_message( path: PurePosixPath, new_path: PurePosixPath ) -> None:
+	with box_lock( int( path.parent.name )):
+		os.rename( path, new_path )
+
+def _scan_box( box: int ) -> BoxIndex:
+	log = logger.getChild( '_scan_box' )
+	index = BoxIndex()
+	msgs_path = g_msgs_path / str( box )
+	try:
+		names = os.listdir( msgs_path )
+	except FileNotFoundError:
+		names = []
+	msgs: List[MSG] = []
+	for name in names:
+		if not name.endswith(( '-new.wav', '-saved.wav' )):
+			continue
+		try:
+			msgs.append( parse_recording_path( msgs_path, name ))
+		except ( IndexError, ValueError ) as e:
+			log.warning( 'box %r ignoring unrecognized message file %r: %r', box, name, e )
+	for msg in sorted( msgs, key = _msg_key ):
+		index.add( msg )
+	try:
+		names = os.listdir( g_box_path / str( box ))
+	except FileNotFoundError:
+		names = []
+	for greeting in range( 1, 10 ):
+		if f'greeting{greeting}.wav' in names:
+			index.greetings.add( greeting )
+	return index
+
+async def rebuild_index( box: int ) -> BoxIndex:
+	''' (re)load a box's index from disk '''
+	future = g_indexing.get( box )
+	if future is not None:
+		return await asyncio.shield( future )
+	loop = asyncio.get_running_loop()
+	future = g_indexing[box] = asyncio.ensure_future( loop.run_in_executor( None, _scan_box, box ))
+	try:
+		index = g_index[box] = await future
+	finally:
+		del g_indexing[box]
+	return index
+
+async def rebuild_all_indexes() -> int:
+	''' (re)load the index of every box that has messages, returns how many boxes were indexed '''
+	log = logger.getChild( 'rebuild_all_indexes' )
+	loop = asyncio.get_running_loop()
+	try:
+		names = await loop.run_in_executor( None, os.listdir, g_msgs_path )
+	except FileNotFoundError:
+		names = []
+	boxes = [ int( name ) for name in names if name.isdigit() ]
+	for box in boxes:
+		await rebuild_index( box )
+	log.info( 'indexed %r messages in %r boxes', sum(
+		sum( len( bucket ) for bucket in g_index[box].buckets.values() ) for box in boxes
+	), len( boxes ))
+	return len( boxes )
+
+async def box_index( box: int ) -> BoxIndex:
+	index = g_index.get( box )
+	if index is None:
+		index = await rebuild_index( box )
+	return index
+
+def forget_index( box: int ) -> None:
+	g_index.pop( box, None )
+
+def message_counts() -> Dict[int,Dict[str,Dict[str,int]]]:
+	''' message-waiting counts for every indexed box '''
+	return { box: index.counts() for box, index in g_index.items() }
+
+RECORDING_STOP_TIMEOUT = 10.0 # fallback for when we never see freeswitch close a recording, e.g. the channel vanished mid-record
+FINALIZE_ATTEMPTS = 3
+FINALIZE_RETRY_SECONDS = 0.5
+
+g_recordings: Dict[str,'asyncio.Future[float]'] = {} # recording path -> time.monotonic() when freeswitch closed it
+
+def _recording_started( path: PurePosixPath ) -> None:
+	future = g_recordings.get( str( path ))
+	if future is None or future.done():
+		g_recordings[str( path )] = asyncio.get_running_loop().create_future()
+
+def _recording_stopped( path: str ) -> None:
+	future = g_recordings.get( path )
+	if future is not None and not future.done():
+		future.set_result( time.monotonic() )
+
+def _recording_event( event: ESL.Message ) -> None:
+	event_name = event.event_name
+	if event_name == 'RECORD_STOP':
+		path = event.header( 'Record-File-Path' )
+	elif event_name == 'CHANNEL_EXECUTE_COMPLETE' and event.header( 'Application' ) == 'record':
+		path = ( event.header( 'Application-Data' ) or '' ).split( ' ', 1 )[0]
+	else:
+		return
+	if path:
+		_recording_stopped( path )
+
+async def recording_stopped( path: PurePosixPath, timeout: float = RECORDING_STOP_TIMEOUT ) -> bool:
+	''' wait for freeswitch to finish writing path, returns False if we gave up waiting '''
+	future = g_recordings.get( str( path ))
+	if future is None:
+		return True
+	try:
+		await asyncio.wait_for( asyncio.shield( future ), timeout )
+		return True
+	except asyncio.TimeoutError:
+		return False
+	finally:
+		if g_recordings.get( str( path )) is future:
+			del g_recordings[str( path )]
+
+BOX_SETTLE_SECONDS = 2.0 # a .box written this recently might be rewritten in the same clock tick, so don't cache it yet
+
+@dataclass
+class _CACHED_BOX:
+	mtime_ns: int
+	size: int
+	settings: BOXSETTINGS
+
+g_box_cache: Dict[int,_CACHED_BOX] = {}
+
+def _check_branch( box: int, which: str, branch: Any ) -> None:
+	if branch is None:
+		return
+	if not isinstance( branch, dict ):
+		raise BoxCorrupted( box, f'{which} is not an object' )
+	nodes = branch.get( 'nodes' )
+	if nodes is not None and not isinstance( nodes, list ):
+		raise BoxCorrupted( box, f'{which}.nodes is not a list' )
+	for i, node in enumerate( nodes or [] ):
+		if not isinstance( node, dict ):
+			raise BoxCorrupted( box, f'{which}.nodes[{i}] is not an object' )
+
+def _check_box_settings( box: int, boxsettings: Any ) -> BOXSETTINGS:
+	''' catch a malformed tree once when the box is loaded instead of part way through a call '''
+	if not isinstance( boxsettings, dict ):
+		raise BoxCorrupted( box, 'box settings are not an object' )
+	branches = boxsettings.get( 'branches' )
+	if branches is not None:
+		if not isinstance( branches, dict ):
+			raise BoxCorrupted( box, 'branches is not an object' )
+		for digits, branch in branches.items():
+			_check_branch( box, f'branches[{digits!r}]', branch )
+	_check_branch( box, 'greetingBranch', boxsettings.get( 'greetingBranch' ))
+	_check_branch( box, 'delivery', boxsettings.get( 'delivery' ))
+	return cast( BOXSETTINGS, boxsettings )
+
+def forget_box_settings( box: int ) -> None:
+	g_box_cache.pop( box, None )
+
 class EventHandler( metaclass = ABCMeta ):
 	@abstractmethod
 	def handle_event( self, event: ESL.Message ) -> None:
@@ -400,7 +750,11 @@ class Voicemail:
 	
 	_event_handler: Opt[EventHandler] = None
 	
+	async def tts( self, prompt: Prompt, **values: Union[int,str] ) -> str:
+		return await tts_prompt.render( self.settings, prompt, values )
+	
 	def _on_event( self, event: ESL.Message ) -> None:
+		_recording_event( event )
 		if self._event_handler:
 			self._event_handler.handle_event( event )
 	
@@ -427,6 +781,9 @@ class Voicemail:
 		await _make_and_own( Path( g_box_path ))
 		await _make_and_own( Path( g_msgs_path ))
 		
+		g_index.clear()
+		await rebuild_all_indexes()
+		
 		class X( EventHandler ):
 			def handle_event( self, event: ESL.Message ) -> None:
 				on_event( event )
@@ -485,17 +842,20 @@ class Voicemail:
 		#session:flushDigits()
 		#session:setInputCallback( 'input_callback', '' )
 		digits: Opt[str] = None
-		timeouts: List[datetime.timedelta] = [ datetime.timedelta( milliseconds = 1 ) ] * len( sounds )
-		timeouts[-1] = timeout
+		for sound in sounds:
+			if not isinstance( sound, str ):
+				log.error( 'invalid sound=%r', sound )
+		# a digit pressed anywhere in the merged stream stops it just like it stopped whichever prompt was playing
+		streams = playlist([ sound for sound in sounds if isinstance( sound, str )])
+		timeouts: List[datetime.timedelta] = [ datetime.timedelta( milliseconds = 1 ) ] * len( streams )
+		if timeouts:
+			timeouts[-1] = timeout
 		for attempt in range( max_attempts ):
-			for sound, local_timeout in zip( sounds, timeouts ):
-				if isinstance( sound, str ):
-					digits = await _play( sound, local_timeout )
-					if digits:
-						log.debug( 'returning digits=%r', digits )
-						return digits
-				else:
-					log.error( 'invalid sound=%r', sound )
+			for stream, local_timeout in zip( streams, timeouts ):
+				digits = await _play( stream, local_timeout )
+				if digits:
+					log.debug( 'returning digits=%r', digits )
+					return digits
 		digits = ''
 		log.debug( 'returning digits=%r', digits )
 		return digits
@@ -589,29 +949,49 @@ class Voicemail:
 		return self.grts_path( box ) / f'greeting{greeting}.wav'
 	
 	async def load_box_settings( self, box: int ) -> BOXSETTINGS:
+		''' cached until the .box file's mtime or size changes, which also catches edits made from the web ui '''
 		log = logger.getChild( 'Voicemail.load_box_settings' )
 		path = self.box_settings_path( box )
+		loop = asyncio.get_running_loop()
 		try:
-			raw = await self.load_file_into_memory( Path( path ))
+			st = await loop.run_in_executor( None, os.stat, path )
 		except FileNotFoundError as e1:
+			forget_index( box )
+			forget_box_settings( box )
 			raise BoxNotFound( box ).with_traceback( e1.__traceback__ ) from None
-		try:
-			result: BOXSETTINGS = json.loads( raw )
-		except json.decoder.JSONDecodeError as e2:
-			raise BoxCorrupted( box ).with_traceback( e2.__traceback__ ) from None
-		return result
+		cached = g_box_cache.get( box )
+		if cached is None or cached.mtime_ns != st.st_mtime_ns or cached.size != st.st_size:
+			try:
+				raw = await self.load_file_into_memory( Path( path ))
+			except FileNotFoundError as e2:
+				forget_index( box )
+				forget_box_settings( box )
+				raise BoxNotFound( box ).with_traceback( e2.__traceback__ ) from None
+			try:
+				result = _check_box_settings( box, json.loads( raw ))
+			except json.decoder.JSONDecodeError as e3:
+				forget_box_settings( box )
+				raise BoxCorrupted( box ).with_traceback( e3.__traceback__ ) from None
+			except BoxCorrupted as e4:
+				forget_box_settings( box )
+				log.error( 'box %r: %s', box, e4.args[-1] )
+				raise
+			cached = _CACHED_BOX( st.st_mtime_ns, st.st_size, result )
+			if time.time() - st.st_mtime > BOX_SETTLE_SECONDS:
+				g_box_cache[box] = cached
+		# callers change top-level keys like greeting and pin before saving, don't let that leak into the cache
+		return cast( BOXSETTINGS, dict( cached.settings ))
 	
 	async def save_box_settings( self, box: int, boxsettings: BOXSETTINGS ) -> None:
 			path: PurePosixPath = self.box_settings_path( box )
 			raw: str = json.dumps( boxsettings )
+			forget_box_settings( box )
 			async with aiofiles.open( str( path ), 'w' ) as f:
 				await f.write( raw )
 	
 	async def goodbye( self ) -> None:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Goodbye.' )
-			stream: str = str( await x.generate() )
+			stream: str = await self.tts( TTS_GOODBYE )
 		else:
 			stream = GOODBYE
 		await self.play_menu([ stream, SILENCE_2_SECONDS ])
@@ -619,27 +999,19 @@ class Voicemail:
 	
 	async def _the_person_you_are_trying_to_reach_is_not_available_and_does_not_have_voicemail( self ) -> str:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'The person you are trying to reach is not available and does not have a voicemail setup' )
-			return str( await x.generate() )
+			return await self.tts( TTS_NO_VOICEMAIL )
 		else:
 			return THE_PERSON_YOU_ARE_TRYING_TO_REACH_IS_NOT_AVAILABLE_AND_DOES_NOT_HAVE_VOICEMAIL
 	
 	async def _record_your_message_at_the_tone_press_any_key_or_stop_talking_to_end_the_recording( self ) -> str:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Record your message at the tone. Press any key, or stop talking, to end the recording.' )
-			return str( await x.generate() )
+			return await self.tts( TTS_RECORD_YOUR_MESSAGE )
 		else:
 			return RECORD_YOUR_MESSAGE_AT_THE_TONE_PRESS_ANY_KEY_OR_STOP_TALKING_TO_END_THE_RECORDING
 	
 	async def _the_person_at_extension_is_not_available_record_at_the_tone( self, box: int ) -> List[str]:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'The person at ' )
-			x.digits( box )
-			x.say( ' is not available. Record your message at the tone. Press any key, or stop talking, to end the recording.' )
-			playlist: List[str] = [ str( await x.generate() ) ]
+			playlist: List[str] = [ await self.tts( TTS_THE_PERSON_AT, box = box ) ]
 		else:
 			playlist = [ THE_PERSON_AT_EXTENSION ]
 			playlist.extend( digits_audio( str( box )))
@@ -675,19 +1047,7 @@ class Voicemail:
 		menu: Opt[List[str]] = None
 		async def _menu() -> List[str]:
 			if self.use_tts:
-				x = self.settings.tts()
-				x.say( 'To send this message now, press ' )
-				x.digits( GUEST_SAVE )
-				x.say( ', to listen to the recording, press ' )
-				x.digits( GUEST_LISTEN )
-				x.say( ', to re-record, press' )
-				x.digits( GUEST_RERECORD )
-				x.say( ', to delete this message, press ' )
-				x.digits( GUEST_DELETE )
-				if boxsettings.get( 'allow_guest_urgent' ):
-					x.say( ', to mark this message urgent, press ' )
-					x.digits( GUEST_URGENT )
-				stream = str( await x.generate() )
+				stream = await self.tts( TTS_GUEST_MENU_URGENT if boxsettings.get( 'allow_guest_urgent' ) else TTS_GUEST_MENU )
 				menu: List[str] = [ stream ]
 			else:
 				menu = [
@@ -727,6 +1087,7 @@ class Voicemail:
 				digit = ''
 				
 				log.debug( 'box %r RECORDING', box )
+				_recording_started( tmp_name )
 				async for event in self.esl.record( self.uuid, tmp_name,
 					max_message_time,
 					silence_threshold,
@@ -743,6 +1104,7 @@ class Voicemail:
 						await self.goodbye()
 						return False
 					self._on_event( event )
+				_recording_stopped( str( tmp_name )) # record app completed so the file is closed
 				
 				count: int = 1
 				
@@ -756,9 +1118,7 @@ class Voicemail:
 					elif digit == GUEST_RERECORD:
 						log.debug( 're-recording' )
 						if self.use_tts:
-							x = self.settings.tts()
-							x.say( 'Record your message at the tone, press any key or stop talking to end the recording.' )
-							playlist: List[str] = [ str( await x.generate() )]
+							playlist: List[str] = [ await self.tts( TTS_RERECORD_YOUR_MESSAGE )]
 						else:
 							playlist = [ RECORD_YOUR_MESSAGE_AT_THE_TONE_PRESS_ANY_KEY_OR_STOP_TALKING_TO_END_THE_RECORDING ]
 						await self.play_menu( playlist )
@@ -767,9 +1127,7 @@ class Voicemail:
 						log.debug( 'deleted message' )
 						deleted = True
 						if self.use_tts:
-							x = self.settings.tts()
-							x.say( f"Deleted. To re-record, press {GUEST_RERECORD}. To end this call, simply hang up." )
-							playlist = [ str( await x.generate() )]
+							playlist = [ await self.tts( TTS_GUEST_DELETED )]
 						else:
 							playlist = [
 								DELETED,
@@ -788,9 +1146,7 @@ class Voicemail:
 					elif digit == GUEST_SAVE or count >= 10:
 						log.debug( 'guest saved message' )
 						if self.use_tts:
-							x = self.settings.tts()
-							x.say( 'Your message will be delivered.' )
-							playlist = [ str( await x.generate() )]
+							playlist = [ await self.tts( TTS_WILL_BE_DELIVERED )]
 						else:
 							playlist = [ SAVED ]
 						#playlist.append( SILENCE_1_SECOND )
@@ -801,9 +1157,7 @@ class Voicemail:
 						log.debug( 'marked message urgent' )
 						priority = 'urgent'
 						if self.use_tts:
-							x = self.settings.tts()
-							x.say( 'Marked urgent.' )
-							playlist = [ str( await x.generate() )]
+							playlist = [ await self.tts( TTS_MARKED_URGENT )]
 						else:
 							playlist = [ MARKED_URGENT ]
 						playlist.append( SILENCE_1_SECOND )
@@ -817,6 +1171,7 @@ class Voicemail:
 				log.debug( 'not launching guest_save hook b/c deleted=%r', deleted )
 			elif not Path( tmp_name ).is_file():
 				log.debug( 'not launching guest_save hook b/c file does not exist: %s', repr( tmp_name ))
+				g_recordings.pop( str( tmp_name ), None )
 			else:
 				asyncio.ensure_future(
 					self.guest_save( box, boxsettings, stem, priority, notify )
@@ -825,9 +1180,7 @@ class Voicemail:
 	
 	async def play_invalid_value( self, digit: Opt[str] ) -> None:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Invalid selection, please try again' )
-			stream: str = str( await x.generate() )
+			stream: str = await self.tts( TTS_INVALID_SELECTION )
 		elif True:
 			stream = THAT_WAS_AN_INVALID_ENTRY
 		else:
@@ -856,16 +1209,17 @@ class Voicemail:
 		log = logger.getChild( 'Voicemail.guest_save' )
 		log.debug( 'guest_save_hook: file=%r', file )
 		msgs_path: PurePosixPath = self.msgs_path( box )
-		base_name: PurePosixPath = msgs_path / file
 		tmp_file: str = f'{file}-tmp.wav'
 		new_file: str = f'{file}-{priority}-new.wav'
 		tmp_name: PurePosixPath = msgs_path / tmp_file
 		new_name: PurePosixPath = msgs_path / new_file
-		ok = False
-		reason = ''
-		waits = 0
-		while waits < 60:
-			log.debug( 'ATTEMPTING TO RENAME %r to %r', str( tmp_name ), str( new_name ))
+		start = time.monotonic()
+		if not await recording_stopped( tmp_name ):
+			log.warning( 'never saw recording of %r stop, finalizing anyway', str( tmp_name ))
+		waited = time.monotonic() - start
+		for attempt in range( FINALIZE_ATTEMPTS ):
+			if attempt:
+				await asyncio.sleep( FINALIZE_RETRY_SECONDS )
 			try:
 				await aiofiles.os.rename( tmp_name, new_name )
 			except FileNotFoundError as e1:
@@ -873,65 +1227,58 @@ class Voicemail:
 				return
 			except Exception as e2:
 				log.warning( 'UNABLE TO RENAME %r to %r: %r', str( tmp_name ), str( new_name ), e2 )
-				waits += 1
-				log.debug( 'WAITING 1 SECOND' )
-				await asyncio.sleep( 1 )
 			else:
-				log.debug( 'file renamed - all done here' )
-				# trigger notification if any...
-				
+				log.info( 'box %r finalized %r in %.0fms (%.0fms waiting for the recording to stop)',
+					box, new_file, ( time.monotonic() - start ) * 1000, waited * 1000,
+				)
 				msg = self.parse_recording_path( msgs_path, new_name.name )
+				( await box_index( box )).add( msg )
 				
-				asyncio.ensure_future( notify( box, boxsettings, msg ))
+				await notify( box, boxsettings, msg ) # just queues the notification, it's delivered later
 				return
 		log.warning( 'GIVING UP TRYING TO RENAME FILE' )
 	
 	async def guest_delete( self, tmp_name: PurePosixPath ) -> None:
 		log = logger.getChild( 'Voicemail.guest_delete' )
 		log.debug( 'tmp_name=%r', tmp_name )
-		waits: int = 0
-		while waits < 10:
-			log.debug( 'ATTEMPTING TO DELETE %r', tmp_name )
+		start = time.monotonic()
+		if not await recording_stopped( tmp_name ):
+			log.warning( 'never saw recording of %r stop, deleting anyway', str( tmp_name ))
+		for attempt in range( FINALIZE_ATTEMPTS ):
+			if attempt:
+				await asyncio.sleep( FINALIZE_RETRY_SECONDS )
 			try:
 				await aiofiles.os.remove( tmp_name )
+			except FileNotFoundError:
+				log.debug( 'file already gone' )
+				return
 			except Exception:
 				log.warning( 'UNABLE TO DELETE %r:', str( tmp_name ), exc_info = True )
-				waits = waits + 1
-				log.debug( 'WAITING 1 SECOND' )
-				await asyncio.sleep( 1 )
 			else:
-				log.debug( 'file deleted - all done here' )
+				log.debug( 'deleted %r in %.0fms', str( tmp_name ), ( time.monotonic() - start ) * 1000 )
 				return
 	
 	async def _please_enter_your_mailbox_followed_by_pound( self ) -> List[str]:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Please enter your mailbox number followed by pound' )
-			return [ str( await x.generate() ), SILENCE_10_SECONDS ]
+			return [ await self.tts( TTS_ENTER_YOUR_MAILBOX ), SILENCE_10_SECONDS ]
 		else:
 			return [ PLEASE_ENTER_YOUR_ID_FOLLOWED_BY, POUND, SILENCE_10_SECONDS ]
 	
 	async def _please_enter_your_password_followed_by_pound( self ) -> List[str]:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Please enter your password followed by pound' )
-			return [ str( await x.generate() ), SILENCE_10_SECONDS]
+			return [ await self.tts( TTS_ENTER_YOUR_PASSWORD ), SILENCE_10_SECONDS]
 		else:
 			return [ PLEASE_ENTER_YOUR_PASSWORD_FOLLOWED_BY, POUND, SILENCE_10_SECONDS ]
 	
 	async def _login_incorrect( self ) -> List[str]:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Login incorrect' )
-			return [ str( await x.generate() ) ]
+			return [ await self.tts( TTS_LOGIN_INCORRECT ) ]
 		else:
 			return [ LOGIN_INCORRECT ]
 	
 	async def too_many_failed_attempts( self ) -> str:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Too many failed attempts' )
-			stream: str = str( await x.generate() )
+			stream: str = await self.tts( TTS_TOO_MANY_FAILED_ATTEMPTS )
 		else:
 			stream = TOO_MANY_FAILED_ATTEMPTS
 		return await self.play_menu([ stream ])
@@ -1001,23 +1348,7 @@ class Voicemail:
 	
 	async def _main_menu( self ) -> List[str]:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Welcome to your voicemail.' )
-			x.say( 'To listen to new messages, press ' )
-			x.digits( MAIN_NEW_MSGS )
-			x.say( '. To listen to saved messages, press ' )
-			x.digits( MAIN_SAVED_MSGS )
-			x.say( '. To record a greeting, press ' )
-			x.digits( MAIN_GREETING )
-			x.say( '.' )
-			if CONF_VOICEMAIL_NAME:
-				x.say( 'To record your name, press ' )
-				x.digits( MAIN_NAME )
-				x.say( '.' )
-			x.say( 'To change your password, press ' )
-			x.digits( MAIN_PASSWORD )
-			x.say( '.' )
-			stream = str( await x.generate() )
+			stream = await self.tts( TTS_MAIN_MENU )
 			return [ stream, SILENCE_3_SECONDS ]
 		else:
 			playlist: List[str] = [
@@ -1053,11 +1384,7 @@ class Voicemail:
 	
 	async def _for_the_main_menu_press( self ) -> List[str]:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'For the main menu, press ' )
-			x.digits( LISTEN_MAIN_MENU )
-			x.say( '.' )
-			return [ str( await x.generate() )]
+			return [ await self.tts( TTS_FOR_THE_MAIN_MENU )]
 		else:
 			return [
 				FOR_THE_MAIN_MENU,
@@ -1093,14 +1420,7 @@ class Voicemail:
 		log = logger.getChild( 'ace_voicemail.Voicemail.voice_deliver' )
 		
 		try:
-			x = self.settings.tts()
-			x.say( 'You have a new message in your voicemail box number ' )
-			x.digits( box )
-			if trusted:
-				x.say( '. To listen now, press any digit.' )
-			else:
-				x.say( '. To listen now, enter your pin number followed by pound.' )
-			intro: List[str] = [ str( await x.generate() ), SILENCE_10_SECONDS ]
+			intro: List[str] = [ await self.tts( TTS_NEW_MESSAGE_TRUSTED if trusted else TTS_NEW_MESSAGE, box = box ), SILENCE_10_SECONDS ]
 			
 			if trusted:
 				max_attempts: int = 3
@@ -1122,78 +1442,42 @@ class Voicemail:
 	
 	async def admin_listen_new( self, box: int, boxsettings: BOXSETTINGS ) -> None:
 		await self.admin_listen( box, boxsettings,
-			'*-new.wav', 'urgent new', 'new', URGENT_NEW, NEW,
+			'new', 'urgent new', 'new', URGENT_NEW, NEW,
 		)
 	
 	async def admin_listen_saved( self, box: int, boxsettings: BOXSETTINGS ) -> None:
 		await self.admin_listen( box, boxsettings,
-			'*-saved.wav', 'urgent saved', 'saved', URGENT_SAVED, SAVED,
+			'saved', 'urgent saved', 'saved', URGENT_SAVED, SAVED,
 		)
 	
 	def parse_recording_path( self, msgs_path: PurePosixPath, file: str ) -> MSG:
-		parts = file.split( '-' )
-		msg = MSG(
-			file = file,
-			folder = msgs_path,
-			path = msgs_path / file,
-			box = int( parts[0] ),
-			year = int( parts[1] ),
-			month = int( parts[2] ),
-			day = int( parts[3] ),
-			hour = int( parts[4] ),
-			minute = int( parts[5] ),
-			second = int( parts[6] ),
-			did = parts[7],
-			ani = parts[8],
-			uuid = parts[9],
-			priority = cast( Literal['normal','urgent'], parts[10] ),
-			status = cast( Literal['new','saved'], parts[11].split( '.', 1 )[0] ),
-		)
-		return msg
+		return parse_recording_path( msgs_path, file )
 	
 	async def _no_more_messages( self ) -> str:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'No more messages' )
-			return str( await x.generate() )
+			return await self.tts( TTS_NO_MORE_MESSAGES )
 		else:
 			return NO_MORE_MESSAGES
 	
 	async def admin_listen( self,
 		box: int,
 		boxsettings: BOXSETTINGS,
-		mask: str,
+		status: Literal['new','saved'],
 		urgent_x: str,
 		nonurgent_x: str,
 		URGENT_X: str,
 		NONURGENT_X: str,
 	) -> None:
-		msgs_path: PurePosixPath = self.msgs_path( box )
-		files: List[Path] = []
-		async for file in util.glob( Path( msgs_path ), mask ):
-			files.append( file )
-		urgent: List[MSG] = []
-		normal: List[MSG] = []
+		index = await box_index( box )
+		urgent: List[MSG] = index.messages( status, 'urgent' )
+		normal: List[MSG] = index.messages( status, 'normal' )
 		sound: Opt[Any] = None
 		
-		# separate them into urgent vs non-urgent
-		for file in files:
-			msg = self.parse_recording_path( msgs_path, file.name )
-			if msg.priority == 'urgent':
-				urgent.append( msg )
-			else:
-				normal.append( msg )
-		# put them back in single msgs list with urgent messages first
+		# single msgs list with urgent messages first
 		msgs = list( itertools.chain( urgent, normal ))
 		
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'You have ' )
-			x.number( len( urgent ))
-			x.say( f' {urgent_x} messages and ' )
-			x.number( len( normal ))
-			x.say( f' {nonurgent_x} messages.' )
-			intro: List[str] = [ str( await x.generate() )]
+			intro: List[str] = [ await self.tts( TTS_YOU_HAVE[nonurgent_x], urgent_count = len( urgent ), normal_count = len( normal ))]
 		else:
 			intro = [
 				YOU_HAVE,
@@ -1262,10 +1546,7 @@ class Voicemail:
 		envelope = None
 		async def _envelope() -> List[str]:
 			if self.use_tts:
-				x = self.settings.tts()
-				x.say( 'Message from ' )
-				x.digits( msg.ani )
-				return [ str( await x.generate() )]
+				return [ await self.tts( TTS_MESSAGE_FROM, ani = msg.ani )]
 			else:
 				return list( itertools.chain(
 					[ MESSAGE_FROM ],
@@ -1275,27 +1556,20 @@ class Voicemail:
 		msgsounds: List[str] = []
 		if msg_num is not None:
 			if self.use_tts:
-				x = self.settings.tts()
-				x.say( 'Message number' )
-				x.number( msg_num )
-				msgsounds.append( str( await x.generate() ))
+				msgsounds.append( await self.tts( TTS_MESSAGE_NUMBER, count = msg_num ))
 			else:
 				msgsounds.append( MESSAGE_NUMBER )
 				msgsounds.extend( number_audio( msg_num ))
 		if msg.priority == 'urgent':
 			if self.use_tts:
-				x = self.settings.tts()
-				x.say( 'urgent' )
-				msgsounds.append( str( await x.generate() ))
+				msgsounds.append( await self.tts( TTS_URGENT ))
 			else:
 				msgsounds.append( URGENT )
 		
 		now = datetime.datetime.now()
 		when = datetime.datetime( msg.year, msg.month, msg.day, msg.hour, msg.minute, msg.second )
 		if when.date() == now.date():
-			x = self.settings.tts()
-			x.say( 'today,' )
-			msgsounds.append( str( await x.generate() ))
+			msgsounds.append( await self.tts( TTS_TODAY ))
 		elif now - when < datetime.timedelta( days = 365 // 2 ):
 			x = self.settings.tts()
 			month = when.strftime( '%B' )
@@ -1321,13 +1595,7 @@ class Voicemail:
 			
 			if msg.status != 'delete':
 				if self.use_tts:
-					x = self.settings.tts()
-					x.say( 'To repeat this message, press ' )
-					x.digits( LISTEN_REPEAT )
-					x.say( '. To save this message, press ' )
-					x.digits( LISTEN_SAVE )
-					x.say( '.' )
-					menu.append( str( await x.generate() ))
+					menu.append( await self.tts( TTS_LISTEN_SAVE ))
 				else:
 					menu.extend([
 						TO_REPEAT_THIS_MESSAGE,
@@ -1341,11 +1609,7 @@ class Voicemail:
 			
 			if msg.status == 'delete':
 				if self.use_tts:
-					x = self.settings.tts()
-					x.say( 'To undelete this message, press ' )
-					x.digits( LISTEN_UNDELETE )
-					x.say( '.' )
-					menu.append( str( await x.generate() ))
+					menu.append( await self.tts( TTS_LISTEN_UNDELETE ))
 				else:
 					menu.extend([
 						TO_UNDELETE_THIS_MESSAGE,
@@ -1354,11 +1618,7 @@ class Voicemail:
 					])
 			else:
 				if self.use_tts:
-					x = self.settings.tts()
-					x.say( 'To delete this message, press ' )
-					x.digits( LISTEN_DELETE )
-					x.say( '.' )
-					menu.append( str( await x.generate() ))
+					menu.append( await self.tts( TTS_LISTEN_DELETE ))
 				else:
 					menu.extend([
 						TO_DELETE_THIS_MESSAGE,
@@ -1368,11 +1628,7 @@ class Voicemail:
 				
 				if msg.priority != 'urgent':
 					if self.use_tts:
-						x = self.settings.tts()
-						x.say( 'To mark this message urgent, press ' )
-						x.digits( LISTEN_MARK_URGENT )
-						x.say( '.' )
-						menu.append( str( await x.generate() ))
+						menu.append( await self.tts( TTS_LISTEN_MARK_URGENT ))
 					else:
 						menu.extend([
 							TO_MARK_THIS_MESSAGE_URGENT,
@@ -1381,11 +1637,7 @@ class Voicemail:
 						])
 			
 				if self.use_tts:
-					x = self.settings.tts()
-					x.say( 'To hear the message envelope, press ' )
-					x.digits( LISTEN_ENVELOPE )
-					x.say( '.' )
-					menu.append( str( await x.generate() ))
+					menu.append( await self.tts( TTS_LISTEN_ENVELOPE ))
 				else:
 					menu.extend([
 						TO_HEAR_THE_MESSAGE_ENVELOPE,
@@ -1395,13 +1647,7 @@ class Voicemail:
 			
 			if prevnext:
 				if self.use_tts:
-					x = self.settings.tts()
-					x.say( 'To play the next message, press ' )
-					x.digits( LISTEN_NEXT_MSG )
-					x.say( '. To play the previous message, press ' )
-					x.digits( LISTEN_PREV_MSG )
-					x.say( '.' )
-					menu.append( str( await x.generate() ))
+					menu.append( await self.tts( TTS_LISTEN_PREV_NEXT ))
 				else:
 					menu.extend([
 						TO_PLAY_THE_NEXT_MESSAGE,
@@ -1414,9 +1660,7 @@ class Voicemail:
 					])
 			menu.extend( await self._for_the_main_menu_press() )
 			
-			x = self.settings.tts()
-			x.say( 'If you are finished, simply hangup' )
-			menu.append( str( await x.generate() ))
+			menu.append( await self.tts( TTS_IF_YOU_ARE_FINISHED ))
 			
 			menu.append( SILENCE_3_SECONDS )
 			
@@ -1448,9 +1692,7 @@ class Voicemail:
 				msg.status = 'saved'
 				if not _on_save:
 					if self.use_tts:
-						x = self.settings.tts()
-						x.say( 'Saved.' )
-						_on_save = [ str( await x.generate() ), SILENCE_1_SECOND ]
+						_on_save = [ await self.tts( TTS_SAVED ), SILENCE_1_SECOND ]
 					else:
 						_on_save = [ SAVED, SILENCE_1_SECOND ]
 				digit = await self.play_menu( _on_save )
@@ -1460,9 +1702,7 @@ class Voicemail:
 				msg.status = 'delete'
 				if not _on_delete:
 					if self.use_tts:
-						x = self.settings.tts()
-						x.say( 'Marked for deletion.' )
-						_on_delete = [ str( await x.generate() ), SILENCE_1_SECOND ]
+						_on_delete = [ await self.tts( TTS_MARKED_FOR_DELETION ), SILENCE_1_SECOND ]
 					else:
 						_on_delete = [
 							DELETED,
@@ -1475,9 +1715,7 @@ class Voicemail:
 				msg.status = msg.old_status
 				if not _on_undelete:
 					if self.use_tts:
-						x = self.settings.tts()
-						x.say( 'Cancelled delete.' )
-						_on_undelete = [ str( await x.generate() ), SILENCE_1_SECOND ]
+						_on_undelete = [ await self.tts( TTS_CANCELLED_DELETE ), SILENCE_1_SECOND ]
 					else:
 						_on_undelete = [ UNDELETED, SILENCE_1_SECOND ]
 				digit = await self.play_menu( _on_undelete )
@@ -1487,9 +1725,7 @@ class Voicemail:
 				msg.priority = 'urgent'
 				if not _on_urgent:
 					if self.use_tts:
-						x = self.settings.tts()
-						x.say( 'Marked urgent.' )
-						_on_urgent = [ str( await x.generate() ), SILENCE_1_SECOND ]
+						_on_urgent = [ await self.tts( TTS_MARKED_URGENT ), SILENCE_1_SECOND ]
 					else:
 						_on_urgent = [ MARKED_URGENT, SILENCE_1_SECOND ]
 				digit = await self.play_menu( _on_urgent )
@@ -1499,9 +1735,7 @@ class Voicemail:
 				msg.status = 'new'
 				if _on_new is None:
 					if self.use_tts:
-						x = self.settings.tts()
-						x.say( 'Marked new.' )
-						_on_new = [ await x.generate(), SILENCE_1_SECOND ]
+						_on_new = [ await self.tts( TTS_MARKED_NEW ), SILENCE_1_SECOND ]
 					else:
 						_on_new = [ MARKED_NEW, SILENCE_1_SECOND ]
 				digit = await self.play_menu( _on_new )
@@ -1530,6 +1764,7 @@ class Voicemail:
 	
 	async def admin_listen_finalize( self, msgs: List[MSG] ) -> None:
 		log = logger.getChild( 'Voicemail.admin_listen_finalize' )
+		loop = asyncio.get_running_loop()
 		for msg in msgs:
 			# TODO FIXME: may need to spawn a hook for any rename failures
 			old_priority = msg.old_priority or msg.priority
@@ -1538,26 +1773,32 @@ class Voicemail:
 				if msg.status == 'delete':
 					log.debug( 'deleting %r', msg.path )
 					try:
-						await aiofiles.os.remove( msg.path )
+						await loop.run_in_executor( None, remove_message, msg.path )
+						await ace_transcode.forget( msg.path )
 					except Exception as e:
 						log.warning( 'Error deleting %r: %r', msg.path, e )
+					else:
+						( await box_index( msg.box )).remove( msg, old_status, old_priority )
 				else:
 					new_path = msg.to_path()
 					log.warning( 'renaming %r to %r', str( msg.path ), str( new_path ))
 					try:
-						await aiofiles.os.rename( msg.path, new_path )
+						await loop.run_in_executor( None, rename_message, msg.path, new_path )
+						await ace_transcode.forget( msg.path )
 					except Exception as e:
 						log.warning( 'Error renaming %r to %r: %r',
 							str( msg.path ), str( new_path ), e
 						)
+					else:
+						index = await box_index( msg.box )
+						index.remove( msg, old_status, old_priority )
+						index.add( parse_recording_path( msg.folder, new_path.name ))
 	
 	async def admin_greetings( self, box: int, boxsettings: BOXSETTINGS ) -> None:
 		log = logger.getChild( 'Voicemail.admin_greetings' )
 		
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Choose a greeting between 1 and 9. To return to the previous menu, press star.' )
-			menu: List[str] = [ str( await x.generate() ), SILENCE_3_SECONDS ]
+			menu: List[str] = [ await self.tts( TTS_CHOOSE_A_GREETING ), SILENCE_3_SECONDS ]
 		else:
 			menu = [
 				CHOOSE_A_GREETING_BETWEEN_1_AND_9,
@@ -1581,16 +1822,9 @@ class Voicemail:
 	
 	async def _error_greeting_file_missing( self, box: int, greeting: int ) -> str:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Error, box' )
-			x.digits( box )
 			if greeting < 0:
-				x.say( 'temporary greeting' )
-			else:
-				x.say( 'greeting' )
-				x.digits( greeting )
-			x.say( 'is missing.' )
-			return str( await x.generate() )
+				return await self.tts( TTS_TEMPORARY_GREETING_MISSING, box = box )
+			return await self.tts( TTS_GREETING_MISSING, box = box, greeting = greeting )
 		else:
 			return ERROR
 	
@@ -1612,9 +1846,7 @@ class Voicemail:
 			tmp_path: Opt[PurePosixPath] = self.box_greeting_path( box, f'-tmp-{tmp_uuid}' )
 			assert tmp_path is not None # this should only happen if greeting == 0
 			if self.use_tts:
-				x = self.settings.tts()
-				x.say( 'Record your greeting at the tone, press any key or stop talking to end the recording.' )
-				stream: str = str( await x.generate() )
+				stream: str = await self.tts( TTS_RECORD_YOUR_GREETING )
 			else:
 				stream = RECORD_YOUR_GREETING_AT_THE_TONE_PRESS_ANY_KEY_OR_STOP_TALKING_TO_END_THE_RECORDING
 			_ = await self.play_menu([ stream ])
@@ -1653,16 +1885,7 @@ class Voicemail:
 		
 		tmp_path: PurePosixPath = await _record()
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Press ' )
-			x.digits( RECORD_SAVE )
-			x.say( ' to save the greeting, press ' )
-			x.digits( RECORD_REVIEW )
-			x.say( ' to review, press ' )
-			x.digits( RECORD_REDO )
-			x.say( ' to re-record. To return to the previous menu, press ' )
-			x.digits( RECORD_RETURN )
-			menu: List[str] = [ str( await x.generate() )]
+			menu: List[str] = [ await self.tts( TTS_RECORD_MENU )]
 		else:
 			menu = [
 				PRESS_1_TO_SAVE_RECORDING_PRESS_2_TO_REVIEW_PRESS_3_TO_RERECORD,
@@ -1696,6 +1919,7 @@ class Voicemail:
 						)
 						await asyncio.sleep( 0.5 )
 					else:
+						( await box_index( box )).greetings.add( greeting )
 						return True
 				digit = await self.play_menu([ ERROR ])
 			elif digit == RECORD_REVIEW:
@@ -1718,9 +1942,7 @@ class Voicemail:
 	
 	async def _an_error_has_occurred_please_contact_the_administrator( self ) -> str:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'An error has occurred, please contact the administrator' )
-			return str( await x.generate() )
+			return await self.tts( TTS_AN_ERROR_HAS_OCCURRED )
 		else:
 			return AN_ERROR_HAS_OCCURRED_PLEASE_CONTACT_THE_ADMINISTRATOR
 	
@@ -1738,21 +1960,7 @@ class Voicemail:
 				return False
 		
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'To listen to greeting ' )
-			x.digits( greeting )
-			x.say( ', press ' )
-			x.digits( GREETING_LISTEN )
-			x.say( '. To re-record the greeting, press ' )
-			x.digits( GREETING_RECORD )
-			x.say( '. To make the greeting active, press ' )
-			x.digits( GREETING_CHOOSE )
-			x.say( '. To delete the greeting, press ' )
-			x.digits( GREETING_DELETE )
-			x.say( '. To return to the previos menu, press ' )
-			x.digits( GREETING_RETURN )
-			x.say( '.' )
-			menu: List[str] = [ str( await x.generate() )]
+			menu: List[str] = [ await self.tts( TTS_GREETING_MENU, greeting = str( greeting ))]
 		else:
 			menu = [
 				TO_LISTEN_TO_GREETING,
@@ -1808,11 +2016,7 @@ class Voicemail:
 				await self.save_box_settings( box, boxsettings )
 				
 				if self.use_tts:
-					x = self.settings.tts()
-					x.say( 'Greeting ' )
-					x.number( greeting )
-					x.say( ' activated.' )
-					playlist: List[str] = [ str( await x.generate() )]
+					playlist: List[str] = [ await self.tts( TTS_GREETING_ACTIVATED, greeting = str( greeting ))]
 				else:
 					playlist = [
 						GREETING,
@@ -1832,10 +2036,9 @@ class Voicemail:
 					)
 					stream = await self._an_error_has_occurred_please_contact_the_administrator()
 				else:
+					( await box_index( box )).greetings.discard( greeting )
 					if self.use_tts:
-						x = self.settings.tts()
-						x.say( 'Deleted.' )
-						stream = str( await x.generate() )
+						stream = await self.tts( TTS_DELETED )
 					else:
 						stream = DELETED
 				digit = await self.play_menu([ stream, SILENCE_1_SECOND ])
@@ -1861,10 +2064,7 @@ class Voicemail:
 	
 	async def admin_change_password( self, box: int, boxsettings: BOXSETTINGS ) -> bool:
 		if self.use_tts:
-			x = self.settings.tts()
-			x.say( 'Please enter your new password and press pound,' )
-			x.say( 'or to cancel press star.' )
-			menu: List[str] = [ str( await x.generate() )]
+			menu: List[str] = [ await self.tts( TTS_ENTER_NEW_PASSWORD )]
 		else:
 			menu = [
 				PLEASE_ENTER_YOUR_NEW_PASSWORD_THEN_PRESS_THE_POUND_KEY,
@@ -1884,11 +2084,7 @@ class Voicemail:
 				return True
 			elif len( digits ) < self.min_pin_length:
 				if self.use_tts:
-					x = self.settings.tts()
-					x.say( 'The password you entered is below the minimum length of ' )
-					x.digits( self.min_pin_length )
-					x.say( ', please try again' )
-					playlist: List[str] = [ str( await x.generate() )]
+					playlist: List[str] = [ await self.tts( TTS_PASSWORD_TOO_SHORT, min_pin_length = self.min_pin_length )]
 				else:
 					playlist = [
 						THE_PIN_YOU_ENTERED_IS_BELOW_THE_MINIMUM_LENGTH,
@@ -1903,9 +2099,7 @@ class Voicemail:
 				await self.save_box_settings( box, boxsettings )
 				
 				if self.use_tts:
-					x = self.settings.tts()
-					x.say( 'Your password has been changed.' )
-					stream: str = str( await x.generate() )
+					stream: str = await self.tts( TTS_PASSWORD_CHANGED )
 				else:
 					stream = YOUR_PASSWORD_HAS_BEEN_CHANGED
 				
@@ -286,6 +286,9 @@ class ESL:
 		self.id = g_last_id = next( idgen )
 		self.lock = asyncio.Lock()
 		self._reader_alive = asyncio.Event()
+		self.commands_sent = 0 # number of requests written to the socket, for diagnostics
+		self._var_cache: dict[str,dict[str,str]] = {} # uuid -> channel variables, see cache_vars()
+		self._var_written: dict[str,dict[str,str]] = {} # uuid -> variables we set that no event has echoed back yet
 	
 	async def connect_to( self,
 		host: Opt[str] = None,
@@ -360,6 +363,28 @@ class ESL:
 		
 		return ESL.Message._parse_headers( hdrs.decode( 'utf-8', 'replace' ))
 	
+	def cache_vars( self, uuid: str, headers: dict[str,str] ) -> None:
+		''' start caching uuid's channel variables, seeded from the variable_* headers of connect_from() or an event '''
+		assert is_valid_uuid( uuid ), f'invalid uuid={uuid!r}'
+		self._var_cache[uuid] = {}
+		self._var_written.pop( uuid, None )
+		self._cache_vars_from( uuid, headers )
+	
+	def _cache_vars_from( self, uuid: str, headers: dict[str,str] ) -> None:
+		vars_ = {
+			k[9:]: v for k, v in headers.items() if k.startswith( 'variable_' )
+		}
+		if vars_:
+			# events that carry channel data carry all of it, so the snapshot replaces what we had, except that
+			# an event freeswitch sent before it ran our last setvar mustn't undo the write-through
+			written = self._var_written.get( uuid ) or {}
+			for key, val in list( written.items() ):
+				if vars_.get( key, '' ) == val:
+					del written[key] # freeswitch has caught up
+				else:
+					vars_[key] = val
+			self._var_cache[uuid] = vars_
+	
 	def escape( self, s: Union[int,str] ) -> str:
 		_s_ = str( s ).replace( '\\', '\\\\' ).replace( "'", "\\'" )
 		return f"'{_s_}'"
@@ -802,8 +827,15 @@ class ESL:
 	) -> Opt[str]:
 		assert is_valid_uuid( uuid ), f'invalid uuid={uuid!r}'
 		assert isinstance( key, str ) and ' ' not in key, f'invalid key={key!r}'
+		cached = self._var_cache.get( uuid )
+		if cached is not None and key in cached:
+			return cached[key] or None
 		r = await self._send( ESL.ValueRequest( self, f'api uuid_getvar {uuid} {key}' ))
-		return None if r.value == '_undef_' else r.value
+		value = None if r.value == '_undef_' else r.value
+		if cached is not None and value:
+			# misses aren't cached, freeswitch sets plenty of variables (bridge_uuid, hangup causes...) without an event to tell us
+			cached[key] = value
+		return value
 	
 	async def uuid_getchanvar( self,
 		uuid: str,
@@ -867,9 +899,42 @@ class ESL:
 		assert is_valid_uuid( uuid ), f'invalid uuid={uuid!r}'
 		assert isinstance( key, str ) and ' ' not in key, f'invalid key={key!r}'
 		assert isinstance( val, str ), f'invalid val={val!r}'
-		return await self._send( ESL.Request( self,
+		r = await self._send( ESL.Request( self,
 			f'api uuid_setvar {uuid} {key} {self.escape(val)}'
 		))
+		self._cache_setvar( uuid, key, val )
+		return r
+	
+	def _cache_setvar( self, uuid: str, key: str, val: str ) -> None:
+		cached = self._var_cache.get( uuid )
+		if cached is not None:
+			cached[key] = val # setting a variable to empty unsets it, which uuid_getvar() reads back as None
+			self._var_written.setdefault( uuid, {} )[key] = val
+	
+	async def uuid_setvar_multi( self,
+		uuid: str,
+		vars: dict[str,str],
+	) -> None:
+		assert is_valid_uuid( uuid ), f'invalid uuid={uuid!r}'
+		multi: list[str] = []
+		for key, val in vars.items():
+			assert isinstance( key, str ) and key and not re.search( r'[\s=;]', key ), f'invalid key={key!r}'
+			assert isinstance( val, str ), f'invalid val={val!r}'
+			if ';' in val or '\n' in val:
+				# uuid_setvar_multi has no way to escape the ; delimiter, so send these on their own
+				await self.uuid_setvar( uuid, key, val )
+			else:
+				multi.append( f'{key}={val}' )
+		if len( multi ) == 1:
+			key, _, val = multi[0].partition( '=' )
+			await self.uuid_setvar( uuid, key, val )
+		elif multi:
+			await self._send( ESL.Request( self,
+				f'api uuid_setvar_multi {uuid} {";".join(multi)}'
+			))
+			for kv in multi:
+				key, _, val = kv.partition( '=' )
+				self._cache_setvar( uuid, key, val )
 	
 	async def uuid_transfer( self,
 		uuid: str,
@@ -918,6 +983,7 @@ class ESL:
 				if writer is None:
 					raise EOFError( 'socket closed' )
 				await self._requests.put( req )
+				self.commands_sent += 1
 				writer.write( req.raw )
 				await writer.drain()
 				await req.wait()
@@ -996,6 +1062,9 @@ class ESL:
 					evt.when_event = datetime.now() # fake it 'til you make it
 				evt.when_rcvd = datetime.now()
 				evt.body = evt_body
+				evt_uuid = evt.headers.get( 'Unique-ID' )
+				if evt_uuid is not None and evt_uuid in self._var_cache:
+					self._cache_vars_from( evt_uuid, evt.headers )
 				#log.debug( 'queueing evt id %r %r', id( evt ), evt.event_name )
 				await self._event_queue.put( evt )
 			else:
@@ -1046,6 +1115,10 @@ class ESL:
 			log.warning( 'ESL id=%r deleted without being closed first', self.id )
 
 if __name__ == '__main__':
+	import sys
+	import time
+	from uuid import uuid4
+	
 	async def amain() -> None:
 		logging.basicConfig( level = DEBUG9 )
 		esl = ESL()
@@ -1060,7 +1133,48 @@ if __name__ == '__main__':
 		finally:
 			await esl.close()
 	
+	async def abench( fields: int, rtt_ms: float ) -> None:
+		''' a DID's custom fields written one uuid_setvar at a time vs one uuid_setvar_multi, against a
+		stand-in for freeswitch that answers every command after rtt_ms '''
+		async def _server( reader: asyncio.StreamReader, writer: asyncio.StreamWriter ) -> None:
+			writer.write( b'Content-Type: auth/request\n\n' )
+			while True:
+				try:
+					cmd = await reader.readuntil( b'\n\n' )
+				except asyncio.IncompleteReadError:
+					return
+				await asyncio.sleep( rtt_ms / 1000 )
+				if cmd.startswith( b'auth ' ):
+					writer.write( b'Content-Type: command/reply\nReply-Text: +OK accepted\n\n' )
+				else:
+					writer.write( b'Content-Type: api/response\nContent-Length: 3\n\n+OK' )
+		
+		server = await asyncio.start_server( _server, '127.0.0.1', 0 )
+		port: int = server.sockets[0].getsockname()[1]
+		uuid = str( uuid4() )
+		vars = { f'field{i}': f'value {i}' for i in range( fields )}
+		for label in ( 'uuid_setvar', 'uuid_setvar_multi' ):
+			esl = ESL()
+			await esl.connect_to( port = port )
+			sent = esl.commands_sent
+			start = time.monotonic()
+			if label == 'uuid_setvar':
+				for key, val in vars.items():
+					await esl.uuid_setvar( uuid, key, val )
+			else:
+				await esl.uuid_setvar_multi( uuid, vars )
+			print( f'{fields} fields via {label}: {esl.commands_sent - sent} commands, {( time.monotonic() - start ) * 1000:.1f}ms at {rtt_ms}ms rtt' )
+			await esl.close()
+		server.close()
+	
 	try:
-		asyncio.run( amain() )
+		if sys.argv[1:2] == [ 'bench' ]:
+			# python3 esl.py bench [fields] [rtt_ms]
+			asyncio.run( abench(
+				int( sys.argv[2] ) if len( sys.argv ) > 2 else 20,
+				float( sys.argv[3] ) if len( sys.argv ) > 3 else 1.0,
+			))
+		else:
+			asyncio.run( amain() )
 	except KeyboardInterrupt:
 		pass
@@ -5,8 +5,15 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 #from email.mime.nonmultipart import MIMENonMultipart
 from io import BytesIO
+from pathlib import Path
 import quopri
-from typing import Any, IO, List, Optional as Opt, Sequence as Seq, Tuple, Union
+from typing import (
+	Any, IO, Iterator, List, Optional as Opt, Sequence as Seq, Tuple, Union,
+)
+import uuid
+
+BASE64_LINE = 57 # bytes of input per 76 character line of base64 output
+STREAM_CHUNK = BASE64_LINE * 1024
 
 
 class Email_composer:
@@ -19,7 +26,7 @@ class Email_composer:
 		self._to: List[str] = []
 		self._cc: List[str] = []
 		#self._bcc: List[str] = []
-		self._atts: List[Tuple[bytes, str, Opt[str]]] = []
+		self._atts: List[Tuple[Union[bytes,Path], str, Opt[str]]] = []
 	
 	@property
 	def from_( self ) -> Opt[str]:
@@ -75,7 +82,34 @@ class Email_composer:
 		# TODO FIXME: support `<img src="cid:some-image-cid" alt="img" />` (https://mailtrap.io/blog/embedding-images-in-html-email-have-the-rules-changed/)
 		self._atts.append(( fp.read(), filename, content_type ))
 	
+	def attach_file( self, path: Path, filename: str = '', content_type: Opt[str] = None ) -> None:
+		''' attach a file without reading it into memory, it's read and base64-encoded a chunk at a time by iter_bytes() '''
+		self._atts.append(( path, filename or path.name, content_type ))
+	
 	def as_bytes( self ) -> bytes:
+		return b''.join( self.iter_bytes() )
+	
+	def iter_bytes( self ) -> Iterator[bytes]:
+		''' generate the message a piece at a time, file attachments are streamed from disk '''
+		markers: List[Tuple[bytes,Path]] = []
+		msg = self._build( markers )
+		if not markers:
+			yield msg
+			return
+		start = 0
+		for marker, path in markers:
+			end = msg.index( marker, start )
+			yield msg[start:end]
+			with path.open( 'rb' ) as f:
+				while True:
+					chunk = f.read( STREAM_CHUNK )
+					if not chunk:
+						break
+					yield base64.encodebytes( chunk )
+			start = end + len( marker )
+		yield msg[start:]
+	
+	def _build( self, markers: List[Tuple[bytes,Path]] ) -> bytes:
 		# text and html bodies are mime/text. If you have both, they must both
 		# be in a mime/multipart/alternative.
 		# if there are attachments, those must be stored in mime/multipart/mixed
@@ -116,6 +150,14 @@ class Email_composer:
 			else:
 				att['Content-Type'] = content_type
 				att['Content-Disposition'] = 'attachment'
+			if isinstance( content, Path ):
+				# binary files always come out smaller as base64, iter_bytes() swaps the encoded file in for the marker
+				marker = f'ace-stream-{uuid.uuid4().hex}\n'
+				markers.append(( marker.encode( 'us-ascii' ), content ))
+				att['Content-Transfer-Encoding'] = 'base64'
+				att.set_payload( marker )
+				msg.attach( att )
+				continue
 			# choose encoding based on which one will generate a smaller email
 			b = base64.encodebytes( content )
 			q = quopri.encodestring( content )
@@ -157,5 +199,6 @@ if __name__=='__main__':
 	x.html = 'html body'
 	x.attach( BytesIO( b'Hello World' ), 'text-plain.txt', 'text/plain' )
 	x.attach( BytesIO( b'Hello World' ), 'default.bin' )
+	x.attach_file( Path( __file__ ), 'source.py', 'text/x-python' )
 	print( x.as_bytes().decode( 'us-ascii' ))
 	
\ No newline at end of file
@@ -5,7 +5,12 @@ class AudioSegment:
 	@classmethod
 	def from_wav( cls, path: Union[str,os.PathLike[str],IO[bytes]] ) -> AudioSegment: ...
 	
+	def set_channels( self, channels: int ) -> AudioSegment: ...
+	
+	def set_frame_rate( self, frame_rate: int ) -> AudioSegment: ...
+	
 	def export( self,
 		path: Opt[Union[str,os.PathLike[str]]] = ...,
 		format: str = 'mp3',
+		codec: Opt[str] = ...,
 	) -> IO[bytes]: ...
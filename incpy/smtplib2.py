@@ -52,15 +52,15 @@ import re
 import socket
 import sys
 from typing import(
-	BinaryIO, Callable, Dict, List, Optional as Opt, Sequence as Seq, Tuple,
-	Union,
+	BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional as Opt,
+	Sequence as Seq, Tuple, Union,
 )
 
 __all__ = [
 	'SMTPException', 'SMTPServerDisconnected', 'SMTPResponseException',
 	'SMTPSenderRefused', 'SMTPRecipientsRefused', 'SMTPDataError',
 	'SMTPConnectError', 'SMTPHeloError', 'SMTPAuthenticationError',
-	'quoteaddr', 'quotedata', 'SMTP',
+	'quoteaddr', 'quotedata', 'quotedata_iter', 'SMTP',
 ]
 
 logger = logging.getLogger( __name__ )
@@ -74,6 +74,7 @@ SMTP_SSL_PORT = 465
 LMTP_PORT = 2003
 CRLF = b'\r\n'
 _MAXLINE = 8192 # more than 8 times larger than RFC 821, 4.5.3
+_SEND_CHUNK = 65536 # coalesce small pieces of a streamed message into fewer sendall() calls
 
 OLDSTYLE_AUTH = re.compile( r'auth=(.*)', re.I )
 
@@ -189,6 +190,23 @@ def quotedata( data: bytes ) -> bytes:
 	assert isinstance( data, bytes ), f'expected type(data)=bytes but got {data!r}'
 	return _r_leading_dot.sub( b'..', _r_eol.sub( CRLF, data ))
 
+def quotedata_iter( chunks: Iterable[bytes] ) -> Iterator[bytes]:
+	"""Quote data for email, one piece at a time.
+	
+	Same as quotedata() but chunks may split lines anywhere, only whole
+	lines are quoted and the remainder is carried into the next chunk.
+	"""
+	buf = b''
+	for chunk in chunks:
+		assert isinstance( chunk, bytes ), f'expected type(chunk)=bytes but got {chunk!r}'
+		buf += chunk
+		cut = buf.rfind( b'\n' ) + 1
+		if cut:
+			yield quotedata( buf[:cut] )
+			buf = buf[cut:]
+	if buf:
+		yield quotedata( buf )
+
 
 try:
 	import ssl
@@ -525,9 +543,13 @@ class SMTP:
 		self.putcmd( b'RCPT', b''.join([ b'TO:', quoteaddr( recip ), optionlist ]))
 		return self.getreply()
 	
-	def data( self, msg: bytes ) -> Tuple[int,str]:
+	def data( self, msg: Union[bytes,Iterable[bytes]] ) -> Tuple[int,str]:
 		"""SMTP 'DATA' command -- sends message data to server.
 		
+		msg may be bytes or an iterable of bytes chunks, the latter is
+		quoted and sent as it's produced so the whole message never has to
+		be in memory at once.
+		
 		Automatically quotes lines beginning with a period per rfc821.
 		Raises SMTPDataError if there is an unexpected reply to the
 		DATA command; the return value from this method is the final
@@ -541,11 +563,30 @@ class SMTP:
 			raise SMTPDataError( code, repl )
 		else:
 			log.info( 'initial response: %r %s', code, repl )
-			q = quotedata( msg )
-			if q[-2:] != CRLF:
-				q = q + CRLF
-			q = q + b'.' + CRLF
-			self.send( q, sensitive = True )
+			if isinstance( msg, bytes ):
+				q = quotedata( msg )
+				if q[-2:] != CRLF:
+					q = q + CRLF
+				q = q + b'.' + CRLF
+				self.send( q, sensitive = True )
+			else:
+				tail = b''
+				pending: List[bytes] = []
+				pending_len = 0
+				for q in quotedata_iter( msg ):
+					if not q:
+						continue
+					tail = ( tail + q )[-2:]
+					pending.append( q )
+					pending_len += len( q )
+					if pending_len >= _SEND_CHUNK:
+						self.send( b''.join( pending ), sensitive = True )
+						pending.clear()
+						pending_len = 0
+				if tail != CRLF:
+					pending.append( CRLF )
+				pending.append( b'.' + CRLF )
+				self.send( b''.join( pending ), sensitive = True )
 			code, resp = self.getreply()
 			loglevel = logging.WARNING if code >= 400 else logging.INFO
 			log.log( loglevel, 'final response: %r %s', code, resp )
@@ -719,7 +760,7 @@ class SMTP:
 	def sendmail( self,
 		from_addr: str,
 		to_addrs: Union[str,Seq[str]],
-		msg: bytes,
+		msg: Union[bytes,Iterable[bytes]],
 		mail_options: List[str] = [],
 		rcpt_options: List[bytes] = [],
 	) -> Dict[str,Tuple[int,str]]:
@@ -735,7 +776,7 @@ class SMTP:
 	def sendmail2( self,
 		from_addr: str,
 		to_addrs: Union[str,Seq[str]],
-		msg: bytes,
+		msg: Union[bytes,Iterable[bytes]],
 		mail_options: List[str] = [],
 		rcpt_options: List[bytes] = [],
 	) -> Tuple[str,Dict[str,Tuple[int,str]]]:
@@ -745,7 +786,8 @@ class SMTP:
 			- from_addr    : The address sending this mail.
 			- to_addrs     : A list of addresses to send this mail to.  A bare
 							 string will be treated as a list with 1 address.
-			- msg          : The message to send.
+			- msg          : The message to send, either bytes or an iterable
+							 of bytes chunks to stream it to the server.
 			- mail_options : List of ESMTP options (such as 8bitmime) for the
 							 mail command.
 			- rcpt_options : List of ESMTP options (such as DSN commands) for
@@ -794,13 +836,13 @@ class SMTP:
 		empty dictionary.
 		
 		"""
-		assert isinstance( msg, bytes ), f'expected type(msg)=bytes but got {msg!r}'
+		assert not isinstance( msg, str ), f'expected type(msg)=bytes but got {msg!r}'
 		self.ehlo_or_helo_if_needed()
 		esmtp_opts: List[bytes] = []
 		if self.does_esmtp:
 			# Hmmm? what's this? -ddm
 			# self.esmtp_features['7bit']=""
-			if self.has_extn( 'size' ):
+			if isinstance( msg, bytes ) and self.has_extn( 'size' ): # the size of a streamed message isn't known up front
 				esmtp_opts.append( f'size={len(msg)}'.encode( 'ascii', 'strict' ))
 			for option in mail_options:
 				esmtp_opts.append( option.encode( 'ascii', 'strict' ) )
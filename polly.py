@@ -9,6 +9,8 @@ import hashlib
 import logging
 import os
 from pathlib import Path
+import threading
+from typing import Any, Dict, Tuple
 from typing_extensions import Final, Literal
 import wave
 
@@ -20,6 +22,23 @@ logger = logging.getLogger( __name__ )
 AWS_POLLY_VOICES = Literal['Aditi','Amy','Astrid','Bianca','Brian','Camila','Carla','Carmen','Celine','Chantal','Conchita','Cristiano','Dora','Emma','Enrique','Ewa','Filiz','Gabrielle','Geraint','Giorgio','Gwyneth','Hans','Ines','Ivy','Jacek','Jan','Joanna','Joey','Justin','Karl','Kendra','Kevin','Kimberly','Lea','Liv','Lotte','Lucia','Lupe','Mads','Maja','Marlene','Mathieu','Matthew','Maxim','Mia','Miguel','Mizuki','Naja','Nicole','Olivia','Penelope','Raveena','Ricardo','Ruben','Russell','Salli','Seoyeon','Takumi','Tatyana','Vicki','Vitoria','Zeina','Zhiyu','Aria','Ayanda','Arlet','Hannah','Arthur','Daniel','Liam','Pedro','Kajal']
 aws_polly_voices =        ('Aditi','Amy','Astrid','Bianca','Brian','Camila','Carla','Carmen','Celine','Chantal','Conchita','Cristiano','Dora','Emma','Enrique','Ewa','Filiz','Gabrielle','Geraint','Giorgio','Gwyneth','Hans','Ines','Ivy','Jacek','Jan','Joanna','Joey','Justin','Karl','Kendra','Kevin','Kimberly','Lea','Liv','Lotte','Lucia','Lupe','Mads','Maja','Marlene','Mathieu','Matthew','Maxim','Mia','Miguel','Mizuki','Naja','Nicole','Olivia','Penelope','Raveena','Ricardo','Ruben','Russell','Salli','Seoyeon','Takumi','Tatyana','Vicki','Vitoria','Zeina','Zhiyu','Aria','Ayanda','Arlet','Hannah','Arthur','Daniel','Liam','Pedro','Kajal')
 
+g_clients: Dict[Tuple[str,str,str],Any] = {}
+g_clients_lock = threading.Lock()
+
+def _client( aws_access_key: str, aws_secret_key: str, aws_region_name: str ) -> Any:
+	# creating a boto3 client is slow, they're thread-safe so share one per set of credentials
+	key = ( aws_access_key, aws_secret_key, aws_region_name )
+	with g_clients_lock:
+		client = g_clients.get( key )
+		if client is None:
+			client = g_clients[key] = boto3.client(
+				'polly',
+				aws_access_key_id = aws_access_key,
+				aws_secret_access_key = aws_secret_key,
+				region_name = aws_region_name
+			)
+		return client
+
 class AWSPolly:
 	sample_rate: Final = '8000'
 	"""
@@ -33,27 +52,16 @@ class AWSPolly:
 		self.channels = 1
 		self.sampwidth = 2
 	
-	def genspeech( self,
-		text: str,
-		voice: AWS_POLLY_VOICES,
-		recpath: Path,
-	) -> Path:
-		log = logger.getChild( 'AWSPolly.genspeech' )
+	def filename( self, text: str, voice: AWS_POLLY_VOICES ) -> str:
 		namestr = f'polly-{text}-{voice}'
 		fhash = hashlib.sha224(
 			namestr.encode( 'utf-8' )
 		).hexdigest()
-		filename: Path = recpath / f'{fhash}.wav'
-		if filename.is_file():
-			log.debug( 'using cached filename=%r for text=%r', filename, text )
-			return filename
-		recpath.mkdir( mode = 755, parents = True, exist_ok = True )
-		polly_client = boto3.client(
-			'polly',
-			aws_access_key_id = self.aws_access_key,
-			aws_secret_access_key = self.aws_secret_key,
-			region_name = self.aws_region_name
-		)
+		return f'{fhash}.wav'
+	
+	def synthesize( self, text: str, voice: AWS_POLLY_VOICES, filename: Path ) -> None:
+		log = logger.getChild( 'AWSPolly.synthesize' )
+		polly_client = _client( self.aws_access_key, self.aws_secret_key, self.aws_region_name )
 		log.debug( 'requesting new tts content for text=%r', text )
 		polly_response = polly_client.synthesize_speech(
 			VoiceId = voice,
@@ -71,4 +79,23 @@ class AWSPolly:
 			waveout.setnframes( 0 )
 			waveout.setcomptype( 'NONE', 'NONE' )
 			waveout.writeframesraw( wavframes )
+	
+	def genspeech( self,
+		text: str,
+		voice: AWS_POLLY_VOICES,
+		recpath: Path,
+	) -> Path:
+		log = logger.getChild( 'AWSPolly.genspeech' )
+		filename: Path = recpath / self.filename( text, voice )
+		if filename.is_file():
+			log.debug( 'using cached filename=%r for text=%r', filename, text )
+			return filename
+		recpath.mkdir( mode = 0o755, parents = True, exist_ok = True )
+		tmp = filename.with_name( f'{filename.name}.{os.getpid()}.{threading.get_ident()}.tmp' )
+		try:
+			self.synthesize( text, voice, tmp )
+			os.replace( tmp, filename )
+		finally:
+			if tmp.exists():
+				tmp.unlink()
 		return filename
@@ -5,20 +5,26 @@ from __future__ import annotations
 # stdlib imports:
 from abc import ABCMeta, abstractmethod
 import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing, contextmanager
+import copy
 from dataclasses import dataclass
+import datetime
 import json
 import logging
 import os
 from pathlib import Path
 import re
 import sqlite3
+import ssl
 import sys
 import threading
+import time
 from types import TracebackType
 from typing import (
-	Any, Callable, cast, Iterator, Optional as Opt, Sequence as Seq, Tuple,
-	Type, Union,
+	Any, Callable, cast, Iterator, List, Optional as Opt, Sequence as Seq, Tuple,
+	Type, TypeVar, TYPE_CHECKING, Union,
 )
 import uuid
 
@@ -26,6 +32,9 @@ import uuid
 import psycopg2 # pip install psycopg2
 from typing_extensions import Literal, TypeAlias # pip install typing_extensions
 
+if TYPE_CHECKING:
+	import asyncpg # pip install asyncpg, only needed by AsyncRepoPostgres
+
 if __name__ == '__main__':
 	sys.path.append( 'incpy' )
 
@@ -47,6 +56,12 @@ class ResourceAlreadyExists( Exception ):
 class ResourceNotFound( Exception ):
 	pass
 
+class PoolExhausted( Exception ):
+	pass
+
+class InvalidCursor( Exception ):
+	pass
+
 def json_dumps( data: Any ) -> str:
 	return json.dumps( data, indent = '\t', separators = ( ',', ': ' ))
 
@@ -54,13 +69,217 @@ def json_dumps( data: Any ) -> str:
 #region connector
 
 
+PG_POOL_WAIT_SECONDS = 30 # how long a checkout waits for a connection when the pool is at max_size
+PG_POOL_PING_SECONDS = 10 # connections idle longer than this get a "SELECT 1" before they're handed out
+
+@dataclass
+class _IDLE:
+	conn: psycopg2.connection
+	since: float
+
+class PgPool:
+	''' process-wide postgres connections, a Connector checks one out per database for the life of its with block '''
+	def __init__( self ) -> None:
+		self.cond = threading.Condition()
+		self.min_size = 1
+		self.max_size = 20
+		self.idle_seconds = 300.0
+		self.idle: dict[str,list[_IDLE]] = {}
+		self.busy: dict[str,int] = {}
+		self.stats: dict[str,int] = {
+			'connects': 0,
+			'checkouts': 0,
+			'reuses': 0,
+			'discards': 0,
+			'waits': 0,
+		}
+	
+	def configure( self, *, min_size: int, max_size: int, idle_seconds: float ) -> None:
+		assert 0 <= min_size <= max_size, f'invalid pool size min_size={min_size!r} max_size={max_size!r}'
+		with self.cond:
+			self.min_size = min_size
+			self.max_size = max_size
+			self.idle_seconds = idle_seconds
+			self.cond.notify_all()
+	
+	def _expired( self, key: str ) -> list[psycopg2.connection]:
+		# NOTE: caller must hold self.cond
+		idle = self.idle.get( key, [] )
+		total = len( idle ) + self.busy.get( key, 0 )
+		expired: list[psycopg2.connection] = []
+		now = time.monotonic()
+		# idle is a stack, so the longest idle connections are at the bottom
+		while idle and total > self.min_size and now - idle[0].since > self.idle_seconds:
+			expired.append( idle.pop( 0 ).conn )
+			total -= 1
+		return expired
+	
+	def _healthy( self, item: _IDLE ) -> bool:
+		conn = item.conn
+		if conn.closed:
+			return False
+		if time.monotonic() - item.since < PG_POOL_PING_SECONDS:
+			return True
+		try:
+			with closing( conn.cursor() ) as cur:
+				cur.execute( 'SELECT 1' )
+			conn.rollback()
+		except psycopg2.Error:
+			return False
+		return True
+	
+	def _close( self, conns: list[psycopg2.connection] ) -> None:
+		log = logger.getChild( 'PgPool._close' )
+		for conn in conns:
+			try:
+				conn.close()
+			except Exception:
+				log.exception( 'Error closing postgres connection:' )
+	
+	def checkout( self, key: str, connect: Callable[[],psycopg2.connection] ) -> psycopg2.connection:
+		log = logger.getChild( 'PgPool.checkout' )
+		deadline = time.monotonic() + PG_POOL_WAIT_SECONDS
+		expired: list[psycopg2.connection] = []
+		with self.cond:
+			while True:
+				expired.extend( self._expired( key ))
+				idle = self.idle.get( key )
+				if idle or len( idle or [] ) + self.busy.get( key, 0 ) < self.max_size:
+					break
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					raise PoolExhausted( f'no postgres connection available for {key!r} after {PG_POOL_WAIT_SECONDS!r} seconds' )
+				self.stats['waits'] += 1
+				self.cond.wait( remaining )
+			item = idle.pop() if idle else None # most recently used first, it's the least likely to have gone stale
+			self.busy[key] = self.busy.get( key, 0 ) + 1
+			self.stats['checkouts'] += 1
+		self._close( expired )
+		
+		if item is not None:
+			if self._healthy( item ):
+				with self.cond:
+					self.stats['reuses'] += 1
+				return item.conn
+			log.warning( 'discarding dead postgres connection for %r', key )
+			self._close([ item.conn ])
+			with self.cond:
+				self.stats['discards'] += 1
+		try:
+			conn = connect()
+		except Exception:
+			with self.cond:
+				self.busy[key] -= 1
+				self.cond.notify()
+			raise
+		with self.cond:
+			self.stats['connects'] += 1
+		return conn
+	
+	def checkin( self, key: str, conn: psycopg2.connection ) -> None:
+		reuse = not conn.closed
+		if reuse:
+			try:
+				conn.rollback() # never hand the next user somebody else's open transaction
+			except psycopg2.Error:
+				reuse = False
+		with self.cond:
+			self.busy[key] = max( 0, self.busy.get( key, 0 ) - 1 )
+			if reuse:
+				self.idle.setdefault( key, [] ).append( _IDLE( conn, time.monotonic() ))
+			else:
+				self.stats['discards'] += 1
+			expired = self._expired( key )
+			self.cond.notify()
+		if not reuse:
+			expired.append( conn )
+		self._close( expired )
+	
+	def clear( self ) -> None:
+		''' close every idle connection '''
+		with self.cond:
+			conns = [ item.conn for idle in self.idle.values() for item in idle ]
+			self.idle.clear()
+		self._close( conns )
+	
+	def metrics( self ) -> dict[str,Any]:
+		with self.cond:
+			return dict( self.stats,
+				idle = sum( len( idle ) for idle in self.idle.values() ),
+				busy = sum( self.busy.values() ),
+			)
+
+g_pg_pool = PgPool()
+g_pg_forked: list[psycopg2.connection] = []
+
+def _pg_pool_after_fork() -> None:
+	# the parent still owns these sockets, closing them here (or letting them be garbage collected) would hang up on it
+	g_pg_forked.extend( item.conn for idle in g_pg_pool.idle.values() for item in idle )
+	g_pg_pool.cond = threading.Condition()
+	g_pg_pool.idle = {}
+	g_pg_pool.busy = {}
+
+if hasattr( os, 'register_at_fork' ):
+	os.register_at_fork( after_in_child = _pg_pool_after_fork )
+
+SQLITE_TIMEOUT_SECONDS = 5.0 # busy_timeout, how long a writer waits for another process's write to finish
+SQLITE_CACHED_STATEMENTS = 256
+SQLITE_PRAGMAS = [
+	'PRAGMA journal_mode=WAL', # readers and the writer don't block each other, so web list queries don't stall the engine's CAR writes
+	'PRAGMA synchronous=NORMAL', # still crash-safe in WAL mode, a power cut can only lose the last few commits
+	'PRAGMA cache_size=-16384', # KiB, so 16MB of page cache per connection
+	'PRAGMA mmap_size=268435456', # 256MB, reads come straight out of the page cache
+	'PRAGMA temp_store=MEMORY',
+]
+
+g_sqlite_tls = threading.local()
+g_sqlite_forked: list[sqlite3.Connection] = []
+
+def sqlite_connect( path: str ) -> sqlite3.Connection:
+	''' this thread's long-lived connection to path, opened and tuned on first use '''
+	pid = os.getpid()
+	conns: Opt[dict[str,sqlite3.Connection]] = getattr( g_sqlite_tls, 'conns', None )
+	if conns is None or g_sqlite_tls.pid != pid:
+		if conns:
+			# sqlite connections must not cross a fork, but let the parent's go quietly
+			g_sqlite_forked.extend( conns.values() )
+		conns = g_sqlite_tls.conns = {}
+		g_sqlite_tls.pid = pid
+	conn = conns.get( path )
+	if conn is None:
+		conn = sqlite3.connect( path,
+			timeout = SQLITE_TIMEOUT_SECONDS,
+			cached_statements = SQLITE_CACHED_STATEMENTS,
+		)
+		for pragma in SQLITE_PRAGMAS:
+			conn.execute( pragma )
+		setattr( conn, 'row_factory', dict_factory )
+		conns[path] = conn
+	return conn
+
+SEARCH_MIN_LENGTH = 3 # a trigram index can't narrow down anything shorter, so a plain LIKE scan is quicker
+
+def sqlite_search_table( cur: sqlite3.Cursor, name: str, columns: Seq[str], *, content: str = '' ) -> bool:
+	''' make name an fts5 trigram table over columns, so LIKE '%x%' on them is an index lookup instead of a scan.
+	returns True if it was (re)created and needs filling, raises sqlite3.OperationalError if fts5/trigram isn't available '''
+	cur.execute( f'PRAGMA table_info("{name}");' )
+	existing = [ row['name'] for row in cur.fetchall() ]
+	if existing == list( columns ):
+		return False
+	if existing:
+		cur.execute( f'DROP TABLE "{name}";' )
+	_columns_ = ', '.join( f'"{column}"' for column in columns )
+	_content_ = f", content='{content}'" if content else ''
+	cur.execute( f'CREATE VIRTUAL TABLE "{name}" USING fts5({_columns_}{_content_}, tokenize=\'trigram\');' )
+	return True
+
 class Connector:
 	pg_conns: dict[str,psycopg2.connection]
-	sqlite_conns: dict[str,sqlite3.Connection]
 	
 	def __enter__( self ) -> Connector:
 		self.pg_conns = {}
-		self.sqlite_conns = {}
+		# AsyncRepository runs calls sharing this Connector on different executor threads
+		self.lock = threading.Lock()
 		return self
 	
 	@safe_exit
@@ -71,20 +290,13 @@ class Connector:
 	) -> Literal[False]:
 		log = logger.getChild( 'Connector.__exit__' )
 		
-		for pgcon in self.pg_conns.values():
+		for key, pgcon in self.pg_conns.items():
 			try:
-				pgcon.close()
+				g_pg_pool.checkin( key, pgcon )
 			except Exception:
-				log.exception( 'Error closing postgres connection:' )
+				log.exception( 'Error returning postgres connection to the pool:' )
 		del self.pg_conns
 		
-		for sql3con in self.sqlite_conns.values():
-			try:
-				sql3con.close()
-			except Exception:
-				log.exception( 'Error closing sqlite3 connection:' )
-		del self.sqlite_conns
-		
 		return False
 	
 	def postgres( self,
@@ -97,29 +309,26 @@ class Connector:
 		sslrootcert: Opt[Path],
 	) -> psycopg2.connection:
 		assert hasattr( self, 'pg_conns' ), 'Attempt to use Connector outside of with context'
-		key = f'{host}:{port}:{database}'
-		conn = self.pg_conns.get( key )
-		if conn is None:
-			conn = psycopg2.connect(
-				host = host,
-				database = database,
-				user = user,
-				password = password,
-				port = port,
-				sslmode = sslmode,
-				sslrootcert = sslrootcert,
-			)
-			self.pg_conns[key] = conn
+		key = f'{user}@{host}:{port}:{database}:{sslmode}'
+		with self.lock:
+			conn = self.pg_conns.get( key )
+			if conn is None:
+				conn = g_pg_pool.checkout( key, lambda: psycopg2.connect(
+					host = host,
+					database = database,
+					user = user,
+					password = password,
+					port = port,
+					sslmode = sslmode,
+					sslrootcert = sslrootcert,
+				))
+				self.pg_conns[key] = conn
 		return conn
 	
 	def sqlite( self, path: str ) -> sqlite3.Connection:
-		assert hasattr( self, 'sqlite_conns' ), 'Attempt to use Connector outside of with context'
-		conn = self.sqlite_conns.get( path )
-		if conn is None:
-			conn = sqlite3.connect( path )
-			setattr( conn, 'row_factory', dict_factory )
-			self.sqlite_conns[path] = conn
-		return conn
+		assert hasattr( self, 'pg_conns' ), 'Attempt to use Connector outside of with context'
+		# sqlite connections belong to the thread, not the Connector, so AsyncRepository's executor threads each get their own
+		return sqlite_connect( path )
 
 
 #endregion connector
@@ -141,6 +350,9 @@ class Config:
 	pgsql_port: Opt[int] = None
 	pgsql_sslmode: Opt[PGSQL_SSLMODE] = None
 	pgsql_sslrootcert: Opt[Path] = None
+	pgsql_pool_min: int = 1
+	pgsql_pool_max: int = 20
+	pgsql_pool_idle_seconds: float = 300
 
 
 class SqlBase( metaclass = ABCMeta ):
@@ -149,6 +361,7 @@ class SqlBase( metaclass = ABCMeta ):
 		primary: bool = False,
 		unique: bool = False,
 		index: bool = False,
+		search: bool = False,
 	) -> None:
 		for invalid in ( '"', "'", '`', '[', ']' ):
 			assert invalid not in name, f'invalid character {invalid!r} in name {name!r}'
@@ -160,6 +373,9 @@ class SqlBase( metaclass = ABCMeta ):
 		self.primary = primary
 		self.unique = unique and not self.primary
 		self.index = index and not self.unique
+		
+		# substring filters on this field get a trigram index, see Repository.search_fields
+		self.search = search
 	
 	@abstractmethod
 	def validate( self ) -> None:
@@ -177,10 +393,8 @@ class SqlBase( metaclass = ABCMeta ):
 	
 	def to_sqlite_after( self, table: str ) -> list[str]:
 		# this is used to create supplemental entries after the create table statement
-		sql: list[str] = []
-		if self.index:
-			sql.append( 'CREATE INDEX "idx_{table}_{self.name}" ON "{table}" ({self.name})' )
-		return sql
+		# NOTE: index = True is handled by the repository, see Repository.indexes
+		return []
 	
 	@abstractmethod
 	def to_postgres( self ) -> str:
@@ -193,10 +407,16 @@ class SqlBase( metaclass = ABCMeta ):
 	
 	def to_postgres_after( self, table: str ) -> list[str]:
 		# this is used to create supplemental entries after the create table statement
-		sql: list[str] = []
-		if self.index:
-			sql.append( 'CREATE INDEX "idx_{table}_{self.name}" ON "{table}" ({self.name})' )
-		return sql
+		# NOTE: index = True is handled by the repository, see Repository.indexes
+		return []
+	
+	def to_migration( self ) -> SqlBase:
+		''' the column as ALTER TABLE ADD COLUMN can add it to a table that already has rows '''
+		fld = copy.copy( self )
+		fld.null = True
+		fld.primary = False
+		fld.unique = False
+		return fld
 	
 	def encode_postgres( self, val: Any ) -> Any:
 		return val
@@ -211,12 +431,14 @@ class SqlVarChar( SqlBase ):
 		primary: bool = False,
 		unique: bool = False,
 		index: bool = False,
+		search: bool = False,
 	) -> None:
 		super().__init__( name,
 			null = null,
 			primary = primary,
 			unique = unique,
 			index = index,
+			search = search,
 		)
 		assert isinstance( size, int ) and 1 <= size <= 255, f'invalid size={size!r}'
 		self.size = size
@@ -286,12 +508,14 @@ class SqlInteger( SqlBase ):
 		primary: bool = False,
 		unique: bool = False,
 		index: bool = False,
+		search: bool = False,
 	) -> None:
 		super().__init__( name,
 			null = null,
 			primary = primary,
 			unique = unique,
 			index = index,
+			search = search,
 		)
 		assert isinstance( size, int ) and 1 <= size <= 20, f'invalid size={size!r}'
 		self.size = size
@@ -366,6 +590,7 @@ class SqlText( SqlBase ):
 		primary: bool = False,
 		unique: bool = False,
 		index: bool = False,
+		search: bool = False,
 	) -> None:
 		assert not unique, 'text fields cannot be unique'
 		assert not primary, 'text fields cannot be primary keys'
@@ -374,6 +599,7 @@ class SqlText( SqlBase ):
 			primary = primary,
 			unique = unique,
 			index = index,
+			search = search,
 		)
 	
 	def validate( self ) -> None:
@@ -464,6 +690,93 @@ class SqlBool( SqlBase ):
 		return ' '.join( filter( None, sql ))
 
 
+class SqlIndex:
+	''' a secondary index over one or more columns, prefix a column with "-" to index it descending '''
+	def __init__( self, *columns: str, unique: bool = False ) -> None:
+		assert columns, 'an index needs at least one column'
+		for column in columns:
+			for invalid in ( '"', "'", '`', '[', ']' ):
+				assert invalid not in column, f'invalid character {invalid!r} in column {column!r}'
+		self.columns = columns
+		self.unique = unique
+	
+	def name( self, table: str ) -> str:
+		# postgres index names are per-schema, not per-table
+		parts = [ f'{column[1:]}_desc' if column.startswith( '-' ) else column for column in self.columns ]
+		return f'idx_{table}_{"_".join(parts)}'
+	
+	def to_sql( self, table: str ) -> str:
+		# sqlite and postgres agree on this much
+		_unique_ = 'UNIQUE ' if self.unique else ''
+		_columns_ = ', '.join( f'"{column[1:]}" DESC' if column.startswith( '-' ) else f'"{column}"' for column in self.columns )
+		return f'CREATE {_unique_}INDEX IF NOT EXISTS "{self.name(table)}" ON "{table}" ({_columns_});'
+
+
+PAGEKEY: TypeAlias = Tuple[Any,REPOID] # ( orderby value, id ) of the row a page starts after
+
+@dataclass
+class PAGE:
+	items: list[Tuple[REPOID,dict[str,Any]]]
+	next: Opt[str] = None # opaque cursors, None when there's nothing that way
+	prev: Opt[str] = None
+
+def encode_cursor( backward: bool, key: PAGEKEY ) -> str:
+	raw = json.dumps([ 'p' if backward else 'n', *key ], separators = ( ',', ':' ), default = str )
+	return base64.urlsafe_b64encode( raw.encode( 'utf-8' )).decode( 'ascii' ).rstrip( '=' )
+
+def decode_cursor( cursor: str ) -> Tuple[bool,PAGEKEY]:
+	try:
+		raw = json.loads( base64.urlsafe_b64decode( cursor + '=' * ( -len( cursor ) % 4 )))
+	except ValueError:
+		raise InvalidCursor( cursor ) from None
+	if not isinstance( raw, list ) or len( raw ) != 3 or raw[0] not in ( 'n', 'p' ) or not isinstance( raw[2], ( int, str )):
+		raise InvalidCursor( cursor )
+	return raw[0] == 'p', ( raw[1], raw[2] )
+
+def keyset_sql(
+	keyname: str,
+	orderby: str,
+	after: Opt[PAGEKEY],
+	reverse: bool,
+	*,
+	nullable: bool,
+	placeholder: str,
+	nulls_order: bool,
+) -> Tuple[Opt[str],list[Any],str]:
+	''' where clause ( None on the first page ), params and order by for a seek past after,
+	nulls sort first going forward and last going backward '''
+	op = '<' if reverse else '>'
+	direction = 'DESC' if reverse else 'ASC'
+	if orderby == keyname:
+		if after is None:
+			return None, [], f'"{keyname}" {direction}'
+		return f'"{keyname}" {op} {placeholder}', [ after[1] ], f'"{keyname}" {direction}'
+	_nulls_ = ( ' NULLS LAST' if reverse else ' NULLS FIRST' ) if nulls_order else ''
+	_order_ = f'"{orderby}" {direction}{_nulls_}, "{keyname}" {direction}'
+	if after is None:
+		return None, [], _order_
+	value, id = after
+	if value is None:
+		if reverse:
+			return f'("{orderby}" IS NULL AND "{keyname}" < {placeholder})', [ id ], _order_
+		return f'(("{orderby}" IS NULL AND "{keyname}" > {placeholder}) OR "{orderby}" IS NOT NULL)', [ id ], _order_
+	where = f'("{orderby}", "{keyname}") {op} ({placeholder}, {placeholder})'
+	if reverse and nullable:
+		where = f'({where} OR "{orderby}" IS NULL)'
+	return where, [ value, id ], _order_
+
+def exclude_sql( exclude: Opt[dict[str,Seq[Any]]], placeholder: str ) -> Tuple[str,list[Tuple[str,Any]]]:
+	''' and clauses skipping rows whose field holds one of the given values, plus a ( field, value ) per placeholder '''
+	sql = ''
+	params: list[Tuple[str,Any]] = []
+	for fld, values in ( exclude or {} ).items():
+		if values:
+			marks = ', '.join( placeholder for _ in values )
+			sql += f' AND ("{fld}" IS NULL OR "{fld}" NOT IN ({marks}))'
+			params.extend(( fld, value ) for value in values )
+	return sql, params
+
+
 class Repository( metaclass = ABCMeta ):
 	type = 'Abstract repository'
 	schemas: dict[str,list[SqlBase]] = {}
@@ -478,6 +791,7 @@ class Repository( metaclass = ABCMeta ):
 		*,
 		auditing: bool = True,
 		keyname: str = 'id',
+		indexes: Seq[SqlIndex] = (),
 	) -> None:
 		assert tablename not in Repository.schemas, f'duplicate schema definition for table {tablename!r}'
 		Repository.schemas[tablename] = fields
@@ -488,6 +802,12 @@ class Repository( metaclass = ABCMeta ):
 		self.fields: dict[str,SqlBase] = {
 			field.name: field for field in fields
 		}
+		self.indexes: list[SqlIndex] = [ SqlIndex( field.name ) for field in fields if field.index ]
+		self.indexes.extend( indexes )
+		self.search_fields: list[str] = [ field.name for field in fields if field.search ]
+		for index in self.indexes:
+			for column in index.columns:
+				assert column.lstrip( '-' ) in self.fields, f'index on unknown column {column!r} in table {tablename!r}'
 	
 	@abstractmethod
 	def valid_id( self, id: REPOID ) -> REPOID:
@@ -520,6 +840,87 @@ class Repository( metaclass = ABCMeta ):
 		cls = type( self )
 		raise NotImplementedError( f'{cls.__module__}.{cls.__name__}.list' )
 	
+	@abstractmethod
+	def _seek( self,
+		ctr: Connector,
+		filters: dict[str,str],
+		*,
+		limit: int,
+		after: Opt[PAGEKEY],
+		offset: int,
+		orderby: str,
+		reverse: bool,
+	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		# Return up to limit rows that sort after the key after, in ( orderby, id ) order
+		cls = type( self )
+		raise NotImplementedError( f'{cls.__module__}.{cls.__name__}._seek' )
+	
+	@abstractmethod
+	def count( self, ctr: Connector, filters: dict[str,str] = {} ) -> int:
+		# How many rows would list() return without a limit?
+		cls = type( self )
+		raise NotImplementedError( f'{cls.__module__}.{cls.__name__}.count' )
+	
+	def _page_key( self, orderby: str, item: Tuple[REPOID, dict[str, Any]] ) -> PAGEKEY:
+		id, row = item
+		return ( None if orderby == self.keyname else row.get( orderby ), id )
+	
+	def page( self,
+		ctr: Connector,
+		filters: dict[str,str] = {},
+		*,
+		limit: int,
+		cursor: Opt[str] = None,
+		offset: int = 0,
+		orderby: str = '',
+		reverse: bool = False,
+	) -> PAGE:
+		''' keyset pagination: a cursor remembers the row a page ends on and the next page seeks past it,
+		so deep pages cost the same as the first. offset only applies when there's no cursor '''
+		orderby = orderby.strip() or self.keyname
+		backward = False
+		after: Opt[PAGEKEY] = None
+		if cursor:
+			backward, after = decode_cursor( cursor )
+			offset = 0
+		items = self._seek( ctr, filters,
+			limit = limit + 1,
+			after = after,
+			offset = offset,
+			orderby = orderby,
+			reverse = reverse != backward,
+		)
+		return self._paged( items, limit = limit, orderby = orderby, after = after, backward = backward, offset = offset )
+	
+	def _paged( self,
+		items: Seq[Tuple[REPOID, dict[str, Any]]],
+		*,
+		limit: int,
+		orderby: str,
+		after: Opt[PAGEKEY],
+		backward: bool,
+		offset: int,
+	) -> PAGE:
+		''' turn the limit + 1 rows _seek found into a page and the cursors either side of it '''
+		items = list( items )
+		more = len( items ) > limit
+		items = items[:limit]
+		if backward:
+			items.reverse()
+		page = PAGE( items )
+		if items:
+			if more or backward:
+				page.next = encode_cursor( False, self._page_key( orderby, items[-1] ))
+			if more if backward else ( after is not None or offset > 0 ):
+				page.prev = encode_cursor( True, self._page_key( orderby, items[0] ))
+		elif after is not None:
+			# ran off the end, point back the way we came
+			if backward:
+				page.next = encode_cursor( False, after )
+			else:
+				page.prev = encode_cursor( True, after )
+		return page
+	
 	@abstractmethod
 	def create( self, ctr: Connector, id: REPOID, resource: dict[str,Any], *, audit: auditing.Audit ) -> None:
 		# Persist new dictionary and return it
@@ -537,6 +938,24 @@ class Repository( metaclass = ABCMeta ):
 		# delete by id and return deleted dict
 		cls = type( self )
 		raise NotImplementedError( f'{cls.__module__}.{cls.__name__}.delete' )
+	
+	@abstractmethod
+	def expired( self, ctr: Connector, field: str, before: Any, *, limit: Opt[int] = None, exclude: Opt[dict[str,Seq[Any]]] = None ) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		# Return the oldest rows whose field is less than before, oldest first, skipping any whose exclude field holds one of its values
+		cls = type( self )
+		raise NotImplementedError( f'{cls.__module__}.{cls.__name__}.expired' )
+	
+	@abstractmethod
+	def count_expired( self, ctr: Connector, field: str, before: Any, *, exclude: Opt[dict[str,Seq[Any]]] = None ) -> int:
+		# How many rows have a field less than before?
+		cls = type( self )
+		raise NotImplementedError( f'{cls.__module__}.{cls.__name__}.count_expired' )
+	
+	@abstractmethod
+	def purge( self, ctr: Connector, ids: Seq[REPOID], *, audit: auditing.Audit ) -> int:
+		# delete many ids in a single transaction and return how many were deleted
+		cls = type( self )
+		raise NotImplementedError( f'{cls.__module__}.{cls.__name__}.purge' )
 
 repo_types: dict[str,Type[Repository]] = {}
 
@@ -599,6 +1018,7 @@ class RepoSqlite( Repository ):
 		*,
 		auditing: bool = True,
 		keyname: str = 'id',
+		indexes: Seq[SqlIndex] = (),
 	) -> None:
 		assert re.match( r'^[a-z][a-z_0-9]+$', tablename )
 		
@@ -611,6 +1031,7 @@ class RepoSqlite( Repository ):
 			config, tablename, ending, fields, owner_user, owner_group,
 			auditing = auditing,
 			keyname = keyname,
+			indexes = indexes,
 		)
 		#if not RepoSqlite.schemas:
 		#	RepoSqlite.setup( config )
@@ -624,19 +1045,93 @@ class RepoSqlite( Repository ):
 			fldsupp.extend( fld.to_sqlite_after( tablename ))
 		
 		_flds_ = ',\n'.join( fldsql + fldxtra )
-		sql: list[str] = [ f'CREATE TABLE IF NOT EXISTS "{tablename}" ({_flds_});' ]
-		sql.extend( fldsupp )
 		
 		with Connector() as ctr:
-			conn = self.connect( ctr )
-			with closing( conn.cursor() ) as cur:
-				for sql_ in sql:
+			with self._cursor( ctr ) as cur:
+				cur.execute( f'CREATE TABLE IF NOT EXISTS "{tablename}" ({_flds_});' )
+				self._migrate( cur )
+				for sql_ in fldsupp:
 					cur.execute( sql_ )
-		conn.commit()
+			self.search_table = self._search_setup( ctr )
+		
+		# built once per table so sqlite3's per-connection statement cache sees the exact same text every call
+		self.sql_exists = f'SELECT COUNT(*) AS "qty" FROM "{tablename}" WHERE "{keyname}"=?'
+		self.sql_get_by_id = f'SELECT * FROM "{tablename}" WHERE "{keyname}"=?'
+		self.sql_delete = f'DELETE FROM "{tablename}" WHERE "{keyname}"=?;'
+	
+	def _migrate( self, cur: sqlite3.Cursor ) -> None:
+		''' bring a table created by an older version up to date: add missing columns, then missing indexes '''
+		log = logger.getChild( 'RepoSqlite._migrate' )
+		cur.execute( f'PRAGMA table_info("{self.tablename}");' )
+		columns = { row['name'] for row in cur.fetchall() }
+		for fld in self.fields.values():
+			if fld.name in columns:
+				continue
+			if fld.primary:
+				log.error( 'Unable to add primary key column %r to existing table %r', fld.name, self.tablename )
+				continue
+			if not fld.null or fld.unique:
+				log.warning( 'Adding column %r to existing table %r as NULL without UNIQUE, existing rows have no value for it', fld.name, self.tablename )
+			log.info( 'Adding column %r to table %r', fld.name, self.tablename )
+			cur.execute( f'ALTER TABLE "{self.tablename}" ADD COLUMN {fld.to_migration().to_sqlite()};' )
+		cur.execute( 'SELECT "name" FROM "sqlite_master" WHERE "type"=\'index\' AND "tbl_name"=?;', [ self.tablename ])
+		indexes = { row['name'] for row in cur.fetchall() }
+		for index in self.indexes:
+			if index.name( self.tablename ) not in indexes:
+				log.info( 'Creating index %r, this can take a while on a big table', index.name( self.tablename ))
+				cur.execute( index.to_sql( self.tablename ))
+	
+	def _search_setup( self, ctr: Connector ) -> Opt[str]:
+		''' an fts5 trigram table over the search fields, kept in step with the table by triggers '''
+		log = logger.getChild( 'RepoSqlite._search_setup' )
+		name = f'{self.tablename}_search'
+		triggers = ( f'{name}_ai', f'{name}_ad', f'{name}_au' )
+		with self._cursor( ctr ) as cur:
+			# IMMEDIATE so the engine and web ui can't both decide to (re)build it
+			cur.execute( 'BEGIN IMMEDIATE;' )
+			try:
+				if not self.search_fields:
+					for trigger in triggers:
+						cur.execute( f'DROP TRIGGER IF EXISTS "{trigger}";' )
+					cur.execute( f'DROP TABLE IF EXISTS "{name}";' )
+					return None
+				if sqlite_search_table( cur, name, self.search_fields, content = self.tablename ):
+					log.info( 'Building search index %r, this can take a while on a big table', name )
+					_columns_ = ', '.join( f'"{field}"' for field in self.search_fields )
+					_new_ = ', '.join( f'new."{field}"' for field in self.search_fields )
+					_old_ = ', '.join( f'old."{field}"' for field in self.search_fields )
+					_insert_ = f'INSERT INTO "{name}" (rowid, {_columns_}) VALUES (new.rowid, {_new_});'
+					_delete_ = f'INSERT INTO "{name}" ("{name}", rowid, {_columns_}) VALUES (\'delete\', old.rowid, {_old_});'
+					for trigger in triggers:
+						cur.execute( f'DROP TRIGGER IF EXISTS "{trigger}";' )
+					cur.execute( f'CREATE TRIGGER "{name}_ai" AFTER INSERT ON "{self.tablename}" BEGIN {_insert_} END;' )
+					cur.execute( f'CREATE TRIGGER "{name}_ad" AFTER DELETE ON "{self.tablename}" BEGIN {_delete_} END;' )
+					cur.execute( f'CREATE TRIGGER "{name}_au" AFTER UPDATE ON "{self.tablename}" BEGIN {_delete_} {_insert_} END;' )
+					cur.execute( f'INSERT INTO "{name}" ("{name}") VALUES (\'rebuild\');' )
+			except sqlite3.OperationalError:
+				# sqlite's ddl is transactional, so this puts back any triggers we dropped
+				cur.connection.rollback()
+				log.exception( 'Unable to set up search index %r, %s filters will scan the table:', name, self.tablename )
+				return None
+		return name
 	
 	def connect( self, ctr: Connector ) -> sqlite3.Connection:
 		return ctr.sqlite( str( self.sqlite_path ))
 	
+	@contextmanager
+	def _cursor( self, ctr: Connector ) -> Iterator[sqlite3.Cursor]:
+		# connections are long-lived, so a failed statement must never leave a transaction (and its write lock) behind
+		conn = self.connect( ctr )
+		with closing( conn.cursor() ) as cur:
+			try:
+				yield cur
+			except Exception:
+				conn.rollback()
+				raise
+			else:
+				if conn.in_transaction:
+					conn.commit()
+	
 	def valid_id( self, id: REPOID ) -> REPOID:
 		log = logger.getChild( 'RepoSqlite.valid_id' )
 		
@@ -651,17 +1146,15 @@ class RepoSqlite( Repository ):
 	
 	def exists( self, ctr: Connector, id: REPOID ) -> bool:
 		assert isinstance( id, ( int, str )), f'invalid id={id!r}'
-		conn: sqlite3.Connection = self.connect( ctr )
-		with closing( conn.cursor() ) as cur:
-			cur.execute( f'select count(*) as "qty" from "{self.tablename}" WHERE "{self.keyname}" = ?', ( id, ) )
+		with self._cursor( ctr ) as cur:
+			cur.execute( self.sql_exists, ( id, ))
 			row: dict[str,int] = cur.fetchone()
 		return row['qty'] > 0
 	
 	def get_by_id( self, ctr: Connector, id: REPOID ) -> dict[str,Any]:
 		assert isinstance( id, ( int, str )), f'invalid id={id!r}'
-		conn = self.connect( ctr )
-		with closing( conn.cursor() ) as cur:
-			cur.execute( f'select * from "{self.tablename}" WHERE "{self.keyname}" = ?', [ id ])
+		with self._cursor( ctr ) as cur:
+			cur.execute( self.sql_get_by_id, [ id ])
 			item: Opt[dict[str,Any]] = cur.fetchone() # TODO FIXME: EOF?
 		if item is None:
 			raise ResourceNotFound( id )
@@ -676,15 +1169,8 @@ class RepoSqlite( Repository ):
 		orderby: str = '',
 		reverse: bool = False,
 	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
-		params: list[str] = []
-		if filters:
-			wheres: list[str] = []
-			for k, v in filters.items():
-				wheres.append( f'"{k}" like ?' )
-				params.append( f'%{str(v).replace("%","%%")}%' )
-			_where_ = f'where {" and ".join(wheres)}'
-		else:
-			_where_ = ''
+		wheres, params = self._filters( filters )
+		_where_ = f'where {" and ".join(wheres)}' if wheres else ''
 		
 		paging: list[str] = []
 		if limit or offset:
@@ -698,8 +1184,7 @@ class RepoSqlite( Repository ):
 		direction = 'desc' if reverse else 'asc'
 		sql = f'select * from "{self.tablename}" {_where_} order by "{orderby}" {direction} {_paging_}'
 		items: list[Tuple[REPOID,dict[str,Any]]] = []
-		conn: sqlite3.Connection = self.connect( ctr )
-		with closing( conn.cursor() ) as cur:
+		with self._cursor( ctr ) as cur:
 			cur.execute( sql, params )
 			for row in cur.fetchall():
 				id = row.pop( self.keyname )
@@ -707,11 +1192,61 @@ class RepoSqlite( Repository ):
 		
 		return items
 	
+	def _filters( self, filters: dict[str,str] ) -> Tuple[List[str],List[Any]]:
+		wheres: list[str] = []
+		params: list[Any] = []
+		for k, v in filters.items():
+			assert '"' not in k, f'invalid filter={k!r}'
+			if self.search_table and k in self.search_fields and len( str( v )) >= SEARCH_MIN_LENGTH:
+				# fts5's trigram tokenizer answers LIKE from its index, same case-insensitive semantics as a plain LIKE
+				wheres.append( f'rowid in (select rowid from "{self.search_table}" where "{k}" like ?)' )
+			else:
+				wheres.append( f'"{k}" like ?' )
+			params.append( f'%{str(v).replace("%","%%")}%' )
+		return wheres, params
+	
+	def _seek( self,
+		ctr: Connector,
+		filters: dict[str,str],
+		*,
+		limit: int,
+		after: Opt[PAGEKEY],
+		offset: int,
+		orderby: str,
+		reverse: bool,
+	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		assert '"' not in orderby, f'invalid orderby={orderby!r}'
+		wheres, params = self._filters( filters )
+		field = self.fields.get( orderby )
+		keyset, keyset_params, _order_ = keyset_sql( self.keyname, orderby, after, reverse,
+			nullable = field is None or field.null,
+			placeholder = '?',
+			nulls_order = False, # sqlite already sorts nulls first ascending and last descending
+		)
+		if keyset:
+			wheres.append( keyset )
+			params.extend( keyset_params )
+		_where_ = f'where {" and ".join(wheres)}' if wheres else ''
+		sql = f'select * from "{self.tablename}" {_where_} order by {_order_} limit {int(limit)!r} offset {int(offset)!r}'
+		items: list[Tuple[REPOID,dict[str,Any]]] = []
+		with self._cursor( ctr ) as cur:
+			cur.execute( sql, params )
+			for row in cur.fetchall():
+				id = row.pop( self.keyname )
+				items.append(( id, row ))
+		return items
+	
+	def count( self, ctr: Connector, filters: dict[str,str] = {} ) -> int:
+		wheres, params = self._filters( filters )
+		_where_ = f'where {" and ".join(wheres)}' if wheres else ''
+		with self._cursor( ctr ) as cur:
+			cur.execute( f'select count(*) as "qty" from "{self.tablename}" {_where_}', params )
+			row: dict[str,int] = cur.fetchone()
+		return row['qty']
+	
 	def create( self, ctr: Connector, id: REPOID, resource: dict[str,Any], *, audit: auditing.Audit ) -> None:
-		sql1 = f'SELECT COUNT(*) AS "qty" FROM "{self.tablename}" WHERE "{self.keyname}"=?'
-		conn: sqlite3.Connection = self.connect( ctr )
-		with closing( conn.cursor() ) as cur:
-			cur.execute( sql1, [ id ] )
+		with self._cursor( ctr ) as cur:
+			cur.execute( self.sql_exists, [ id ] )
 			row = cur.fetchone()
 			qty = cast( int, row['qty'] )
 			if qty > 0:
@@ -732,11 +1267,9 @@ class RepoSqlite( Repository ):
 		assert '"' not in self.tablename, f'invalid tablename={self.tablename!r}'
 		sql = f'INSERT INTO "{self.tablename}" ({_keys_}) VALUES ({_values_});'
 		
-		with closing( conn.cursor() ) as cur:
+		with self._cursor( ctr ) as cur:
 			cur.execute( sql, params )
 		
-		conn.commit()
-		
 		if self.auditing:
 			auditdata = ''.join (
 				f'\n\t{k}={v!r}' for k, v in resource.items()
@@ -758,10 +1291,8 @@ class RepoSqlite( Repository ):
 		sql = f'UPDATE "{self.tablename}" SET {_values_} WHERE "{self.keyname}"=?'
 		params.append( id )
 		
-		conn: sqlite3.Connection = self.connect( ctr )
-		with closing( conn.cursor() ) as cur:
+		with self._cursor( ctr ) as cur:
 			cur.execute( sql, params )
-		conn.commit()
 		
 		if self.auditing:
 			auditdata = auditdata_from_update( olddata, resource )
@@ -773,18 +1304,50 @@ class RepoSqlite( Repository ):
 		# delete by id and return deleted dict
 		data = self.get_by_id( ctr, id )
 		
-		assert '"' not in self.tablename, f'invalid tablename={self.tablename!r}'
-		sql = f'DELETE FROM "{self.tablename}" WHERE "{self.keyname}"=?;'
-		
-		conn: sqlite3.Connection = self.connect( ctr )
-		with closing( conn.cursor() ) as cur:
-			cur.execute( sql, [ id ])
-		conn.commit()
+		with self._cursor( ctr ) as cur:
+			cur.execute( self.sql_delete, [ id ])
 		
 		if self.auditing:
 			audit.audit( f'Deleted {self.tablename} {id!r}' )
 		
 		return data
+	
+	def expired( self, ctr: Connector, field: str, before: Any, *, limit: Opt[int] = None, exclude: Opt[dict[str,Seq[Any]]] = None ) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		assert field in self.fields, f'invalid field={field!r}'
+		_limit_ = f'limit {int(limit)!r}' if limit else ''
+		_exclude_, excluded = exclude_sql( exclude, '?' )
+		sql = f'select * from "{self.tablename}" where "{field}" < ?{_exclude_} order by "{field}" asc {_limit_}'
+		items: list[Tuple[REPOID,dict[str,Any]]] = []
+		with self._cursor( ctr ) as cur:
+			cur.execute( sql, [ before, *( value for _, value in excluded )])
+			for row in cur.fetchall():
+				id = row.pop( self.keyname )
+				items.append(( id, row ))
+		return items
+	
+	def count_expired( self, ctr: Connector, field: str, before: Any, *, exclude: Opt[dict[str,Seq[Any]]] = None ) -> int:
+		assert field in self.fields, f'invalid field={field!r}'
+		_exclude_, excluded = exclude_sql( exclude, '?' )
+		with self._cursor( ctr ) as cur:
+			cur.execute( f'select count(*) as "qty" from "{self.tablename}" where "{field}" < ?{_exclude_}', [ before, *( value for _, value in excluded )])
+			row: dict[str,int] = cur.fetchone()
+		return row['qty']
+	
+	def purge( self, ctr: Connector, ids: Seq[REPOID], *, audit: auditing.Audit ) -> int:
+		assert '"' not in self.tablename, f'invalid tablename={self.tablename!r}'
+		qty = 0
+		with self._cursor( ctr ) as cur:
+			# older sqlite builds only allow 999 parameters per statement
+			for i in range( 0, len( ids ), 500 ):
+				chunk = ids[i:i+500]
+				_params_ = ','.join( '?' * len( chunk ))
+				cur.execute( f'DELETE FROM "{self.tablename}" WHERE "{self.keyname}" IN ({_params_});', list( chunk ))
+				qty += cur.rowcount
+		
+		if self.auditing and qty:
+			audit.audit( f'Purged {qty!r} {self.tablename}' )
+		
+		return qty
 
 
 #endregion repo sqlite
@@ -816,6 +1379,11 @@ class RepoPostgres( Repository ):
 			cls.pgsql_port = config.pgsql_port
 		cls.pgsql_sslmode = config.pgsql_sslmode
 		cls.pgsql_sslrootcert = config.pgsql_sslrootcert
+		g_pg_pool.configure(
+			min_size = config.pgsql_pool_min,
+			max_size = config.pgsql_pool_max,
+			idle_seconds = config.pgsql_pool_idle_seconds,
+		)
 	
 	def __init__( self,
 		config: Config,
@@ -827,6 +1395,7 @@ class RepoPostgres( Repository ):
 		*,
 		auditing: bool = True,
 		keyname: str = 'id',
+		indexes: Seq[SqlIndex] = (),
 	) -> None:
 		assert re.match( r'^[a-z][a-z_0-9]+$', tablename )
 		
@@ -839,6 +1408,7 @@ class RepoPostgres( Repository ):
 			config, tablename, ending, fields, owner_user, owner_group,
 			auditing = auditing,
 			keyname = keyname,
+			indexes = indexes,
 		)
 		#if not RepoPostgres.schemas:
 		#	RepoPostgres.setup( config )
@@ -852,14 +1422,60 @@ class RepoPostgres( Repository ):
 			fldsupp.extend( fld.to_postgres_after( tablename ))
 		
 		_flds_ = ',\n'.join( fldsql + fldxtra )
-		sql: list[str] = [ f'CREATE TABLE IF NOT EXISTS "{tablename}" ({_flds_});' ]
-		sql.extend( fldsupp )
 		
 		with Connector() as ctr:
 			with self._cursor( ctr ) as cur:
-				for sql_ in sql:
+				cur.execute( f'CREATE TABLE IF NOT EXISTS "{tablename}" ({_flds_});' )
+				self._migrate( cur )
+				for sql_ in fldsupp:
 					#print( f'>>>>>> executing sql:\n{sql_}\n<<<<<<<<<<<<<<<<<<' )
 					cur.execute( sql_ )
+				self._search_setup( cur )
+	
+	def _migrate( self, cur: psycopg2._psycopg.cursor ) -> None:
+		''' bring a table created by an older version up to date: add missing columns, then missing indexes '''
+		log = logger.getChild( 'RepoPostgres._migrate' )
+		cur.execute( 'SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s', [ self.tablename ])
+		columns = { vals[0] for vals in cur.fetchall() }
+		for fld in self.fields.values():
+			if fld.name in columns:
+				continue
+			if fld.primary:
+				log.error( 'Unable to add primary key column %r to existing table %r', fld.name, self.tablename )
+				continue
+			if not fld.null or fld.unique:
+				log.warning( 'Adding column %r to existing table %r as NULL without UNIQUE, existing rows have no value for it', fld.name, self.tablename )
+			log.info( 'Adding column %r to table %r', fld.name, self.tablename )
+			cur.execute( f'ALTER TABLE "{self.tablename}" ADD COLUMN IF NOT EXISTS {fld.to_migration().to_postgres()}' )
+		cur.execute( 'SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s', [ self.tablename ])
+		indexes = { vals[0] for vals in cur.fetchall() }
+		for index in self.indexes:
+			if index.name( self.tablename ) not in indexes:
+				log.info( 'Creating index %r, this can take a while on a big table', index.name( self.tablename ))
+				cur.execute( index.to_sql( self.tablename ))
+	
+	def _search_setup( self, cur: psycopg2._psycopg.cursor ) -> None:
+		''' pg_trgm gin indexes over exactly the expression _filters() uses, so the planner picks them up for like '%x%' '''
+		log = logger.getChild( 'RepoPostgres._search_setup' )
+		if not self.search_fields:
+			return
+		cur.execute( "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'" )
+		if cur.fetchone() is None:
+			cur.execute( 'SAVEPOINT "pg_trgm"' )
+			try:
+				cur.execute( 'CREATE EXTENSION IF NOT EXISTS pg_trgm' )
+			except psycopg2.Error:
+				cur.execute( 'ROLLBACK TO SAVEPOINT "pg_trgm"' )
+				log.exception( 'Unable to create extension pg_trgm (it needs superuser or a trusted extension), %s filters will scan the table:', self.tablename )
+				return
+			cur.execute( 'RELEASE SAVEPOINT "pg_trgm"' )
+		cur.execute( 'SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s', [ self.tablename ])
+		indexes = { vals[0] for vals in cur.fetchall() }
+		for field in self.search_fields:
+			index = f'idx_{self.tablename}_{field}_trgm'
+			if index not in indexes:
+				log.info( 'Creating search index %r, this can take a while on a big table', index )
+				cur.execute( f'CREATE INDEX IF NOT EXISTS "{index}" ON "{self.tablename}" USING gin (lower(cast("{field}" as varchar)) gin_trgm_ops)' )
 	
 	def connect( self, ctr: Connector ) -> psycopg2.connection:
 		return ctr.postgres(
@@ -937,15 +1553,8 @@ class RepoPostgres( Repository ):
 		orderby: str = '',
 		reverse: bool = False,
 	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
-		params: list[str] = []
-		if filters:
-			wheres: list[str] = []
-			for k, v in filters.items():
-				wheres.append( f'lower(cast("{k}" as varchar)) like %s' )
-				params.append( f'%{str(v).lower().replace("%","%%")}%' )
-			_where_ = f'where {" and ".join(wheres)}'
-		else:
-			_where_ = ''
+		wheres, params = self._filters( filters )
+		_where_ = f'where {" and ".join(wheres)}' if wheres else ''
 		
 		paging: list[str] = []
 		if limit or offset:
@@ -968,6 +1577,58 @@ class RepoPostgres( Repository ):
 		
 		return items
 	
+	def _filters( self, filters: dict[str,str] ) -> Tuple[List[str],List[Any]]:
+		wheres: list[str] = []
+		params: list[Any] = []
+		for k, v in filters.items():
+			assert '"' not in k, f'invalid filter={k!r}'
+			wheres.append( f'lower(cast("{k}" as varchar)) like %s' )
+			params.append( f'%{str(v).lower().replace("%","%%")}%' )
+		return wheres, params
+	
+	def _seek( self,
+		ctr: Connector,
+		filters: dict[str,str],
+		*,
+		limit: int,
+		after: Opt[PAGEKEY],
+		offset: int,
+		orderby: str,
+		reverse: bool,
+	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		assert '"' not in orderby, f'invalid orderby={orderby!r}'
+		wheres, params = self._filters( filters )
+		field = self.fields.get( orderby )
+		nullable = field is None or field.null
+		keyset, keyset_params, _order_ = keyset_sql( self.keyname, orderby, after, reverse,
+			nullable = nullable,
+			placeholder = '%s',
+			# postgres sorts nulls last ascending, which isn't what keyset_sql's where clauses expect,
+			# but spelling out NULLS on a NOT NULL column would only stop it matching a plain index
+			nulls_order = nullable,
+		)
+		if keyset:
+			wheres.append( keyset )
+			params.extend( keyset_params )
+		_where_ = f'where {" and ".join(wheres)}' if wheres else ''
+		sql = f'select * from "{self.tablename}" {_where_} order by {_order_} limit {int(limit)!r} offset {int(offset)!r}'
+		items: list[Tuple[REPOID,dict[str,Any]]] = []
+		with self._cursor( ctr ) as cur:
+			cur.execute( sql, params )
+			hdrs: list[str] = [ desc[0] for desc in cur.description ]
+			for row in map( lambda vals: self._row_from_hdrs_vals( hdrs, vals ), cur.fetchall() ):
+				id = row.pop( self.keyname )
+				items.append(( id, row ))
+		return items
+	
+	def count( self, ctr: Connector, filters: dict[str,str] = {} ) -> int:
+		wheres, params = self._filters( filters )
+		_where_ = f'where {" and ".join(wheres)}' if wheres else ''
+		with self._cursor( ctr ) as cur:
+			cur.execute( f'select count(*) from "{self.tablename}" {_where_}', params )
+			vals: Tuple[Any,...] = cur.fetchone()
+		return int( vals[0] )
+	
 	def create( self, ctr: Connector, id: REPOID, resource: dict[str,Any], *, audit: auditing.Audit ) -> None:
 		sql1 = f'SELECT COUNT(*) AS "qty" FROM "{self.tablename}" WHERE "{self.keyname}"=%s'
 		with self._cursor( ctr ) as cur:
@@ -1042,12 +1703,54 @@ class RepoPostgres( Repository ):
 			audit.audit( f'Deleted {self.tablename} {id!r}' )
 		
 		return data
+	
+	def expired( self, ctr: Connector, field: str, before: Any, *, limit: Opt[int] = None, exclude: Opt[dict[str,Seq[Any]]] = None ) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		_limit_ = f'limit {int(limit)!r}' if limit else ''
+		_exclude_, excluded = exclude_sql( exclude, '%s' )
+		sql = f'select * from "{self.tablename}" where "{field}" < %s{_exclude_} order by "{field}" asc {_limit_}'
+		params = [ self.fields[field].encode_postgres( before ), *( self.fields[fld].encode_postgres( value ) for fld, value in excluded )]
+		items: list[Tuple[REPOID,dict[str,Any]]] = []
+		with self._cursor( ctr ) as cur:
+			cur.execute( sql, params )
+			hdrs: list[str] = [ desc[0] for desc in cur.description ]
+			for row in map( lambda vals: self._row_from_hdrs_vals( hdrs, vals ), cur.fetchall() ):
+				id = row.pop( self.keyname )
+				items.append(( id, row ))
+		return items
+	
+	def count_expired( self, ctr: Connector, field: str, before: Any, *, exclude: Opt[dict[str,Seq[Any]]] = None ) -> int:
+		_exclude_, excluded = exclude_sql( exclude, '%s' )
+		params = [ self.fields[field].encode_postgres( before ), *( self.fields[fld].encode_postgres( value ) for fld, value in excluded )]
+		with self._cursor( ctr ) as cur:
+			cur.execute( f'select count(*) from "{self.tablename}" where "{field}" < %s{_exclude_}', params )
+			vals: Opt[Tuple[Any,...]] = cur.fetchone()
+		return int( vals[0] ) if vals else 0
+	
+	def purge( self, ctr: Connector, ids: Seq[REPOID], *, audit: auditing.Audit ) -> int:
+		assert '"' not in self.tablename, f'invalid tablename={self.tablename!r}'
+		sql = f'DELETE FROM "{self.tablename}" WHERE "{self.keyname}" = ANY(%s);'
+		
+		with self._cursor( ctr ) as cur:
+			cur.execute( sql, [ list( ids )])
+			qty: int = cur.rowcount
+		
+		if self.auditing and qty:
+			audit.audit( f'Purged {qty!r} {self.tablename}' )
+		
+		return qty
 
 
 #endregion repo postgres
 #region repo filesystem
 
 
+FS_INDEX_NAME = '.index.sqlite'
+FS_INDEX_RECHECK_SECONDS = 60.0 # stat every file at least this often, to catch files edited behind the repository's back
+FS_INDEX_SETTLE_SECONDS = 2.0 # don't trust a folder's mtime until it's this old, a change in the same clock tick wouldn't move it
+
+def _like_escape( value: str ) -> str:
+	return value.replace( '\\', '\\\\' ).replace( '%', '\\%' ).replace( '_', '\\_' )
+
 @repo_type( 'fs' )
 class RepoFs( Repository ):
 	type = 'fs'
@@ -1068,6 +1771,7 @@ class RepoFs( Repository ):
 		*,
 		auditing: bool = True,
 		keyname: str = 'id',
+		indexes: Seq[SqlIndex] = (), # the sidecar index covers every column already
 	) -> None:
 		if not hasattr( RepoFs, 'base_path' ):
 			RepoFs.setup( config )
@@ -1075,6 +1779,7 @@ class RepoFs( Repository ):
 			config, tablename, ending, fields, owner_user, owner_group,
 			auditing = auditing,
 			keyname = keyname,
+			indexes = indexes,
 		)
 		self.path = self.base_path / tablename
 		self.path.mkdir( mode = 0o775, parents = True, exist_ok = True )
@@ -1082,6 +1787,29 @@ class RepoFs( Repository ):
 		os.chmod( str( self.path ), 0o775 )
 		self.owner_user = owner_user
 		self.owner_group = owner_group
+		
+		# sidecar index of every item's json, so list() never has to open them all
+		self.index_path = self.path / FS_INDEX_NAME
+		self.index_checked = 0.0
+		self.index_ok = True
+		self.search_ok = False
+		try:
+			with self._index() as cur:
+				cur.execute( 'CREATE TABLE IF NOT EXISTS "items" ("id" TEXT PRIMARY KEY, "num" INTEGER NULL, "mtime_ns" INTEGER NOT NULL, "size" INTEGER NOT NULL, "data" TEXT NOT NULL);' )
+				cur.execute( 'CREATE INDEX IF NOT EXISTS "items_num" ON "items" ("num", "id");' )
+				cur.execute( 'CREATE TABLE IF NOT EXISTS "meta" ("key" TEXT PRIMARY KEY, "value" INTEGER NULL);' )
+			try:
+				with self._index() as cur:
+					cur.execute( 'BEGIN IMMEDIATE;' ) # another process could be doing the same thing
+					self.search_ok = self._search_setup( cur )
+			except sqlite3.OperationalError:
+				logger.getChild( 'RepoFs.__init__' ).exception( 'Unable to set up search index in %r, %s filters will scan the index:', str( self.index_path ), tablename )
+			for path in ( self.index_path, self.path / f'{FS_INDEX_NAME}-wal', self.path / f'{FS_INDEX_NAME}-shm' ):
+				if path.exists():
+					chown( str( path ), owner_user, owner_group )
+		except ( OSError, sqlite3.Error ):
+			logger.getChild( 'RepoFs.__init__' ).exception( 'Unable to open index %r, %s will be listed the slow way:', str( self.index_path ), tablename )
+			self.index_ok = False
 	
 	def valid_id( self, id: REPOID ) -> REPOID:
 		log = logger.getChild( 'RepoFs.valid_id' )
@@ -1105,6 +1833,176 @@ class RepoFs( Repository ):
 			raise ResourceNotFound( id ).with_traceback( e.__traceback__ ) from None
 		return item
 	
+	@contextmanager
+	def _index( self ) -> Iterator[sqlite3.Cursor]:
+		conn = sqlite_connect( str( self.index_path ))
+		with closing( conn.cursor() ) as cur:
+			try:
+				yield cur
+			except Exception:
+				conn.rollback()
+				raise
+			else:
+				if conn.in_transaction:
+					conn.commit()
+	
+	def _id_from_stem( self, stem: str ) -> REPOID:
+		return int( stem ) if stem.isdigit() else stem
+	
+	def _num( self, id: REPOID ) -> Opt[int]:
+		stem = str( id )
+		return int( stem ) if stem.isdigit() else None
+	
+	def _index_put( self, cur: sqlite3.Cursor, id: REPOID, st: os.stat_result, data: dict[str,Any] ) -> None:
+		stem = str( id )
+		# an upsert rather than INSERT OR REPLACE, REPLACE's implicit delete doesn't fire the search triggers
+		cur.execute(
+			'INSERT INTO "items" ("id", "num", "mtime_ns", "size", "data") VALUES (?,?,?,?,?)'
+			' ON CONFLICT ("id") DO UPDATE SET "num"=excluded."num", "mtime_ns"=excluded."mtime_ns", "size"=excluded."size", "data"=excluded."data";',
+			( stem, self._num( stem ), st.st_mtime_ns, st.st_size, json.dumps( data )),
+		)
+	
+	def _search_setup( self, cur: sqlite3.Cursor ) -> bool:
+		''' an fts5 trigram table over the search fields, kept in step with "items" by triggers '''
+		triggers = ( 'search_ai', 'search_ad', 'search_au' )
+		if not self.search_fields:
+			for trigger in triggers:
+				cur.execute( f'DROP TRIGGER IF EXISTS "{trigger}";' )
+			cur.execute( 'DROP TABLE IF EXISTS "search";' )
+			return False
+		if sqlite_search_table( cur, 'search', self.search_fields ):
+			_columns_ = ', '.join( f'"{field}"' for field in self.search_fields )
+			def _values( row: str ) -> str:
+				# the same text _index_filters() compares against
+				return ', '.join(
+					f'{row}"id"' if field == self.keyname else f'coalesce(CAST(json_extract({row}"data", \'$."{field}"\') AS TEXT), \'\')'
+					for field in self.search_fields
+				)
+			_insert_ = f'INSERT INTO "search" (rowid, {_columns_}) VALUES (new.rowid, {_values("new.")});'
+			_delete_ = 'DELETE FROM "search" WHERE rowid=old.rowid;'
+			for trigger in triggers:
+				cur.execute( f'DROP TRIGGER IF EXISTS "{trigger}";' )
+			cur.execute( f'CREATE TRIGGER "search_ai" AFTER INSERT ON "items" BEGIN {_insert_} END;' )
+			cur.execute( f'CREATE TRIGGER "search_ad" AFTER DELETE ON "items" BEGIN {_delete_} END;' )
+			cur.execute( f'CREATE TRIGGER "search_au" AFTER UPDATE ON "items" BEGIN {_delete_} {_insert_} END;' )
+			cur.execute( f'INSERT INTO "search" (rowid, {_columns_}) SELECT rowid, {_values("")} FROM "items";' )
+		return True
+	
+	
+	def _index_saved( self, id: REPOID, path: Path, data: Opt[dict[str,Any]], dir_mtime_ns: int ) -> None:
+		''' keep the index current after we wrote (or deleted, if data is None) path ourselves '''
+		log = logger.getChild( 'RepoFs._index_saved' )
+		if not self.index_ok:
+			return
+		try:
+			with self._index() as cur:
+				if data is None:
+					cur.execute( 'DELETE FROM "items" WHERE "id"=?;', ( str( id ), ))
+				else:
+					self._index_put( cur, id, path.stat(), data )
+				# if the index was current before we touched the folder, it still is
+				cur.execute( 'UPDATE "meta" SET "value"=? WHERE "key"=\'dir_mtime_ns\' AND "value"=?;', ( os.stat( self.path ).st_mtime_ns, dir_mtime_ns ))
+		except ( OSError, sqlite3.Error ):
+			log.exception( 'Unable to update index %r for %r:', str( self.index_path ), id )
+	
+	def _index_refresh( self ) -> None:
+		''' bring the index up to date with the folder, only files whose mtime or size changed get read '''
+		log = logger.getChild( 'RepoFs._index_refresh' )
+		st = os.stat( self.path )
+		with self._index() as cur:
+			cur.execute( 'SELECT "value" FROM "meta" WHERE "key"=\'dir_mtime_ns\';' )
+			row: Opt[dict[str,Any]] = cur.fetchone()
+		if row is not None and row['value'] == st.st_mtime_ns and time.monotonic() - self.index_checked < FS_INDEX_RECHECK_SECONDS:
+			return
+		
+		with self._index() as cur:
+			cur.execute( 'SELECT "id", "mtime_ns", "size" FROM "items";' )
+			known: dict[str,Tuple[int,int]] = { r['id']: ( r['mtime_ns'], r['size'] ) for r in cur.fetchall() }
+		seen: set[str] = set()
+		changed: list[Tuple[str,os.stat_result,dict[str,Any]]] = []
+		for entry in os.scandir( self.path ):
+			if not entry.name.lower().endswith( self.ending ):
+				continue
+			stem = entry.name[:-len( self.ending )]
+			try:
+				st2 = entry.stat()
+			except FileNotFoundError:
+				continue
+			seen.add( stem )
+			if known.get( stem ) == ( st2.st_mtime_ns, st2.st_size ):
+				continue
+			try:
+				with open( entry.path, 'r' ) as f:
+					data = json.loads( f.read() )
+			except FileNotFoundError:
+				seen.discard( stem )
+				continue
+			except json.JSONDecodeError:
+				log.exception( 'Error trying to load %r:', entry.path )
+				data = {}
+			changed.append(( stem, st2, data ))
+		gone = [ ( stem, ) for stem in known.keys() - seen ]
+		
+		settled = time.time() - st.st_mtime > FS_INDEX_SETTLE_SECONDS
+		with self._index() as cur:
+			for stem, st2, data in changed:
+				self._index_put( cur, stem, st2, data )
+			cur.executemany( 'DELETE FROM "items" WHERE "id"=?;', gone )
+			cur.execute( 'INSERT OR REPLACE INTO "meta" ("key", "value") VALUES (\'dir_mtime_ns\', ?);', ( st.st_mtime_ns if settled else None, ))
+		self.index_checked = time.monotonic()
+		if changed or gone:
+			log.debug( '%s index: %r changed, %r gone', self.tablename, len( changed ), len( gone ))
+	
+	def _index_filters( self, filters: dict[str,str] ) -> Tuple[List[str],List[Any]]:
+		wheres: list[str] = []
+		params: list[Any] = []
+		for k, v in filters.items():
+			# fts5's LIKE is case-insensitive and has no ESCAPE, so skip it where that would change the results
+			if (
+				self.search_ok and k in self.search_fields and len( v ) >= SEARCH_MIN_LENGTH
+				and '%' not in v and '_' not in v and ( k != self.keyname or v.lower() == v.upper() )
+			):
+				wheres.append( f'rowid IN (SELECT rowid FROM "search" WHERE "{k}" LIKE ?)' )
+				params.append( f'%{v}%' )
+			elif k == self.keyname:
+				wheres.append( '"id" GLOB ?' ) # GLOB is case sensitive, like the scan
+				params.append( '*{}*'.format( v.replace( '[', '[[]' ).replace( '*', '[*]' ).replace( '?', '[?]' )))
+			else:
+				wheres.append( 'lower(coalesce(CAST(json_extract("data", ?) AS TEXT), \'\')) LIKE ? ESCAPE \'\\\'' )
+				params.append( f'$."{k}"' )
+				params.append( f'%{_like_escape(v.lower())}%' )
+		return wheres, params
+	
+	def _list_index(
+		self,
+		filters: dict[str,str],
+		limit: Opt[int],
+		offset: int,
+		orderby: str,
+		reverse: bool,
+	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		self._index_refresh()
+		wheres, params = self._index_filters( filters )
+		_where_ = f'WHERE {" AND ".join(wheres)}' if wheres else ''
+		
+		direction = 'DESC' if reverse else 'ASC'
+		if orderby == self.keyname:
+			_order_ = f'"num" {direction}, "id" {direction}'
+		else:
+			_order_ = f'coalesce(json_extract("data", ?), \'\') {direction}, "num" {direction}'
+			params.append( f'$."{orderby}"' )
+		
+		_paging_ = ''
+		if limit or offset:
+			_paging_ = f'LIMIT {int(limit or -1)!r} OFFSET {int(offset or 0)!r}'
+		
+		items: list[Tuple[REPOID, dict[str, Any]]] = []
+		with self._index() as cur:
+			cur.execute( f'SELECT "id", "data" FROM "items" {_where_} ORDER BY {_order_} {_paging_};', params )
+			for row in cur.fetchall():
+				items.append(( self._id_from_stem( row['id'] ), json.loads( row['data'] )))
+		return items
+	
 	def list( self,
 		ctr: Connector,
 		filters: dict[str,str] = {},
@@ -1115,6 +2013,104 @@ class RepoFs( Repository ):
 		reverse: bool = False,
 	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
 		log = logger.getChild( 'RepoFs.list' )
+		orderby = orderby.strip() or self.keyname
+		if self.index_ok:
+			try:
+				return self._list_index( filters, limit, offset, orderby, reverse )
+			except ( OSError, sqlite3.Error ):
+				# json_extract needs sqlite's json1 extension, old builds don't have it
+				log.exception( 'Unable to list %s from index %r, falling back to reading every file:', self.tablename, str( self.index_path ))
+				self.index_ok = False
+		return self._list_scan( filters, limit, offset, orderby, reverse )
+	
+	def _seek_index(
+		self,
+		filters: dict[str,str],
+		limit: int,
+		after: Opt[PAGEKEY],
+		offset: int,
+		orderby: str,
+		reverse: bool,
+	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		self._index_refresh()
+		wheres, params = self._index_filters( filters )
+		op = '<' if reverse else '>'
+		direction = 'DESC' if reverse else 'ASC'
+		# same order as _list_index, so a missing value sorts as ''
+		if orderby == self.keyname:
+			if after is not None:
+				wheres.append( f'("num", "id") {op} (?, ?)' )
+				params.extend([ self._num( after[1] ), str( after[1] )])
+			_order_ = f'"num" {direction}, "id" {direction}'
+		else:
+			if after is not None:
+				value = after[0]
+				if value is None:
+					value = ''
+				elif isinstance( value, ( dict, list )):
+					value = json.dumps( value, separators = ( ',', ':' )) # json_extract hands back minified json text
+				wheres.append( f'(coalesce(json_extract("data", ?), \'\'), "num") {op} (?, ?)' )
+				params.extend([ f'$."{orderby}"', value, self._num( after[1] )])
+			_order_ = f'coalesce(json_extract("data", ?), \'\') {direction}, "num" {direction}'
+			params.append( f'$."{orderby}"' )
+		_where_ = f'WHERE {" AND ".join(wheres)}' if wheres else ''
+		items: list[Tuple[REPOID, dict[str, Any]]] = []
+		with self._index() as cur:
+			cur.execute( f'SELECT "id", "data" FROM "items" {_where_} ORDER BY {_order_} LIMIT {int(limit)!r} OFFSET {int(offset)!r};', params )
+			for row in cur.fetchall():
+				items.append(( self._id_from_stem( row['id'] ), json.loads( row['data'] )))
+		return items
+	
+	def _seek( self,
+		ctr: Connector,
+		filters: dict[str,str],
+		*,
+		limit: int,
+		after: Opt[PAGEKEY],
+		offset: int,
+		orderby: str,
+		reverse: bool,
+	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		log = logger.getChild( 'RepoFs._seek' )
+		if self.index_ok:
+			try:
+				return self._seek_index( filters, limit, after, offset, orderby, reverse )
+			except ( OSError, sqlite3.Error ):
+				log.exception( 'Unable to page %s from index %r, falling back to reading every file:', self.tablename, str( self.index_path ))
+				self.index_ok = False
+		items = self._list_scan( filters, None, 0, orderby, reverse )
+		if after is not None:
+			# no index means no seeking, pick up after the cursor's row if it's still there
+			ids = [ str( id ) for id, _ in items ]
+			if str( after[1] ) in ids:
+				items = items[ids.index( str( after[1] )) + 1:]
+		return items[offset:offset + limit]
+	
+	def count( self, ctr: Connector, filters: dict[str,str] = {} ) -> int:
+		log = logger.getChild( 'RepoFs.count' )
+		if self.index_ok:
+			try:
+				self._index_refresh()
+				wheres, params = self._index_filters( filters )
+				_where_ = f'WHERE {" AND ".join(wheres)}' if wheres else ''
+				with self._index() as cur:
+					cur.execute( f'SELECT count(*) AS "qty" FROM "items" {_where_};', params )
+					row: dict[str,int] = cur.fetchone()
+				return row['qty']
+			except ( OSError, sqlite3.Error ):
+				log.exception( 'Unable to count %s from index %r, falling back to reading every file:', self.tablename, str( self.index_path ))
+				self.index_ok = False
+		return len( self._list_scan( filters, None, 0, self.keyname, False ))
+	
+	def _list_scan(
+		self,
+		filters: dict[str,str],
+		limit: Opt[int],
+		offset: int,
+		orderby: str,
+		reverse: bool,
+	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		log = logger.getChild( 'RepoFs._list_scan' )
 		items: list[Tuple[REPOID, dict[str, Any]]] = []
 		
 		def _filter( id: int, data: dict[str,Any] ) -> bool:
@@ -1160,10 +2156,12 @@ class RepoFs( Repository ):
 		path = self._path_from_id( id )
 		if path.is_file():
 			raise ResourceAlreadyExists()
+		dir_mtime_ns = os.stat( self.path ).st_mtime_ns
 		with path.open( 'w' ) as fileContent:
 			fileContent.write( json_dumps( resource ))
 		chown( str( path ), self.owner_user, self.owner_group )
 		os.chmod( str( path ), 0o770 )
+		self._index_saved( id, path, resource, dir_mtime_ns )
 		
 		if self.auditing:
 			auditdata = ''.join (
@@ -1176,8 +2174,10 @@ class RepoFs( Repository ):
 		path = self._path_from_id( id )
 		with path.open( 'r' ) as f:
 			olddata = json.loads( f.read() )
+		dir_mtime_ns = os.stat( self.path ).st_mtime_ns
 		with path.open( 'w' ) as f:
 			f.write( json_dumps( resource ))
+		self._index_saved( id, path, resource, dir_mtime_ns )
 		
 		if self.auditing:
 			auditdata = auditdata_from_update( olddata, resource )
@@ -1190,13 +2190,64 @@ class RepoFs( Repository ):
 		with path.open( 'r' ) as fileContent:
 			resource: dict[str,Any] = json.loads( fileContent.read() )
 		
+		dir_mtime_ns = os.stat( self.path ).st_mtime_ns
 		path.unlink()
+		self._index_saved( id, path, None, dir_mtime_ns )
 		
 		if self.auditing:
 			audit.audit( f'Deleted {self.tablename} {id!r} at {str(path)!r}' )
 		
 		return resource
 	
+	def expired( self, ctr: Connector, field: str, before: Any, *, limit: Opt[int] = None, exclude: Opt[dict[str,Seq[Any]]] = None ) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		log = logger.getChild( 'RepoFs.expired' )
+		items: list[Tuple[Any, REPOID, dict[str, Any]]] = []
+		for itemFile in self.path.iterdir():
+			if not itemFile.name.lower().endswith( self.ending ):
+				continue
+			try:
+				with itemFile.open( 'r' ) as f:
+					data = json.loads( f.read() )
+			except FileNotFoundError:
+				continue
+			except json.JSONDecodeError:
+				log.exception( 'Error trying to load %r:', str( itemFile ))
+				continue
+			value = data.get( field )
+			try:
+				if value is None or not value < before:
+					continue
+			except TypeError:
+				continue
+			if any( data.get( fld ) in values for fld, values in ( exclude or {} ).items() ):
+				continue
+			id: REPOID = int( itemFile.stem ) if itemFile.stem.isdigit() else itemFile.stem
+			items.append(( value, id, data ))
+		items.sort( key = lambda item: item[0] )
+		if limit:
+			items = items[:limit]
+		return [( id, data ) for _, id, data in items ]
+	
+	def count_expired( self, ctr: Connector, field: str, before: Any, *, exclude: Opt[dict[str,Seq[Any]]] = None ) -> int:
+		return len( self.expired( ctr, field, before, exclude = exclude ))
+	
+	def purge( self, ctr: Connector, ids: Seq[REPOID], *, audit: auditing.Audit ) -> int:
+		qty = 0
+		for id in ids:
+			path = self._path_from_id( id )
+			dir_mtime_ns = os.stat( self.path ).st_mtime_ns
+			try:
+				path.unlink()
+			except FileNotFoundError:
+				continue
+			self._index_saved( id, path, None, dir_mtime_ns )
+			qty += 1
+		
+		if self.auditing and qty:
+			audit.audit( f'Purged {qty!r} {self.tablename} from {str(self.path)!r}' )
+		
+		return qty
+	
 	def _path_from_id( self, id: REPOID ) -> Path:
 		return self.path / f'{id}{self.ending}'
 
@@ -1204,19 +2255,24 @@ class RepoFs( Repository ):
 #endregion repo filesystem
 #region async support
 
+T = TypeVar( 'T' )
+
 class AsyncRepository:
+	''' run a sync Repository on the default executor, the fallback for backends without a native async implementation '''
 	def __init__( self, repo: Repository ) -> None:
 		self.repo = repo
 	
-	async def exists( self, ctr: Connector, id: REPOID ) -> bool:
+	async def _run( self, ctr: Connector, fn: Callable[[Connector],T] ) -> T:
 		loop = asyncio.get_running_loop()
-		return await loop.run_in_executor( None, lambda:
+		return await loop.run_in_executor( None, fn, ctr )
+	
+	async def exists( self, ctr: Connector, id: REPOID ) -> bool:
+		return await self._run( ctr, lambda ctr:
 			self.repo.exists( ctr, id )
 		)
 	
 	async def get_by_id( self, ctr: Connector, id: REPOID ) -> dict[str, Any]:
-		loop = asyncio.get_running_loop()
-		return await loop.run_in_executor( None, lambda:
+		return await self._run( ctr, lambda ctr:
 			self.repo.get_by_id( ctr, id )
 		)
 	
@@ -1229,28 +2285,392 @@ class AsyncRepository:
 		orderby: str = '',
 		reverse: bool = False,
 	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
-		loop = asyncio.get_running_loop()
-		return await loop.run_in_executor( None, lambda:
-			self.repo.list( ctr, filters, limit = limit, offset = offset, orderby = orderby )
+		return await self._run( ctr, lambda ctr:
+			self.repo.list( ctr, filters, limit = limit, offset = offset, orderby = orderby, reverse = reverse )
+		)
+	
+	async def page( self,
+		ctr: Connector,
+		filters: dict[str,str] = {},
+		*,
+		limit: int,
+		cursor: Opt[str] = None,
+		offset: int = 0,
+		orderby: str = '',
+		reverse: bool = False,
+	) -> PAGE:
+		return await self._run( ctr, lambda ctr:
+			self.repo.page( ctr, filters, limit = limit, cursor = cursor, offset = offset, orderby = orderby, reverse = reverse )
+		)
+	
+	async def count( self, ctr: Connector, filters: dict[str,str] = {} ) -> int:
+		return await self._run( ctr, lambda ctr:
+			self.repo.count( ctr, filters )
 		)
 	
 	async def create( self, ctr: Connector, id: REPOID, resource: dict[str,Any], *, audit: auditing.Audit ) -> None:
-		loop = asyncio.get_running_loop()
-		return await loop.run_in_executor( None, lambda:
+		return await self._run( ctr, lambda ctr:
 			self.repo.create( ctr, id, resource, audit = audit )
 		)
 	
 	async def update( self, ctr: Connector, id: REPOID, resource: dict[str,Any], *, audit: auditing.Audit ) -> dict[str,Any]:
-		loop = asyncio.get_running_loop()
-		return await loop.run_in_executor( None, lambda:
+		return await self._run( ctr, lambda ctr:
 			self.repo.update( ctr, id, resource, audit = audit )
 		)
 	
 	async def delete( self, ctr: Connector, id: REPOID, *, audit: auditing.Audit ) -> dict[str,Any]:
-		loop = asyncio.get_running_loop()
-		return await loop.run_in_executor( None, lambda:
+		return await self._run( ctr, lambda ctr:
 			self.repo.delete( ctr, id, audit = audit )
 		)
+	
+	async def expired( self, ctr: Connector, field: str, before: Any, *, limit: Opt[int] = None, exclude: Opt[dict[str,Seq[Any]]] = None ) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		return await self._run( ctr, lambda ctr:
+			self.repo.expired( ctr, field, before, limit = limit, exclude = exclude )
+		)
+	
+	async def count_expired( self, ctr: Connector, field: str, before: Any, *, exclude: Opt[dict[str,Seq[Any]]] = None ) -> int:
+		return await self._run( ctr, lambda ctr:
+			self.repo.count_expired( ctr, field, before, exclude = exclude )
+		)
+	
+	async def purge( self, ctr: Connector, ids: Seq[REPOID], *, audit: auditing.Audit ) -> int:
+		return await self._run( ctr, lambda ctr:
+			self.repo.purge( ctr, ids, audit = audit )
+		)
+
+SQLITE_ASYNC_THREADS = 4 # WAL lets this many readers run alongside the one writer
+
+g_sqlite_executors: dict[str,ThreadPoolExecutor] = {}
+g_sqlite_executors_pid = os.getpid()
+
+class AsyncRepoSqlite( AsyncRepository ):
+	''' sqlite has no async api, so each database file gets its own few threads (each with its own long-lived
+	connection) rather than borrowing the default executor and the caller's Connector '''
+	repo: RepoSqlite
+	
+	def _executor( self ) -> ThreadPoolExecutor:
+		global g_sqlite_executors_pid
+		if g_sqlite_executors_pid != os.getpid():
+			# a forked child inherits the dict but none of the threads
+			g_sqlite_executors.clear()
+			g_sqlite_executors_pid = os.getpid()
+		path = str( self.repo.sqlite_path )
+		executor = g_sqlite_executors.get( path )
+		if executor is None:
+			executor = g_sqlite_executors[path] = ThreadPoolExecutor(
+				max_workers = SQLITE_ASYNC_THREADS,
+				thread_name_prefix = f'sqlite-{Path(path).stem}',
+			)
+		return executor
+	
+	async def _run( self, ctr: Connector, fn: Callable[[Connector],T] ) -> T:
+		def _call() -> T:
+			with Connector() as ctr2:
+				return fn( ctr2 )
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor( self._executor(), _call )
+
+g_asyncpg_pools: dict[str,asyncpg.Pool] = {}
+g_asyncpg_connecting: dict[str,asyncio.Future[asyncpg.Pool]] = {}
+
+class AsyncRepoPostgres( AsyncRepository ):
+	''' RepoPostgres over asyncpg, the Connector argument is only there to keep the api the same '''
+	repo: RepoPostgres
+	
+	def _key( self ) -> str:
+		repo = self.repo
+		return f'{repo.pgsql_uid}@{repo.pgsql_host}:{repo.pgsql_port}:{repo.pgsql_db}:{repo.pgsql_sslmode}'
+	
+	async def _create_pool( self ) -> asyncpg.Pool:
+		import asyncpg # pip install asyncpg
+		repo = self.repo
+		ssl_: Any = repo.pgsql_sslmode
+		if repo.pgsql_sslrootcert and repo.pgsql_sslmode in ( 'verify-ca', 'verify-full' ):
+			ssl_ = ssl.create_default_context( cafile = str( repo.pgsql_sslrootcert ))
+			ssl_.check_hostname = repo.pgsql_sslmode == 'verify-full'
+		pool: asyncpg.Pool = await asyncpg.create_pool(
+			host = repo.pgsql_host,
+			port = repo.pgsql_port,
+			database = repo.pgsql_db,
+			user = repo.pgsql_uid,
+			password = repo.pgsql_pwd,
+			ssl = ssl_,
+			min_size = g_pg_pool.min_size,
+			max_size = g_pg_pool.max_size,
+			max_inactive_connection_lifetime = g_pg_pool.idle_seconds,
+		)
+		return pool
+	
+	async def _pool( self ) -> asyncpg.Pool:
+		key = self._key()
+		pool = g_asyncpg_pools.get( key )
+		if pool is not None:
+			return pool
+		future = g_asyncpg_connecting.get( key )
+		if future is None:
+			future = g_asyncpg_connecting[key] = asyncio.ensure_future( self._create_pool() )
+			future.add_done_callback( lambda _: g_asyncpg_connecting.pop( key, None ))
+		pool = await asyncio.shield( future )
+		g_asyncpg_pools[key] = pool
+		return pool
+	
+	def _param( self, name: str, val: Any ) -> Any:
+		# asyncpg doesn't guess, every parameter has to already be the column's type
+		fld = self.repo.fields[name]
+		if val is None:
+			return None
+		if isinstance( fld, SqlDateTime ) and isinstance( val, str ):
+			return datetime.datetime.fromisoformat( val )
+		if isinstance( fld, ( SqlVarChar, SqlText )):
+			return str( val )
+		if isinstance( fld, SqlInteger ):
+			return int( val )
+		if isinstance( fld, SqlFloat ):
+			return float( val )
+		return fld.encode_postgres( val )
+	
+	@staticmethod
+	def _numbered( sql: str ) -> str:
+		# asyncpg wants $1, $2, ... where the shared sql builders emit %s
+		first, *rest = sql.split( '%s' )
+		return first + ''.join( f'${n}{part}' for n, part in enumerate( rest, 1 ))
+	
+	def _row( self, record: asyncpg.Record ) -> dict[str,Any]:
+		return self.repo._row_from_hdrs_vals( list( record.keys() ), tuple( record.values() ))
+	
+	async def exists( self, ctr: Connector, id: REPOID ) -> bool:
+		assert isinstance( id, ( int, str )), f'invalid id={id!r}'
+		repo = self.repo
+		pool = await self._pool()
+		qty = await pool.fetchval( f'select count(*) from "{repo.tablename}" WHERE "{repo.keyname}" = $1', self._param( repo.keyname, id ))
+		return int( qty or 0 ) > 0
+	
+	async def get_by_id( self, ctr: Connector, id: REPOID ) -> dict[str, Any]:
+		assert isinstance( id, ( int, str )), f'invalid id={id!r}'
+		repo = self.repo
+		pool = await self._pool()
+		record = await pool.fetchrow( f'select * from "{repo.tablename}" WHERE "{repo.keyname}" = $1', self._param( repo.keyname, id ))
+		if record is None:
+			raise ResourceNotFound( id )
+		return self._row( record )
+	
+	async def list( self,
+		ctr: Connector,
+		filters: dict[str,str] = {},
+		*,
+		limit: Opt[int] = None,
+		offset: int = 0,
+		orderby: str = '',
+		reverse: bool = False,
+	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		repo = self.repo
+		params: list[str] = []
+		if filters:
+			wheres: list[str] = []
+			for k, v in filters.items():
+				params.append( f'%{str(v).lower().replace("%","%%")}%' )
+				wheres.append( f'lower(cast("{k}" as varchar)) like ${len(params)}' )
+			_where_ = f'where {" and ".join(wheres)}'
+		else:
+			_where_ = ''
+		
+		paging: list[str] = []
+		if limit:
+			paging.append( f'limit {int(limit)!r}' )
+		if offset:
+			paging.append( f'offset {int(offset)!r}' )
+		_paging_ = ' '.join( paging )
+		
+		orderby = orderby.strip() or repo.keyname
+		assert '"' not in orderby, f'invalid orderby={orderby!r}'
+		direction = 'desc' if reverse else 'asc'
+		sql = f'select * from "{repo.tablename}" {_where_} order by "{orderby}" {direction} {_paging_}'
+		pool = await self._pool()
+		items: list[Tuple[REPOID,dict[str,Any]]] = []
+		for record in await pool.fetch( sql, *params ):
+			row = self._row( record )
+			id = row.pop( repo.keyname )
+			items.append(( id, row ))
+		return items
+	
+	async def page( self,
+		ctr: Connector,
+		filters: dict[str,str] = {},
+		*,
+		limit: int,
+		cursor: Opt[str] = None,
+		offset: int = 0,
+		orderby: str = '',
+		reverse: bool = False,
+	) -> PAGE:
+		repo = self.repo
+		orderby = orderby.strip() or repo.keyname
+		backward = False
+		after: Opt[PAGEKEY] = None
+		if cursor:
+			backward, after = decode_cursor( cursor )
+			offset = 0
+		items = await self._seek( filters,
+			limit = limit + 1,
+			after = after,
+			offset = offset,
+			orderby = orderby,
+			reverse = reverse != backward,
+		)
+		return repo._paged( items, limit = limit, orderby = orderby, after = after, backward = backward, offset = offset )
+	
+	async def _seek( self,
+		filters: dict[str,str],
+		*,
+		limit: int,
+		after: Opt[PAGEKEY],
+		offset: int,
+		orderby: str,
+		reverse: bool,
+	) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		# same query RepoPostgres._seek builds, renumbered for asyncpg
+		repo = self.repo
+		assert '"' not in orderby, f'invalid orderby={orderby!r}'
+		wheres, params = repo._filters( filters )
+		field = repo.fields.get( orderby )
+		nullable = field is None or field.null
+		keyset, keyset_params, _order_ = keyset_sql( repo.keyname, orderby, after, reverse,
+			nullable = nullable,
+			placeholder = '%s',
+			nulls_order = nullable,
+		)
+		if keyset:
+			wheres.append( keyset )
+			# keyset_sql's params are ( orderby value, id ) or just ( id, )
+			names = [ orderby, repo.keyname ][-len( keyset_params ):]
+			params.extend(
+				self._param( name, val ) if name in repo.fields else val
+				for name, val in zip( names, keyset_params )
+			)
+		_where_ = f'where {" and ".join(wheres)}' if wheres else ''
+		sql = self._numbered( f'select * from "{repo.tablename}" {_where_} order by {_order_} limit {int(limit)!r} offset {int(offset)!r}' )
+		pool = await self._pool()
+		items: list[Tuple[REPOID,dict[str,Any]]] = []
+		for record in await pool.fetch( sql, *params ):
+			row = self._row( record )
+			id = row.pop( repo.keyname )
+			items.append(( id, row ))
+		return items
+	
+	async def count( self, ctr: Connector, filters: dict[str,str] = {} ) -> int:
+		repo = self.repo
+		wheres, params = repo._filters( filters )
+		_where_ = f'where {" and ".join(wheres)}' if wheres else ''
+		pool = await self._pool()
+		qty = await pool.fetchval( self._numbered( f'select count(*) from "{repo.tablename}" {_where_}' ), *params )
+		return int( qty or 0 )
+	
+	async def create( self, ctr: Connector, id: REPOID, resource: dict[str,Any], *, audit: auditing.Audit ) -> None:
+		repo = self.repo
+		if await self.exists( ctr, id ):
+			raise ResourceAlreadyExists()
+		
+		keys: list[str] = []
+		values: list[str] = []
+		params: list[Any] = []
+		for key, val in resource.items():
+			assert '"' not in key, f'invalid key={key!r}'
+			keys.append( f'"{key}"' )
+			params.append( self._param( key, val ))
+			values.append( f'${len(params)}' )
+		
+		_keys_ = ','.join( keys )
+		_values_ = ','.join( values )
+		
+		assert '"' not in repo.tablename, f'invalid tablename={repo.tablename!r}'
+		pool = await self._pool()
+		await pool.execute( f'INSERT INTO "{repo.tablename}" ({_keys_}) VALUES ({_values_});', *params )
+		
+		if repo.auditing:
+			auditdata = ''.join (
+				f'\n\t{k}={v!r}' for k, v in resource.items()
+				if v not in ( None, '' )
+			)
+			audit.audit( f'Created {repo.tablename} {id!r}:{auditdata}' )
+	
+	async def update( self, ctr: Connector, id: REPOID, resource: dict[str,Any], *, audit: auditing.Audit ) -> dict[str,Any]:
+		repo = self.repo
+		values: list[str] = []
+		params: list[Any] = []
+		for k, v in resource.items():
+			params.append( self._param( k, v ))
+			values.append( f'"{k}"=${len(params)}' )
+		_values_ = ','.join( values )
+		params.append( self._param( repo.keyname, id ))
+		
+		olddata = await self.get_by_id( ctr, id )
+		
+		assert '"' not in repo.tablename, f'invalid tablename={repo.tablename!r}'
+		pool = await self._pool()
+		await pool.execute( f'UPDATE "{repo.tablename}" SET {_values_} WHERE "{repo.keyname}"=${len(params)}', *params )
+		
+		if repo.auditing:
+			auditdata = auditdata_from_update( olddata, resource )
+			audit.audit( f'Updated {repo.tablename} {id!r}:{auditdata}' )
+		
+		return resource
+	
+	async def delete( self, ctr: Connector, id: REPOID, *, audit: auditing.Audit ) -> dict[str,Any]:
+		repo = self.repo
+		data = await self.get_by_id( ctr, id )
+		
+		assert '"' not in repo.tablename, f'invalid tablename={repo.tablename!r}'
+		pool = await self._pool()
+		await pool.execute( f'DELETE FROM "{repo.tablename}" WHERE "{repo.keyname}"=$1;', self._param( repo.keyname, id ))
+		
+		if repo.auditing:
+			audit.audit( f'Deleted {repo.tablename} {id!r}' )
+		
+		return data
+	
+	async def expired( self, ctr: Connector, field: str, before: Any, *, limit: Opt[int] = None, exclude: Opt[dict[str,Seq[Any]]] = None ) -> Seq[Tuple[REPOID, dict[str, Any]]]:
+		repo = self.repo
+		_limit_ = f'limit {int(limit)!r}' if limit else ''
+		_exclude_, excluded = exclude_sql( exclude, '%s' )
+		sql = self._numbered( f'select * from "{repo.tablename}" where "{field}" < %s{_exclude_} order by "{field}" asc {_limit_}' )
+		pool = await self._pool()
+		items: list[Tuple[REPOID,dict[str,Any]]] = []
+		for record in await pool.fetch( sql, self._param( field, before ), *( self._param( fld, value ) for fld, value in excluded )):
+			row = self._row( record )
+			id = row.pop( repo.keyname )
+			items.append(( id, row ))
+		return items
+	
+	async def count_expired( self, ctr: Connector, field: str, before: Any, *, exclude: Opt[dict[str,Seq[Any]]] = None ) -> int:
+		repo = self.repo
+		_exclude_, excluded = exclude_sql( exclude, '%s' )
+		sql = self._numbered( f'select count(*) from "{repo.tablename}" where "{field}" < %s{_exclude_}' )
+		pool = await self._pool()
+		qty = await pool.fetchval( sql, self._param( field, before ), *( self._param( fld, value ) for fld, value in excluded ))
+		return int( qty or 0 )
+	
+	async def purge( self, ctr: Connector, ids: Seq[REPOID], *, audit: auditing.Audit ) -> int:
+		repo = self.repo
+		assert '"' not in repo.tablename, f'invalid tablename={repo.tablename!r}'
+		pool = await self._pool()
+		status: str = await pool.execute(
+			f'DELETE FROM "{repo.tablename}" WHERE "{repo.keyname}" = ANY($1);',
+			[ self._param( repo.keyname, id ) for id in ids ],
+		)
+		qty = int( status.split()[-1] ) # "DELETE <count>"
+		
+		if repo.auditing and qty:
+			audit.audit( f'Purged {qty!r} {repo.tablename}' )
+		
+		return qty
+
+def async_repository( repo: Repository ) -> AsyncRepository:
+	''' the native async implementation for repo's backend, or the executor fallback if it doesn't have one '''
+	if isinstance( repo, RepoPostgres ):
+		return AsyncRepoPostgres( repo )
+	if isinstance( repo, RepoSqlite ):
+		return AsyncRepoSqlite( repo )
+	return AsyncRepository( repo )
 
 
 #endregion async support
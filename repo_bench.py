@@ -0,0 +1,157 @@
+# stdlib imports:
+import argparse
+import multiprocessing
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Callable
+import uuid
+
+# local imports:
+import auditing
+import repo
+
+parser = argparse.ArgumentParser( description = 'web-request style repo throughput, one Connector per request' )
+parser.add_argument( 'backend', choices = [ 'postgres', 'sqlite' ] )
+parser.add_argument( '--host', default = '127.0.0.1' )
+parser.add_argument( '--port', type = int, default = 5432 )
+parser.add_argument( '--db', default = 'ace' )
+parser.add_argument( '--user', default = 'ace' )
+parser.add_argument( '--password', default = '' )
+parser.add_argument( '--sslmode', default = None )
+parser.add_argument( '--path', default = '/tmp/repo_bench.sqlite' )
+parser.add_argument( '--threads', type = int, default = 8 )
+parser.add_argument( '--seconds', type = float, default = 10 )
+args = parser.parse_args()
+
+def run_threads( target: Callable[[float],int], threads: int ) -> int:
+	counts = [ 0 ] * threads
+	deadline = time.monotonic() + args.seconds
+	def _worker( i: int ) -> None:
+		counts[i] = target( deadline )
+	workers = [ threading.Thread( target = _worker, args = ( i, )) for i in range( threads ) ]
+	for t in workers:
+		t.start()
+	for t in workers:
+		t.join()
+	return sum( counts )
+
+def bench_postgres() -> None:
+	config = repo.Config(
+		pgsql_host = args.host,
+		pgsql_db = args.db,
+		pgsql_uid = args.user,
+		pgsql_pwd = args.password,
+		pgsql_port = args.port,
+		pgsql_sslmode = args.sslmode,
+		pgsql_pool_max = args.threads,
+	)
+	x = repo.RepoPostgres(
+		config,
+		tablename = 'bench_pool',
+		ending = '.bench',
+		fields = [
+			repo.SqlInteger( 'id', null = False, size = 10, primary = True ),
+			repo.SqlVarChar( 'name', size = 40, null = False ),
+		],
+		owner_user = '',
+		owner_group = '',
+		auditing = False,
+	)
+	with repo.Connector() as ctr:
+		if not x.exists( ctr, 1 ):
+			x.create( ctr, 1, { 'id': 1, 'name': 'bench' }, audit = auditing.NoAudit() )
+	
+	def reader( deadline: float ) -> int:
+		count = 0
+		while time.monotonic() < deadline:
+			with repo.Connector() as ctr:
+				x.get_by_id( ctr, 1 )
+			count += 1
+		return count
+	
+	# a negative idle timeout closes every connection as soon as it's checked in, same as before the pool existed
+	for label, min_size, idle_seconds in (( 'without pooling', 0, -1.0 ), ( 'with pooling', 1, 300.0 )):
+		repo.g_pg_pool.configure( min_size = min_size, max_size = args.threads, idle_seconds = idle_seconds )
+		qty = run_threads( reader, args.threads )
+		print( f'{label}: {qty/args.seconds:.0f} requests/sec {repo.g_pg_pool.metrics()!r}' )
+
+def sqlite_repo() -> repo.RepoSqlite:
+	repo.Repository.schemas.pop( 'bench_car', None )
+	return repo.RepoSqlite(
+		repo.Config( sqlite_path = Path( args.path )),
+		tablename = 'bench_car',
+		ending = '.car',
+		fields = [
+			repo.SqlVarChar( 'id', size = 36, null = False, primary = True ),
+			repo.SqlVarChar( 'did', size = 10, null = False ),
+			repo.SqlFloat( 'start', null = False ),
+		],
+		owner_user = '',
+		owner_group = '',
+		auditing = False,
+	)
+
+def legacy_sqlite() -> None:
+	''' rollback journal and a fresh connection per Connector, the way things were before WAL '''
+	repo.SQLITE_PRAGMAS = [ 'PRAGMA journal_mode=DELETE' ]
+	connect = repo.sqlite_connect
+	def _connect( path: str ) -> sqlite3.Connection:
+		conns = getattr( repo.g_sqlite_tls, 'conns', None )
+		if conns:
+			for conn in conns.values():
+				conn.close()
+			conns.clear()
+		return connect( path )
+	repo.sqlite_connect = _connect
+
+def sqlite_writer( legacy: bool, deadline: float, writes: Any ) -> None:
+	''' the engine process, writing CARs as calls come in '''
+	if legacy:
+		legacy_sqlite()
+	x = sqlite_repo()
+	while time.monotonic() < deadline:
+		with repo.Connector() as ctr:
+			id = str( uuid.uuid4() )
+			x.create( ctr, id, { 'id': id, 'did': '8005551212', 'start': time.time() }, audit = auditing.NoAudit() )
+		with writes.get_lock():
+			writes.value += 1
+
+def bench_sqlite() -> None:
+	for label, legacy in (( 'rollback journal, connection per request', True ), ( 'WAL, persistent per-thread connections', False )):
+		for suffix in ( '', '-wal', '-shm', '-journal' ):
+			Path( args.path + suffix ).unlink( missing_ok = True ) # both passes start from an empty table
+		pragmas = list( repo.SQLITE_PRAGMAS )
+		connect = repo.sqlite_connect
+		if legacy:
+			legacy_sqlite()
+		x = sqlite_repo()
+		
+		def reader( deadline: float ) -> int:
+			count = 0
+			while time.monotonic() < deadline:
+				with repo.Connector() as ctr:
+					x.list( ctr, limit = 50, orderby = 'start', reverse = True )
+				count += 1
+			return count
+		
+		ctx = multiprocessing.get_context( 'spawn' )
+		writes = ctx.Value( 'i', 0 )
+		writer = ctx.Process(
+			target = sqlite_writer,
+			args = ( legacy, time.monotonic() + args.seconds, writes ),
+		)
+		writer.start()
+		reads = run_threads( reader, args.threads )
+		writer.join()
+		print( f'{label}: {reads/args.seconds:.0f} reads/sec, {writes.value/args.seconds:.0f} writes/sec' )
+		repo.SQLITE_PRAGMAS = pragmas
+		repo.sqlite_connect = connect
+		repo.g_sqlite_tls.conns = {}
+
+if __name__ == '__main__':
+	if args.backend == 'postgres':
+		bench_postgres()
+	else:
+		bench_sqlite()
@@ -1,38 +1,87 @@
 # stdlib imports:
+import grp
+import os
 from pathlib import Path
+import pwd
+import sys
+import tempfile
 
 # local imports:
+import auditing
 import repo
 
-config = repo.Config(
-	fs_path = Path( '/usr/share/itas/ace' ),
-	sqlite_path = Path( '/usr/share/itas/ace/ace.sqlite' )
-)
+OWNER_USER = pwd.getpwuid( os.getuid() ).pw_name
+OWNER_GROUP = grp.getgrgid( os.getgid() ).gr_name
+AUDIT = auditing.Audit( user = 'repo_test', remote_addr = '127.0.0.1' )
 
-if False:
-	x = repo.RepoFs(
-		config,
-		tablename = 'boxes',
-		ending = '.box',
-		fields = [],
-		auditing = False,
-	)
-elif True:
-	x = repo.RepoFs(
-		config,
-		tablename = 'did',
-		ending = '.did',
-		fields = [],
-		auditing = False,
-	)
-else:
-	x = repo.RepoFs(
-		config,
-		tablename = 'ani',
-		ending = '.ani',
-		fields = [],
-		auditing = False,
-	)
+def test_page_nullable( tmp_path: Path ) -> None:
+	''' page forward then back over a column with nulls in it, every row once each way '''
+	config = repo.Config( sqlite_path = tmp_path / 'test.sqlite' )
+	repo.RepoSqlite.setup( config )
+	x = repo.RepoSqlite( config, 'page_test', '.page', [
+		repo.SqlInteger( 'id', null = False, size = 10, primary = True ),
+		repo.SqlText( 'name', null = True ),
+	], OWNER_USER, OWNER_GROUP, auditing = False )
+	with repo.Connector() as ctr:
+		names = { id: None if id % 3 == 0 else f'n{id % 4}' for id in range( 1, 11 )}
+		for id, name in names.items():
+			x.create( ctr, id, { 'id': id, 'name': name }, audit = AUDIT )
+		# nulls first, ties broken by id, and exactly the other way around in reverse
+		ascending = sorted( names, key = lambda id: ( names[id] is not None, names[id] or '', id ))
+		for reverse in ( False, True ):
+			expected = ascending[::-1] if reverse else ascending
+			pages = [ x.page( ctr, limit = 3, orderby = 'name', reverse = reverse )]
+			while pages[-1].next is not None:
+				pages.append( x.page( ctr, limit = 3, cursor = pages[-1].next, orderby = 'name', reverse = reverse ))
+			forward = [ id for page in pages for id, _ in page.items ]
+			assert forward == expected, f'reverse={reverse!r}: {forward!r} != {expected!r}'
+			
+			back = [ pages[-1] ]
+			while back[-1].prev is not None:
+				back.append( x.page( ctr, limit = 3, cursor = back[-1].prev, orderby = 'name', reverse = reverse ))
+			backward = [ id for page in reversed( back ) for id, _ in page.items ]
+			assert backward == expected, f'reverse={reverse!r}: {backward!r} != {expected!r}'
 
-for id, box in x.list():
-	print( f'{id=} {box=}\n' )
+def test_fs_index_refresh( tmp_path: Path ) -> None:
+	''' files edited or deleted behind RepoFs's back show up in list() once the index rechecks '''
+	config = repo.Config( fs_path = tmp_path )
+	repo.RepoFs.setup( config )
+	x = repo.RepoFs( config, 'index_test', '.idx', [
+		repo.SqlInteger( 'id', null = False, size = 10, primary = True ),
+		repo.SqlText( 'name', null = True ),
+	], OWNER_USER, OWNER_GROUP, auditing = False )
+	with repo.Connector() as ctr:
+		for id in range( 1, 4 ):
+			x.create( ctr, id, { 'name': f'n{id}' }, audit = AUDIT )
+		assert [ id for id, _ in x.list( ctr )] == [ 1, 2, 3 ]
+		
+		( x.path / '2.idx' ).write_text( '{"name": "edited"}' )
+		( x.path / '3.idx' ).unlink()
+		x.index_checked = 0.0 # as if FS_INDEX_RECHECK_SECONDS had passed
+		items = list( x.list( ctr ))
+		assert items == [( 1, { 'name': 'n1' }), ( 2, { 'name': 'edited' })], f'{items!r}'
+
+if __name__ == '__main__':
+	if sys.argv[1:] == [ 'list' ]:
+		# dump an installed folder
+		config = repo.Config(
+			fs_path = Path( '/usr/share/itas/ace' ),
+			sqlite_path = Path( '/usr/share/itas/ace/ace.sqlite' )
+		)
+		x = repo.RepoFs(
+			config,
+			tablename = 'did',
+			ending = '.did',
+			fields = [],
+			owner_user = OWNER_USER,
+			owner_group = OWNER_GROUP,
+			auditing = False,
+		)
+		with repo.Connector() as ctr:
+			for id, box in x.list( ctr ):
+				print( f'{id=} {box=}\n' )
+	else:
+		for test in ( test_page_nullable, test_fs_index_refresh ):
+			with tempfile.TemporaryDirectory() as tmp:
+				test( Path( tmp ))
+			print( f'{test.__name__} ok' )
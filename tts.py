@@ -1 +1,94 @@
-from tts_polly import TTS, AWS_POLLY_VOICES as TTS_VOICES, aws_polly_voices as tts_voices
+# stdlib imports:
+from abc import ABCMeta, abstractmethod
+import asyncio
+import logging
+from pathlib import Path
+import re
+from typing import AsyncIterator, List, Optional as Opt, Union
+
+# local imports:
+from polly import AWS_POLLY_VOICES as TTS_VOICES, aws_polly_voices as tts_voices
+import tts_cache
+
+logger = logging.getLogger( __name__ )
+
+_r_sentence = re.compile( r'(?<=[.!?])\s+' )
+
+class Backend( metaclass = ABCMeta ):
+	''' a speech synthesizer, TTS takes care of caching whatever it produces '''
+	name: str
+	
+	@abstractmethod
+	def voice( self, voice: Opt[str] ) -> str:
+		''' validate voice, or choose the default if None '''
+		cls = type( self )
+		raise NotImplementedError( f'{cls.__module__}.{cls.__qualname__}.voice()' )
+	
+	@abstractmethod
+	def filename( self, ssml: str, voice: str ) -> str:
+		cls = type( self )
+		raise NotImplementedError( f'{cls.__module__}.{cls.__qualname__}.filename()' )
+	
+	@abstractmethod
+	def synthesize( self, ssml: str, voice: str, path: Path ) -> None:
+		''' write a wav file to path, this is called on a worker thread '''
+		cls = type( self )
+		raise NotImplementedError( f'{cls.__module__}.{cls.__qualname__}.synthesize()' )
+
+class TTS:
+	def __init__( self,
+		backend: Backend,
+		cache_location: Path,
+		voice: Opt[str] = None,
+		*,
+		cache_max_bytes: int = 0,
+		cache_max_age_seconds: float = 0,
+	) -> None:
+		self.backend = backend
+		self.cache_location = cache_location
+		self.cache_max_bytes = cache_max_bytes
+		self.cache_max_age_seconds = cache_max_age_seconds
+		self.voice = backend.voice( voice )
+		
+		self.text: List[str] = []
+	
+	def say( self, text: str ) -> None:
+		self.text.append( text )
+	
+	def number( self, number: Union[int,str] ) -> None:
+		self.say( f'<say-as interpret-as="number">{number}</say-as>' )
+	
+	def digits( self, digits: Union[int,str] ) -> None:
+		self.say( f'<say-as interpret-as="digits">{digits}</say-as>' )
+	
+	async def _generate( self, text: str, pin: bool ) -> Path:
+		log = logger.getChild( 'TTS._generate' )
+		ssml_text = f'<speak><prosody rate="-5%">{text}</prosody></speak>'
+		log.debug( 'ssml_text=%r', ssml_text )
+		
+		backend = self.backend
+		voice = self.voice
+		cache = tts_cache.cache( self.cache_location )
+		cache.configure( self.cache_max_bytes, self.cache_max_age_seconds )
+		return await cache.get(
+			backend.filename( ssml_text, voice ),
+			lambda path: backend.synthesize( ssml_text, voice, path ),
+			pin = pin,
+		)
+	
+	async def generate( self, *, pin: bool = False ) -> Path:
+		return await self._generate( ' '.join( self.text ), pin )
+	
+	async def generate_chunks( self, *, pin: bool = False ) -> AsyncIterator[Path]:
+		''' generate plain text as one clip per sentence, all at once, yielding them in order as each is ready '''
+		text = ' '.join( self.text )
+		# don't risk splitting markup in half, only plain text gets chunked
+		chunks = [ text ] if '<' in text else [ chunk for chunk in _r_sentence.split( text ) if chunk.strip() ] or [ text ]
+		tasks = [ asyncio.ensure_future( self._generate( chunk, pin )) for chunk in chunks ]
+		try:
+			for task in tasks:
+				yield await task
+		finally:
+			# only abandons our wait, each synthesis is the cache's own task and still lands in the cache
+			for task in tasks:
+				task.cancel()
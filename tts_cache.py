@@ -0,0 +1,311 @@
+# stdlib imports:
+import asyncio
+from dataclasses import dataclass
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional as Opt, Set, Tuple
+
+logger = logging.getLogger( __name__ )
+
+SYNTHESIZER = Callable[[Path],None] # writes the audio for a prompt to the path it's given
+
+MAINTAIN_INTERVAL_SECONDS = 300
+LOW_WATER = 0.9 # when over the size limit, evict down to this fraction of it so we aren't evicting on every miss
+PINNED_FILE = '.pinned'
+
+@dataclass
+class ENTRY:
+	size: int
+	used: float # time.time() of last use, persisted as the file's mtime
+
+def _scan( location: Path ) -> Tuple[Dict[str,ENTRY],Set[str]]:
+	entries: Dict[str,ENTRY] = {}
+	pinned: Set[str] = set()
+	if not location.is_dir():
+		return entries, pinned
+	for item in location.iterdir():
+		if item.suffix != '.wav':
+			continue
+		try:
+			st = item.stat()
+		except FileNotFoundError:
+			continue
+		entries[item.name] = ENTRY( st.st_size, st.st_mtime )
+	try:
+		with ( location / PINNED_FILE ).open( 'r' ) as f:
+			pinned = { line.strip() for line in f if line.strip() }
+	except FileNotFoundError:
+		pass
+	return entries, pinned
+
+def select_victims(
+	entries: Dict[str,ENTRY],
+	pinned: Set[str],
+	max_bytes: int,
+	max_age_seconds: float,
+	now: float,
+) -> List[str]:
+	''' pick which entries to evict: anything unused for longer than max_age_seconds, then least recently used until we're under max_bytes '''
+	candidates = sorted(
+		( name for name in entries if name not in pinned ),
+		key = lambda name: entries[name].used,
+	)
+	victims: List[str] = []
+	if max_age_seconds:
+		cutoff = now - max_age_seconds
+		while candidates and entries[candidates[0]].used < cutoff:
+			victims.append( candidates.pop( 0 ))
+	if max_bytes:
+		total = sum( entry.size for entry in entries.values() ) - sum( entries[name].size for name in victims )
+		if total > max_bytes:
+			for name in candidates:
+				if total <= max_bytes * LOW_WATER:
+					break
+				victims.append( name )
+				total -= entries[name].size
+	return victims
+
+def prune(
+	location: Path,
+	max_bytes: int,
+	max_age_seconds: float,
+	touched: Dict[str,float] = {},
+) -> Tuple[Dict[str,ENTRY],Set[str],List[str]]:
+	''' persist recent use, then evict from the cache folder, returns ( remaining entries, pinned, evicted ) '''
+	log = logger.getChild( 'prune' )
+	for name, used in touched.items():
+		try:
+			os.utime( location / name, ( used, used ))
+		except FileNotFoundError:
+			pass
+	entries, pinned = _scan( location )
+	victims = select_victims( entries, pinned, max_bytes, max_age_seconds, time.time() )
+	for name in victims:
+		try:
+			( location / name ).unlink()
+		except FileNotFoundError:
+			pass
+		except OSError as e:
+			log.warning( 'unable to evict %r: %r', name, e )
+		del entries[name]
+	return entries, pinned, victims
+
+class Cache:
+	''' in-memory index of one tts cache folder, concurrent requests for the same uncached prompt share one synthesis '''
+	def __init__( self, location: Path ) -> None:
+		self.location = location
+		self.max_bytes = 0 # 0 means no limit
+		self.max_age_seconds = 0.0 # 0 means no limit
+		self._index: Opt[Dict[str,ENTRY]] = None
+		self._pinned: Set[str] = set()
+		self._loading: Opt['asyncio.Future[Tuple[Dict[str,ENTRY],Set[str]]]'] = None
+		self._pending: Dict[str,'asyncio.Future[Path]'] = {}
+		self._touched: Dict[str,float] = {}
+		self._maintaining = False
+		self._next_maintain = 0.0
+		self.hits = 0
+		self.misses = 0
+		self.coalesced = 0
+		self.evictions = 0
+	
+	def configure( self, max_bytes: int, max_age_seconds: float ) -> None:
+		self.max_bytes = max_bytes
+		self.max_age_seconds = max_age_seconds
+	
+	async def _load( self ) -> Dict[str,ENTRY]:
+		if self._index is not None:
+			return self._index
+		if self._loading is None:
+			log = logger.getChild( 'Cache._load' )
+			self._loading = asyncio.ensure_future( asyncio.get_running_loop().run_in_executor( None, _scan, self.location ))
+			try:
+				self._index, self._pinned = await self._loading
+			finally:
+				self._loading = None
+			self._next_maintain = time.monotonic() + MAINTAIN_INTERVAL_SECONDS
+			log.info( 'indexed %r cached prompts (%r bytes) in %r',
+				len( self._index ), self.bytes(), str( self.location ),
+			)
+			return self._index
+		index, _ = await asyncio.shield( self._loading )
+		return index
+	
+	def bytes( self ) -> int:
+		return sum( entry.size for entry in ( self._index or {} ).values() )
+	
+	def metrics( self ) -> Dict[str,Any]:
+		lookups = self.hits + self.misses + self.coalesced
+		return {
+			'entries': len( self._index or {} ),
+			'bytes': self.bytes(),
+			'pinned': len( self._pinned ),
+			'hits': self.hits,
+			'misses': self.misses,
+			'coalesced': self.coalesced,
+			'evictions': self.evictions,
+			'hit_ratio': self.hits / lookups if lookups else 0.0,
+		}
+	
+	def _create( self, path: Path, synthesize: SYNTHESIZER ) -> int:
+		self.location.mkdir( mode = 0o755, parents = True, exist_ok = True )
+		tmp = path.with_name( f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp' )
+		try:
+			synthesize( tmp )
+			size = tmp.stat().st_size
+			os.replace( tmp, path )
+		finally:
+			if tmp.exists():
+				tmp.unlink()
+		return size
+	
+	def _write_pin( self, name: str ) -> None:
+		self.location.mkdir( mode = 0o755, parents = True, exist_ok = True )
+		with ( self.location / PINNED_FILE ).open( 'a' ) as f:
+			f.write( f'{name}\n' )
+	
+	async def pin( self, name: str ) -> None:
+		''' exempt a prompt from eviction, used for system prompts we always want on hand '''
+		await self._load()
+		if name not in self._pinned:
+			self._pinned.add( name )
+			await asyncio.get_running_loop().run_in_executor( None, self._write_pin, name )
+	
+	async def get( self, name: str, synthesize: SYNTHESIZER, *, pin: bool = False ) -> Path:
+		''' return the path of cached prompt name, calling synthesize on a worker thread to create it if necessary '''
+		path = self.location / name
+		index = await self._load()
+		if pin:
+			await self.pin( name )
+		now = time.time()
+		entry = index.get( name )
+		if entry is not None:
+			self.hits += 1
+			entry.used = now
+			self._touched[name] = now
+			self._maybe_maintain()
+			return path
+		pending = self._pending.get( name )
+		if pending is not None:
+			self.coalesced += 1
+		else:
+			self.misses += 1
+			pending = self._pending[name] = asyncio.ensure_future( self._synthesize( name, path, synthesize ))
+			# if every caller gives up, nobody is left to retrieve a failure
+			pending.add_done_callback( lambda task: task.cancelled() or task.exception() )
+		# a caller that hangs up or barges in only stops waiting on its shielded copy
+		path = await asyncio.shield( pending )
+		self._maybe_maintain()
+		return path
+	
+	async def _synthesize( self, name: str, path: Path, synthesize: SYNTHESIZER ) -> Path:
+		''' runs as its own task, so no single caller's cancellation can fail it for everyone waiting on the same prompt '''
+		log = logger.getChild( 'Cache._synthesize' )
+		try:
+			start = time.monotonic()
+			size = await asyncio.get_running_loop().run_in_executor( None, self._create, path, synthesize )
+			log.debug( 'synthesized %r in %.0fms', name, ( time.monotonic() - start ) * 1000 )
+			now = time.time()
+			if self._index is not None:
+				self._index[name] = ENTRY( size, now )
+			self._touched[name] = now
+		finally:
+			del self._pending[name]
+		return path
+	
+	def _maybe_maintain( self ) -> None:
+		if self._maintaining:
+			return
+		if time.monotonic() < self._next_maintain and not ( self.max_bytes and self.bytes() > self.max_bytes ):
+			return
+		self._maintaining = True
+		asyncio.create_task( self.maintain() )
+	
+	async def maintain( self ) -> None:
+		''' flush access times to disk and evict anything over the size or age limits '''
+		log = logger.getChild( 'Cache.maintain' )
+		self._maintaining = True
+		try:
+			touched, self._touched = self._touched, {}
+			loop = asyncio.get_running_loop()
+			entries, pinned, victims = await loop.run_in_executor( None,
+				prune, self.location, self.max_bytes, self.max_age_seconds, touched,
+			)
+			# keep anything synthesized or used while we were busy on the other thread, but
+			# nothing else from the old index: the scan is the truth for files removed behind our back
+			index = self._index or {}
+			for name, used in self._touched.items():
+				entry = entries.get( name ) or index.get( name )
+				if entry is not None and name not in victims:
+					entry.used = used
+					entries[name] = entry
+			self._index = entries
+			self._pinned |= pinned
+			self.evictions += len( victims )
+			if victims:
+				log.info( 'evicted %r prompts from %r: %r', len( victims ), str( self.location ), self.metrics() )
+			else:
+				log.debug( 'tts cache %r: %r', str( self.location ), self.metrics() )
+		except Exception:
+			log.exception( 'Unexpected error maintaining tts cache %r:', str( self.location ))
+		finally:
+			self._maintaining = False
+			self._next_maintain = time.monotonic() + MAINTAIN_INTERVAL_SECONDS
+
+g_caches: Dict[Path,Cache] = {}
+
+def cache( location: Path ) -> Cache:
+	c = g_caches.get( location )
+	if c is None:
+		c = g_caches[location] = Cache( location )
+	return c
+
+def metrics() -> Dict[str,Dict[str,Any]]:
+	return { str( location ): c.metrics() for location, c in g_caches.items() }
+
+if __name__ == '__main__':
+	import argparse
+	import multiprocessing
+	import sys
+	
+	import ace_settings
+	
+	parser = argparse.ArgumentParser( description = 'inspect, warm or prune the tts cache' )
+	parser.add_argument( '--settings', default = '/etc/itas/ace/settings.json', help = 'path to settings.json' )
+	sub = parser.add_subparsers( dest = 'cmd', required = True )
+	sub.add_parser( 'stats', help = 'show cache size and pinned prompts' )
+	p_prune = sub.add_parser( 'prune', help = 'evict prompts over the configured (or given) limits' )
+	p_prune.add_argument( '--max-mb', type = int, default = None )
+	p_prune.add_argument( '--max-age-days', type = int, default = None )
+	p_warm = sub.add_parser( 'warm', help = 'synthesize one prompt per line of ssml text read from a file or stdin' )
+	p_warm.add_argument( '--voice', default = None )
+	p_warm.add_argument( '--pin', action = 'store_true', help = 'exempt the warmed prompts from eviction' )
+	p_warm.add_argument( 'file', nargs = '?', default = '-' )
+	args = parser.parse_args()
+	
+	logging.basicConfig( level = logging.INFO )
+	ace_settings.init( Path( args.settings ), multiprocessing.RLock() )
+	settings = asyncio.run( ace_settings.aload() )
+	location = Path( settings.tts_aws_cache_location )
+	
+	if args.cmd == 'stats':
+		entries, pinned = _scan( location )
+		print( f'{location}: {len(entries)} prompts, {sum(e.size for e in entries.values())/1048576:.1f}MB, {len(pinned)} pinned' )
+	elif args.cmd == 'prune':
+		max_mb = settings.tts_cache_max_mb if args.max_mb is None else args.max_mb
+		max_age_days = settings.tts_cache_max_age_days if args.max_age_days is None else args.max_age_days
+		entries, pinned, victims = prune( location, max_mb * 1048576, max_age_days * 86400 )
+		print( f'evicted {len(victims)}, {len(entries)} prompts remain ({sum(e.size for e in entries.values())/1048576:.1f}MB)' )
+	elif args.cmd == 'warm':
+		f = sys.stdin if args.file == '-' else open( args.file, 'r' )
+		lines = [ line.strip() for line in f if line.strip() ]
+		
+		async def _warm() -> None:
+			for line in lines:
+				tts = settings.tts( args.voice )
+				tts.say( line )
+				print( await tts.generate( pin = args.pin ))
+		
+		asyncio.run( _warm() )
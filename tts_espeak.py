@@ -0,0 +1,48 @@
+# stdlib imports:
+import hashlib
+import logging
+from pathlib import Path
+import shutil
+import subprocess
+from typing import Optional as Opt
+
+# local imports:
+from tts import Backend
+
+logger = logging.getLogger( __name__ )
+
+TIMEOUT_SECONDS = 60
+
+class Espeak( Backend ):
+	''' offline tts using espeak-ng (apt install espeak-ng), for labs and CI without access to AWS '''
+	name = 'espeak'
+	
+	def __init__( self, default_voice: str ) -> None:
+		self.default_voice = default_voice or 'en-us'
+	
+	def voice( self, voice: Opt[str] ) -> str:
+		# flows pick polly voice names, espeak doesn't know those so everything uses the configured voice
+		return self.default_voice
+	
+	def filename( self, ssml: str, voice: str ) -> str:
+		namestr = f'espeak-{ssml}-{voice}'
+		fhash = hashlib.sha224(
+			namestr.encode( 'utf-8' )
+		).hexdigest()
+		return f'{fhash}.wav'
+	
+	def synthesize( self, ssml: str, voice: str, path: Path ) -> None:
+		# NOTE: every call gets its own espeak process so these run in parallel on the tts worker threads
+		log = logger.getChild( 'Espeak.synthesize' )
+		exe = shutil.which( 'espeak-ng' ) or shutil.which( 'espeak' )
+		if exe is None:
+			raise FileNotFoundError( 'espeak-ng is not installed' )
+		log.debug( 'synthesizing text=%r', ssml )
+		subprocess.run(
+			[ exe, '-m', '-v', voice, '-w', str( path ), '--stdin' ],
+			input = ssml.encode( 'utf-8' ),
+			stdout = subprocess.DEVNULL,
+			stderr = subprocess.PIPE,
+			timeout = TIMEOUT_SECONDS,
+			check = True,
+		)
@@ -0,0 +1,172 @@
+# stdlib imports:
+import asyncio
+import itertools
+import logging
+import time
+from typing import (
+	Dict, Iterator, List, Optional as Opt, Sequence as Seq, Tuple, Union,
+)
+from typing_extensions import Literal
+
+# local imports:
+import ace_settings
+
+logger = logging.getLogger( __name__ )
+
+KIND = Literal['say','digits','number']
+VALUE = Union[int,str]
+
+MAX_NUMBER_FRAGMENT = 99 # pre-render spoken numbers up to this, anything bigger is synthesized when needed
+WARM_CONCURRENCY = 4 # don't get ourselves throttled by the tts provider at startup
+WARM_CHECK_SECONDS = 60
+
+class Var:
+	''' a value only known at playback time, prompts whose placeholders all have choices are pre-rendered whole, otherwise it's spoken from fragments '''
+	def __init__( self, name: str, choices: Opt[Seq[VALUE]] = None ) -> None:
+		self.name = name
+		self.choices = choices
+	
+	def __repr__( self ) -> str:
+		return f'Var({self.name!r})'
+
+PART = Tuple[KIND,Union[VALUE,Var]]
+
+g_prompts: List['Prompt'] = []
+
+class Prompt:
+	''' a tts phrase known ahead of time, so it can be synthesized before a caller needs it '''
+	def __init__( self ) -> None:
+		self.parts: List[PART] = []
+		g_prompts.append( self )
+	
+	def say( self, text: Union[str,Var] ) -> 'Prompt':
+		self.parts.append(( 'say', text ))
+		return self
+	
+	def digits( self, digits: Union[VALUE,Var] ) -> 'Prompt':
+		self.parts.append(( 'digits', digits ))
+		return self
+	
+	def number( self, number: Union[VALUE,Var] ) -> 'Prompt':
+		self.parts.append(( 'number', number ))
+		return self
+	
+	def vars( self ) -> List[Var]:
+		return [ value for _, value in self.parts if isinstance( value, Var )]
+	
+	def is_finite( self ) -> bool:
+		return all( var.choices is not None for var in self.vars() )
+	
+	def variants( self ) -> Iterator[List[Tuple[KIND,VALUE]]]:
+		''' every clip this prompt can need, with placeholders filled in '''
+		vars_ = self.vars()
+		if self.is_finite():
+			for combo in itertools.product( *( var.choices or () for var in vars_ )):
+				values = { var.name: value for var, value in zip( vars_, combo )}
+				yield self._fill( values )
+		else:
+			for segment in self._segments( {} ):
+				if isinstance( segment, list ):
+					yield segment
+	
+	def _fill( self, values: Dict[str,VALUE] ) -> List[Tuple[KIND,VALUE]]:
+		return [
+			( kind, values[value.name] if isinstance( value, Var ) else value )
+			for kind, value in self.parts
+		]
+	
+	def _segments( self, values: Dict[str,VALUE] ) -> Iterator[Union[List[Tuple[KIND,VALUE]],Tuple[KIND,VALUE]]]:
+		# runs of fixed parts become one clip, each placeholder is yielded on its own to be spoken from fragments
+		run: List[Tuple[KIND,VALUE]] = []
+		for kind, value in self.parts:
+			if isinstance( value, Var ):
+				if run:
+					yield run
+					run = []
+				yield ( kind, values.get( value.name, '' ))
+			else:
+				run.append(( kind, value ))
+		if run:
+			yield run
+
+async def _clip( settings: ace_settings.Settings, parts: List[Tuple[KIND,VALUE]], pin: bool = False ) -> str:
+	tts = settings.tts()
+	for kind, value in parts:
+		getattr( tts, kind )( value )
+	return str( await tts.generate( pin = pin ))
+
+def _fragments( kind: KIND, value: VALUE ) -> List[List[Tuple[KIND,VALUE]]]:
+	if kind == 'digits':
+		return [[( 'digits', c )] for c in str( value )]
+	return [[( kind, value )]]
+
+async def render( settings: ace_settings.Settings, prompt: Prompt, values: Dict[str,VALUE] ) -> str:
+	''' return a playable stream for prompt, these are all cache hits once the bank has been warmed '''
+	if prompt.is_finite():
+		return await _clip( settings, prompt._fill( values ))
+	streams: List[str] = []
+	for segment in prompt._segments( values ):
+		if isinstance( segment, list ):
+			streams.append( await _clip( settings, segment ))
+		else:
+			for fragment in _fragments( *segment ):
+				streams.append( await _clip( settings, fragment ))
+	if len( streams ) == 1:
+		return streams[0]
+	return 'file_string://' + '!'.join( streams )
+
+def bank() -> List[List[Tuple[KIND,VALUE]]]:
+	''' every clip the registered prompts can need, including the digit and number fragments '''
+	clips: List[List[Tuple[KIND,VALUE]]] = []
+	for prompt in g_prompts:
+		clips.extend( prompt.variants() )
+	clips.extend([( 'digits', str( digit ))] for digit in range( 10 ))
+	clips.extend([( 'number', number )] for number in range( MAX_NUMBER_FRAGMENT + 1 ))
+	return clips
+
+async def warm( settings: ace_settings.Settings ) -> None:
+	''' synthesize and pin every clip in the bank '''
+	log = logger.getChild( 'warm' )
+	clips = bank()
+	sem = asyncio.Semaphore( WARM_CONCURRENCY )
+	failed = 0
+	async def _warm( parts: List[Tuple[KIND,VALUE]] ) -> None:
+		nonlocal failed
+		async with sem:
+			try:
+				await _clip( settings, parts, pin = True )
+			except Exception as e:
+				failed += 1
+				log.warning( 'unable to pre-generate %r: %r', parts, e )
+	start = time.monotonic()
+	await asyncio.gather( *( _warm( parts ) for parts in clips ))
+	log.info( 'prompt bank of %r clips ready for voice %r in %.1fs (%r failed)',
+		len( clips ), settings.tts().voice, time.monotonic() - start, failed,
+	)
+
+def _warm_key( settings: ace_settings.Settings ) -> Tuple[object,...]:
+	return (
+		settings.vm_use_tts,
+		settings.tts_engine,
+		settings.tts_espeak_voice,
+		settings.tts_aws_default_voice,
+		settings.tts_aws_cache_location,
+		settings.tts_aws_access_key,
+		settings.tts_aws_region_name,
+	)
+
+async def keep_warm() -> None:
+	''' warm the bank at startup and again whenever the tts settings change '''
+	log = logger.getChild( 'keep_warm' )
+	last: Opt[Tuple[object,...]] = None
+	while True:
+		try:
+			settings = await ace_settings.aload()
+			key = _warm_key( settings )
+			if key != last:
+				last = key
+				if settings.vm_use_tts and ( settings.tts_engine != 'polly' or settings.tts_aws_access_key ):
+					await warm( settings )
+		except Exception:
+			log.exception( 'Unexpected error warming prompt bank:' )
+		await asyncio.sleep( WARM_CHECK_SECONDS )